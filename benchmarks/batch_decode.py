@@ -0,0 +1,71 @@
+"""Per-sentence viterbi and vectorized batch decoding with NumPy
+
+    python batch_decode.py --num_sents 5000
+    python batch_decode.py --model_path ../models/sejong_lr_sepxsv_hmm.json --sentences_path sentences.txt
+
+Prints the time of decoding prepared lattices only, and the time of the
+whole tagging by a tag() loop and by tag_batch(vectorized=True), and checks
+that the results are the same.
+"""
+import argparse
+import sys
+import time
+sys.path.append('../')
+
+from hmm_postagger import TrainedHMMTagger
+from hmm_postagger import viterbi
+from hmm_postagger.batch_decode import viterbi_batch
+from synthetic import SyntheticCorpus
+from synthetic import synthetic_model
+
+def lattice_of(tagger, sent):
+    chars = sent.replace(' ', '')
+    edges, bos, eos = tagger._generate_edge(chars, tagger._sentence_lookup(sent))
+    return tagger._add_weight(edges), bos, eos
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', type=str, default=None)
+    parser.add_argument('--sentences_path', type=str, default=None, help='one sentence per line')
+    parser.add_argument('--num_sents', type=int, default=5000)
+    parser.add_argument('--chunksize', type=int, default=1000)
+    parser.add_argument('--max_eojeols', type=int, default=15)
+    args = parser.parse_args()
+
+    if args.model_path:
+        tagger = TrainedHMMTagger(args.model_path)
+    else:
+        emission, transition = synthetic_model()
+        tagger = TrainedHMMTagger(emission=emission, transition=transition)
+    if args.sentences_path:
+        with open(args.sentences_path, encoding='utf-8') as f:
+            sents = [line.strip() for line in f if line.strip()][:args.num_sents]
+    else:
+        sents = SyntheticCorpus(args.num_sents, seed=1, max_eojeols=args.max_eojeols).texts
+
+    lattices = [lattice_of(tagger, sent) for sent in sents]
+    n_edges = sum(len(edges) for edges, _, _ in lattices)
+    print('{} sents, {:.1f} edges per sent'.format(len(sents), n_edges / len(sents)))
+
+    begin = time.perf_counter()
+    expected = [viterbi(*lattice) for lattice in lattices]
+    loop_sec = time.perf_counter() - begin
+    begin = time.perf_counter()
+    paths = viterbi_batch(lattices)
+    batch_sec = time.perf_counter() - begin
+    print('decode only\tviterbi loop {:.3f} sec\tviterbi_batch {:.3f} sec\tsame {}'.format(
+        loop_sec, batch_sec, paths == expected))
+
+    # warm the caches, so that both runs measure the same work
+    tagger.tag_batch(sents)
+    begin = time.perf_counter()
+    expected = [tagger.tag(sent) for sent in sents]
+    loop_sec = time.perf_counter() - begin
+    begin = time.perf_counter()
+    pos = tagger.tag_batch(sents, chunksize=args.chunksize, vectorized=True)
+    batch_sec = time.perf_counter() - begin
+    print('tag\t\ttag() loop {:.3f} sec\ttag_batch {:.3f} sec\tsame {}'.format(
+        loop_sec, batch_sec, pos == expected))
+
+if __name__ == '__main__':
+    main()
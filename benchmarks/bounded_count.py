@@ -0,0 +1,84 @@
+"""Peak memory and time of exact and bounded-memory counting
+
+    python bounded_count.py --num_sents 100000 --n_nouns 300000 --min_count_word 2
+    python bounded_count.py --corpus_path ../data/sejong_corpus_lr_sepxsv.txt
+
+Each setting counts the corpus file in a new process, and prints the peak
+RSS of the process, counting time and whether the trained model equals the
+model of exact counting.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append('../')
+
+from synthetic import SyntheticCorpus
+
+def peak_mb():
+    # ru_maxrss is inherited from the parent process, VmHWM is not
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+def measure(corpus_path, min_count_word, max_count_entries, sketch_width):
+    # runs in the child process
+    from hmm_postagger import Corpus
+    from hmm_postagger import CorpusTrainer
+    base = peak_mb()
+    trainer = CorpusTrainer(min_count_tag=1, min_count_word=min_count_word, verbose=False,
+        max_count_entries=max_count_entries or None, sketch_width=sketch_width or None)
+    begin = time.perf_counter()
+    trainer.train(Corpus(corpus_path))
+    sec = time.perf_counter() - begin
+    return {'peak': peak_mb() - base, 'sec': sec,
+        'emission': trainer.emission_, 'n_words': sum(len(w) for w in trainer.emission_.values())}
+
+def run_child(*args):
+    output = subprocess.check_output([sys.executable, __file__, '--child',
+        '--corpus_path', args[0], '--min_count_word', str(args[1]),
+        '--max_count_entries', str(args[2]), '--sketch_width', str(args[3])])
+    return json.loads(output.decode('utf-8'))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus_path', type=str, default=None)
+    parser.add_argument('--num_sents', type=int, default=50000)
+    parser.add_argument('--n_nouns', type=int, default=200000)
+    parser.add_argument('--min_count_word', type=int, default=2)
+    parser.add_argument('--max_count_entries', type=int, default=0)
+    parser.add_argument('--sketch_width', type=int, default=0)
+    parser.add_argument('--child', action='store_true')
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.corpus_path, args.min_count_word,
+            args.max_count_entries, args.sketch_width), ensure_ascii=False))
+        return
+
+    with tempfile.TemporaryDirectory() as dirname:
+        corpus_path = args.corpus_path
+        if corpus_path is None:
+            corpus_path = os.path.join(dirname, 'corpus.txt')
+            SyntheticCorpus(args.num_sents, seed=0, n_nouns=args.n_nouns,
+                n_verbs=args.n_nouns // 5, n_adjectives=args.n_nouns // 10,
+                n_adverbs=args.n_nouns // 20).save(corpus_path)
+
+        print('max entries\tsketch width\tpeak MB\tsec\twords\tsame model')
+        reference = None
+        settings = [(0, 0), (100000, 0), (20000, 0), (20000, 1 << 18)]
+        for max_count_entries, sketch_width in settings:
+            result = run_child(corpus_path, args.min_count_word, max_count_entries, sketch_width)
+            if reference is None:
+                reference = result['emission']
+            print('{}\t{}\t{:.1f}\t{:.2f}\t{}\t{}'.format(max_count_entries or 'exact',
+                sketch_width or '-', result['peak'], result['sec'], result['n_words'],
+                result['emission'] == reference))
+
+if __name__ == '__main__':
+    main()
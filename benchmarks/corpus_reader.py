@@ -0,0 +1,65 @@
+"""Compares utils.Corpus and corpus_reader.CorpusReader
+
+    python corpus_reader.py --n_sents 200000
+
+Measures iteration, counting (count_corpus), integer-encoded iteration and
+random access of a synthetic corpus, in plain text and gzip.
+"""
+import argparse
+import gzip
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.append('../')
+
+from hmm_postagger import Corpus
+from hmm_postagger import CorpusReader
+from hmm_postagger.corpus_reader import Vocabulary
+from hmm_postagger.trainer import count_corpus
+from synthetic import SyntheticCorpus
+
+def timeit(func):
+    begin = time.perf_counter()
+    func()
+    return time.perf_counter() - begin
+
+def consume(iterable):
+    for _ in iterable:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_sents', type=int, default=100000)
+    parser.add_argument('--n_random_access', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'corpus.txt')
+        SyntheticCorpus(args.n_sents, seed=0).save(path)
+        gz_path = path + '.gz'
+        with open(path, 'rb') as fin, gzip.open(gz_path, 'wb') as fout:
+            fout.write(fin.read())
+
+        print('{} sents, {:.1f} MB'.format(args.n_sents, os.path.getsize(path) / 1e6))
+        print('Corpus iter            : {:.3f} sec'.format(timeit(lambda: consume(Corpus(path)))))
+        print('Corpus count           : {:.3f} sec'.format(timeit(lambda: count_corpus(Corpus(path)))))
+
+        for name, path_ in [('plain', path), ('gzip', gz_path)]:
+            print('CorpusReader ({})'.format(name))
+            print('  build index          : {:.3f} sec'.format(timeit(lambda: CorpusReader(path_))))
+            reader = CorpusReader(path_)
+            print('  iter                 : {:.3f} sec'.format(timeit(lambda: consume(reader))))
+            print('  iter_tokens          : {:.3f} sec'.format(timeit(lambda: consume(reader.iter_tokens()))))
+            print('  iter_encoded         : {:.3f} sec'.format(
+                timeit(lambda: consume(reader.iter_encoded(Vocabulary())))))
+            print('  count                : {:.3f} sec'.format(timeit(lambda: count_corpus(reader))))
+            if name == 'plain':
+                rng = random.Random(0)
+                indices = [rng.randrange(len(reader)) for _ in range(args.n_random_access)]
+                elapsed = timeit(lambda: [reader[i] for i in indices])
+                print('  random access        : {:.3f} ms / sent'.format(elapsed * 1000 / len(indices)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Load test of hmm_postagger.server on localhost
+
+    python load_test.py --concurrency 32 --requests 200
+    python load_test.py --unix_socket /tmp/hmm_postagger.sock --max_batch_size 128 --n_jobs 2
+
+Starts a server in a subprocess with the synthetic model (or --model_path),
+and each of concurrency client threads sends requests of one sentence.
+Prints client side throughput and latency percentiles, and server metrics.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+sys.path.append('../')
+
+from hmm_postagger.client import TaggerClient
+from hmm_postagger.client import TaggerServerError
+from synthetic import SyntheticCorpus
+from synthetic import synthetic_model
+
+def start_server(args, model_path):
+    command = [sys.executable, '-m', 'hmm_postagger.server', '--model_path', model_path,
+        '--max_batch_size', str(args.max_batch_size), '--max_delay_ms', str(args.max_delay_ms),
+        '--max_queue', str(args.max_queue), '--n_jobs', str(args.n_jobs)]
+    if args.unix_socket:
+        command += ['--unix_socket', args.unix_socket]
+    else:
+        command += ['--port', str(args.port)]
+    env = dict(os.environ, PYTHONPATH=os.path.abspath('..'))
+    return subprocess.Popen(command, env=env)
+
+def wait_server(client, process, timeout=60):
+    begin = time.time()
+    while time.time() - begin < timeout:
+        if process.poll() is not None:
+            raise RuntimeError('server exited with {}'.format(process.returncode))
+        try:
+            client.health()
+            return
+        except (OSError, TaggerServerError):
+            client.close()
+            time.sleep(0.1)
+    raise RuntimeError('server did not start in {} sec'.format(timeout))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', type=str, default=None)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix_socket', type=str, default=None)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200, help='requests per client')
+    parser.add_argument('--max_batch_size', type=int, default=64)
+    parser.add_argument('--max_delay_ms', type=float, default=5)
+    parser.add_argument('--max_queue', type=int, default=10000)
+    parser.add_argument('--n_jobs', type=int, default=1)
+    args = parser.parse_args()
+
+    texts = SyntheticCorpus(2000, seed=1).texts
+    with tempfile.TemporaryDirectory() as dirname:
+        model_path = args.model_path
+        if model_path is None:
+            from hmm_postagger.binary_model import save_binary_model
+            emission, transition = synthetic_model()
+            model_path = os.path.join(dirname, 'model.bin')
+            save_binary_model(model_path, emission, transition)
+
+        process = start_server(args, model_path)
+        url = 'http://127.0.0.1:{}'.format(args.port)
+        try:
+            with TaggerClient(url, args.unix_socket) as client:
+                wait_server(client, process)
+
+            latency = []
+            n_rejected = [0]
+            lock = threading.Lock()
+
+            def run(worker_id):
+                latency_ = []
+                rejected = 0
+                with TaggerClient(url, args.unix_socket) as client:
+                    for i in range(args.requests):
+                        text = texts[(worker_id * args.requests + i) % len(texts)]
+                        begin = time.perf_counter()
+                        try:
+                            client.tag(text)
+                        except TaggerServerError:
+                            rejected += 1
+                            continue
+                        latency_.append((time.perf_counter() - begin) * 1000)
+                with lock:
+                    latency.extend(latency_)
+                    n_rejected[0] += rejected
+
+            threads = [threading.Thread(target=run, args=(i,)) for i in range(args.concurrency)]
+            begin = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - begin
+
+            with TaggerClient(url, args.unix_socket) as client:
+                metrics = client.metrics()
+        finally:
+            process.terminate()
+            process.wait()
+
+    latency.sort()
+    def percentile(p):
+        return latency[min(len(latency) - 1, int(len(latency) * p / 100))] if latency else 0
+    print('requests    : {} ({} rejected)'.format(len(latency) + n_rejected[0], n_rejected[0]))
+    print('throughput  : {:.1f} requests/sec'.format(len(latency) / elapsed))
+    print('latency ms  : p50 {:.2f}, p90 {:.2f}, p99 {:.2f}'.format(
+        percentile(50), percentile(90), percentile(99)))
+    print('batches     : {}, mean batch size {:.1f}'.format(metrics['batches'],
+        metrics['batch_size.sum'] / max(metrics['batch_size.count'], 1)))
+
+if __name__ == '__main__':
+    main()
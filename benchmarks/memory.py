@@ -0,0 +1,108 @@
+"""RSS of a loaded tagger with dict, compact and mmap emission
+
+    python memory.py --model_path ../models/sejong_lr_sepxsv_hmm.json
+    python memory.py --n_nouns 100000
+
+Each mode is loaded in a new process. Prints VmRSS after loading and after
+tagging sentences, and checks that every mode tags the same with dict mode.
+Without model, a JSON model is trained from a synthetic corpus.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+sys.path.append('../')
+
+from hmm_postagger import CorpusTrainer
+from synthetic import SyntheticCorpus
+
+modes = ['dict', 'compact', 'mmap']
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+def measure(mode, model_path, sents_path):
+    # runs in the child process
+    import gc
+    from hmm_postagger import TrainedHMMTagger
+    with open(sents_path, encoding='utf-8') as f:
+        sents = [line.strip() for line in f]
+    gc.collect()
+    base = rss_mb()
+    if mode == 'mmap':
+        from hmm_postagger.binary_model import convert_json_to_binary
+        bin_path = model_path[:-5] + '.bin'
+        if not os.path.exists(bin_path):
+            convert_json_to_binary(model_path, bin_path)
+        tagger = TrainedHMMTagger(bin_path)
+    else:
+        tagger = TrainedHMMTagger(model_path, compact=(mode == 'compact'))
+    gc.collect()
+    loaded = rss_mb()
+    pos = [tagger.tag(sent) for sent in sents]
+    tagged = rss_mb()
+    return {'loaded': loaded - base, 'tagged': tagged - base, 'pos': pos}
+
+def run_child(mode, model_path, sents_path):
+    output = subprocess.check_output([sys.executable, __file__, '--child', mode,
+        '--model_path', model_path, '--sentences_path', sents_path])
+    return json.loads(output.decode('utf-8'))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', type=str, default=None, help='JSON model')
+    parser.add_argument('--sentences_path', type=str, default=None, help='one sentence per line')
+    parser.add_argument('--num_sents', type=int, default=1000)
+    parser.add_argument('--n_nouns', type=int, default=50000)
+    parser.add_argument('--child', type=str, default=None, choices=modes)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.model_path, args.sentences_path)))
+        return
+
+    with tempfile.TemporaryDirectory() as dirname:
+        model_path = args.model_path
+        if model_path is None:
+            corpus = SyntheticCorpus(args.n_nouns, seed=0, n_nouns=args.n_nouns,
+                n_verbs=args.n_nouns // 5, n_adjectives=args.n_nouns // 10,
+                n_adverbs=args.n_nouns // 20)
+            trainer = CorpusTrainer(min_count_tag=1, verbose=False)
+            trainer.train(corpus)
+            model_path = os.path.join(dirname, 'model.json')
+            with open(model_path, 'w', encoding='utf-8') as f:
+                json.dump({'emission': trainer.emission_, 'transition':
+                    {' '.join(pair):score for pair, score in trainer.transition_.items()}},
+                    f, ensure_ascii=False)
+        elif not model_path.endswith('.json'):
+            raise ValueError('model_path must be a JSON model')
+
+        sents_path = os.path.join(dirname, 'sents.txt')
+        if args.sentences_path:
+            with open(args.sentences_path, encoding='utf-8') as f:
+                sents = [line.strip() for line in f if line.strip()][:args.num_sents]
+        else:
+            sents = SyntheticCorpus(args.num_sents, seed=1).texts
+        with open(sents_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(sents))
+
+        with open(model_path, encoding='utf-8') as f:
+            n_entries = sum(len(words) for words in json.load(f)['emission'].values())
+        print('{} emission entries, {} sents'.format(n_entries, len(sents)))
+        print('mode\tloaded MB\ttagged MB\tsame pos')
+        reference = None
+        for mode in modes:
+            result = run_child(mode, model_path, sents_path)
+            if reference is None:
+                reference = result['pos']
+            print('{}\t{:.1f}\t{:.1f}\t{}'.format(mode, result['loaded'],
+                result['tagged'], result['pos'] == reference))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Sentences/sec of TrainedHMMTagger.tag_batch with 1, 2, 4 and 8 workers
+
+    python parallel_scaling.py --model_path ../models/sejong_lr_sepxsv_hmm.json \
+        --sentences_path sentences.txt
+
+Without model and sentences, synthetic model and sentences are used.
+"""
+import argparse
+import sys
+import time
+sys.path.append('../')
+
+from hmm_postagger import TrainedHMMTagger
+from synthetic import SyntheticCorpus
+from synthetic import synthetic_model
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', type=str, default=None)
+    parser.add_argument('--sentences_path', type=str, default=None, help='one sentence per line')
+    parser.add_argument('--num_sents', type=int, default=10000)
+    parser.add_argument('--n_jobs', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--chunksize', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.model_path:
+        load_tagger = lambda: TrainedHMMTagger(args.model_path)
+    else:
+        emission, transition = synthetic_model()
+        load_tagger = lambda: TrainedHMMTagger(emission=emission, transition=transition)
+    if args.sentences_path:
+        with open(args.sentences_path, encoding='utf-8') as f:
+            sents = [line.strip() for line in f if line.strip()][:args.num_sents]
+    else:
+        sents = SyntheticCorpus(args.num_sents, seed=1).texts
+
+    base = None
+    print('n_jobs\tsents/sec\tspeedup')
+    for n_jobs in args.n_jobs:
+        # new tagger for each n_jobs, so that caches are empty
+        tagger = load_tagger()
+        t = time.perf_counter()
+        tagger.tag_batch(sents, n_jobs=n_jobs, chunksize=args.chunksize)
+        speed = len(sents) / (time.perf_counter() - t)
+        if base is None:
+            base = speed
+        print('{}\t{:.1f}\t{:.2f}'.format(n_jobs, speed, speed / base))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Accuracy and latency of lattice pruning settings on a held-out corpus
+
+    python pruning.py
+    python pruning.py --model_path ../models/sejong_lr_sepxsv_hmm.json --corpus test_corpus.txt
+
+Without --model_path and --corpus, synthetic model and corpus are used.
+For each setting, prints morpheme F1 against gold tags, sentence-level agreement
+with the unpruned tagger, and latency of the held-out sentences and of
+pathological inputs (eojeols joined without spaces).
+"""
+import argparse
+from collections import Counter
+import sys
+import time
+sys.path.append('../')
+
+from hmm_postagger import Corpus
+from hmm_postagger import TrainedHMMTagger
+from synthetic import SyntheticCorpus
+from synthetic import synthetic_model
+
+# (beam_width, score_margin, max_nodes_per_position)
+default_settings = [
+    (None, None, None),
+    (20, None, None),
+    (10, None, None),
+    (5, None, None),
+    (3, None, None),
+    (None, 30, None),
+    (None, 15, None),
+    (None, None, 10),
+    (None, None, 5),
+    (5, 15, 10),
+]
+
+def morpheme_f1(gold, pred):
+    gold = Counter(tuple(wt) for wt in gold)
+    pred = Counter(tuple(wt) for wt in pred)
+    n_correct = sum((gold & pred).values())
+    if n_correct == 0:
+        return 0.0
+    precision = n_correct / sum(pred.values())
+    recall = n_correct / sum(gold.values())
+    return 2 * precision * recall / (precision + recall)
+
+def measure(tagger, texts, setting):
+    beam_width, score_margin, max_nodes = setting
+    outputs = []
+    latency = []
+    for text in texts:
+        begin = time.perf_counter()
+        outputs.append(tagger.tag(text, beam_width=beam_width,
+            score_margin=score_margin, max_nodes_per_position=max_nodes))
+        latency.append((time.perf_counter() - begin) * 1000)
+    latency = sorted(latency)
+    p99 = latency[min(len(latency) - 1, int(len(latency) * 0.99))]
+    return outputs, sum(latency) / len(latency), p99
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', type=str, default=None)
+    parser.add_argument('--corpus', type=str, default=None, help='held-out corpus of word/tag format')
+    parser.add_argument('--num_sents', type=int, default=1000)
+    parser.add_argument('--n_pathological', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.model_path:
+        tagger = TrainedHMMTagger(args.model_path)
+    else:
+        emission, transition = synthetic_model()
+        tagger = TrainedHMMTagger(transition=transition, emission=emission)
+
+    if args.corpus:
+        gold = [sent for sent in Corpus(args.corpus, num_sent=args.num_sents) if sent]
+        # eojeol boundaries are not in corpus. use a sentence of morphemes
+        texts = [' '.join(word for word, _ in sent) for sent in gold]
+    else:
+        corpus = SyntheticCorpus(args.num_sents, seed=1)
+        gold = list(corpus)
+        texts = corpus.texts
+    # long strings without spaces
+    pathological = [''.join(texts[i:i + 10]).replace(' ', '')
+        for i in range(0, min(len(texts), args.n_pathological * 10), 10)]
+
+    # warm up caches, so that the first setting is not slower
+    for text in texts + pathological:
+        tagger.tag(text)
+
+    print('beam  margin  max_nodes | F1      agreement | mean ms  p99 ms | long mean ms  p99 ms')
+    reference = None
+    for setting in default_settings:
+        outputs, mean, p99 = measure(tagger, texts, setting)
+        _, long_mean, long_p99 = measure(tagger, pathological, setting)
+        if reference is None:
+            reference = outputs
+        f1 = sum(morpheme_f1(g, p) for g, p in zip(gold, outputs)) / len(gold)
+        agreement = sum(p == r for p, r in zip(outputs, reference)) / len(outputs)
+        print('{:>4}  {:>6}  {:>9} | {:.4f}  {:>9.2%} | {:>7.3f}  {:>6.3f} | {:>12.3f}  {:>6.3f}'.format(
+            *[('-' if v is None else v) for v in setting], f1, agreement, mean, p99, long_mean, long_p99))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""tag_batch time of overlapping daily batches with and without result cache
+
+    python result_cache.py --num_sents 5000 --overlap 0.9
+    python result_cache.py --model_path ../models/sejong_lr_sepxsv_hmm.json --sentences_path sentences.txt
+
+The sentences of day 2 are overlap of day 1 plus new sentences. Each day is
+tagged by a new tagger, which opens the same cache file. Prints time and hit
+rate of each day, and checks that the results equal to those without cache.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+sys.path.append('../')
+
+from hmm_postagger import TrainedHMMTagger
+from synthetic import SyntheticCorpus
+from synthetic import synthetic_model
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', type=str, default=None)
+    parser.add_argument('--sentences_path', type=str, default=None, help='one sentence per line')
+    parser.add_argument('--num_sents', type=int, default=5000)
+    parser.add_argument('--overlap', type=float, default=0.9)
+    parser.add_argument('--chunksize', type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.model_path:
+        load_tagger = lambda: TrainedHMMTagger(args.model_path)
+    else:
+        emission, transition = synthetic_model()
+        load_tagger = lambda: TrainedHMMTagger(emission=emission, transition=transition)
+    n_old = int(args.num_sents * args.overlap)
+    if args.sentences_path:
+        with open(args.sentences_path, encoding='utf-8') as f:
+            sents = [line.strip() for line in f if line.strip()][:2 * args.num_sents - n_old]
+    else:
+        sents = SyntheticCorpus(2 * args.num_sents - n_old, seed=1).texts
+    days = [sents[:args.num_sents], sents[args.num_sents - n_old:]]
+
+    print('day\tcache\tsec\thit rate\tentries\tMB\tsame pos')
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'results.sqlite')
+        for day, day_sents in enumerate(days, 1):
+            for use_cache in (False, True):
+                tagger = load_tagger()
+                if use_cache:
+                    cache = tagger.enable_result_cache(path)
+                begin = time.perf_counter()
+                pos = tagger.tag_batch(day_sents, chunksize=args.chunksize)
+                sec = time.perf_counter() - begin
+                if not use_cache:
+                    reference = pos
+                    print('{}\tno\t{:.2f}'.format(day, sec))
+                    continue
+                info = cache.info()
+                print('{}\tyes\t{:.2f}\t{:.1%}\t{}\t{:.1f}\t{}'.format(day, sec, info.hit_rate,
+                    info.currsize, info.nbytes / 2**20, pos == reference))
+                tagger.disable_result_cache().close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Benchmark of tagging and training throughput, latency and memory
+
+    python run.py --output result.json
+    python run.py --output new.json --compare result.json --tolerance 0.1
+
+All inputs are generated by synthetic.SyntheticCorpus, so results of the same
+arguments are comparable across commits. With --compare, metrics which are
+worse than baseline by more than tolerance are reported and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+sys.path.append('../')
+
+from hmm_postagger import CorpusTrainer
+from hmm_postagger import TrainedHMMTagger
+from synthetic import SyntheticCorpus
+
+length_buckets = [(0, 10), (10, 20), (20, 40), (40, 80), (80, None)]
+eojeol_buckets = [(1, 3), (3, 6), (6, 11), (11, None)]
+
+def bucket_name(value, buckets):
+    for begin, end in buckets:
+        if end is None or value < end:
+            return '{}-{}'.format(begin, '' if end is None else end - 1)
+
+def percentiles(values, prefix):
+    values = sorted(values)
+    if not values:
+        return {}
+    metrics = {}
+    for p in [50, 90, 99]:
+        index = min(len(values) - 1, int(len(values) * p / 100))
+        metrics['{}.p{}'.format(prefix, p)] = values[index]
+    metrics[prefix + '.mean'] = sum(values) / len(values)
+    return metrics
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes in Linux, bytes in macOS
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+def measure_train(corpus):
+    trainer = CorpusTrainer(min_count_tag=1, verbose=False)
+    begin = time.perf_counter()
+    trainer.train(corpus)
+    elapsed = time.perf_counter() - begin
+    return trainer, {'train.sents_per_sec': len(corpus) / elapsed}
+
+def measure_load(trainer, dirname, repeats=3):
+    metrics = {}
+    for fmt in ['json', 'bin']:
+        model_path = os.path.join(dirname, 'model.' + fmt)
+        trainer._save(model_path)
+        elapsed = []
+        for _ in range(repeats):
+            begin = time.perf_counter()
+            TrainedHMMTagger(model_path)
+            elapsed.append(time.perf_counter() - begin)
+        metrics['load.{}.sec'.format(fmt)] = min(elapsed)
+    return metrics
+
+def measure_latency(tagger, texts):
+    latency = []
+    by_length = {}
+    by_eojeol = {}
+    for text in texts:
+        begin = time.perf_counter()
+        tagger.tag(text)
+        ms = (time.perf_counter() - begin) * 1000
+        latency.append(ms)
+        by_length.setdefault(bucket_name(len(text.replace(' ', '')), length_buckets), []).append(ms)
+        by_eojeol.setdefault(bucket_name(len(text.split()), eojeol_buckets), []).append(ms)
+
+    metrics = percentiles(latency, 'tag.latency_ms')
+    for name, values in by_length.items():
+        metrics.update(percentiles(values, 'tag.latency_ms.chars={}'.format(name)))
+    for name, values in by_eojeol.items():
+        metrics.update(percentiles(values, 'tag.latency_ms.eojeols={}'.format(name)))
+    return metrics
+
+def measure_batch(trainer, texts, n_jobs_list, chunksize):
+    metrics = {}
+    for n_jobs in n_jobs_list:
+        # new tagger for each n_jobs, so that caches are empty
+        tagger = TrainedHMMTagger(transition=trainer.transition_, emission=trainer.emission_)
+        begin = time.perf_counter()
+        tagger.tag_batch(texts, n_jobs=n_jobs, chunksize=chunksize)
+        elapsed = time.perf_counter() - begin
+        metrics['batch.n_jobs={}.sents_per_sec'.format(n_jobs)] = len(texts) / elapsed
+    return metrics
+
+def higher_is_better(name):
+    return name.endswith('sents_per_sec')
+
+def compare(result, baseline, tolerance):
+    """Returns list of (name, baseline value, new value, relative change) of regressions"""
+    regressions = []
+    for name, base in baseline['metrics'].items():
+        value = result['metrics'].get(name)
+        if value is None or base == 0:
+            continue
+        change = (value - base) / base
+        worse = -change if higher_is_better(name) else change
+        if worse > tolerance:
+            regressions.append((name, base, value, change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', type=str, default=None, help='JSON result path')
+    parser.add_argument('--compare', type=str, default=None, help='baseline JSON result path')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--n_train_sents', type=int, default=20000)
+    parser.add_argument('--n_test_sents', type=int, default=2000)
+    parser.add_argument('--n_jobs', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--chunksize', type=int, default=100)
+    args = parser.parse_args()
+
+    train_corpus = SyntheticCorpus(args.n_train_sents, seed=args.seed)
+    test_corpus = SyntheticCorpus(args.n_test_sents, seed=args.seed + 1)
+
+    metrics = {}
+    trainer, train_metrics = measure_train(train_corpus)
+    metrics.update(train_metrics)
+    with tempfile.TemporaryDirectory() as dirname:
+        metrics.update(measure_load(trainer, dirname))
+
+    tagger = TrainedHMMTagger(transition=trainer.transition_, emission=trainer.emission_)
+    metrics.update(measure_latency(tagger, test_corpus.texts))
+    metrics.update(measure_batch(trainer, test_corpus.texts, args.n_jobs, args.chunksize))
+    metrics['memory.peak_rss_mb'] = peak_rss_mb()
+
+    result = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': vars(args),
+        },
+        'metrics': metrics
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(result, indent=2, sort_keys=True))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for name, base, value, change in regressions:
+            print('REGRESSION {}: {:.4g} -> {:.4g} ({:+.1%})'.format(name, base, value, change),
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print('no regression (tolerance {:.0%})'.format(args.tolerance), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Size of SurfaceTable and tag() time with and without it
+
+    python surface_table.py --max_stems 500 --max_endings 100
+    python surface_table.py --model_path ../models/sejong_lr_sepxsv_hmm.json --sentences_path sentences.txt
+
+For each setting, a new tagger tags the sentences once (cold caches) and
+once more (warm caches). Prints table size and build time, time of
+_lemmatize, tag() time, and the rate of _lemmatize calls answered by the table.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+sys.path.append('../')
+
+from hmm_postagger import TrainedHMMTagger
+from hmm_postagger.lemmatizer import _lemma_cache
+from synthetic import SyntheticCorpus
+from synthetic import synthetic_model
+
+def run(tagger, sents):
+    # counts _lemmatize calls and time spent in it. tag() runs on the snapshot
+    snapshot = tagger._snapshot
+    lemmatize = snapshot._lemmatize
+    stats = {'calls': 0, 'hits': 0, 'sec': 0.0}
+    table = snapshot.surface_table
+
+    def lemmatize_(word, i):
+        begin = time.perf_counter()
+        lemmas = lemmatize(word, i)
+        stats['sec'] += time.perf_counter() - begin
+        stats['calls'] += 1
+        stats['hits'] += (table is not None and (word, i) in table)
+        return lemmas
+
+    snapshot._lemmatize = lemmatize_
+    # lemma_candidate cache is shared by taggers
+    _lemma_cache.clear()
+    begin = time.perf_counter()
+    pos = [tagger.tag(sent) for sent in sents]
+    stats['tag_sec'] = time.perf_counter() - begin
+    del snapshot._lemmatize
+    return pos, stats
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', type=str, default=None)
+    parser.add_argument('--sentences_path', type=str, default=None, help='one sentence per line')
+    parser.add_argument('--num_sents', type=int, default=2000)
+    parser.add_argument('--max_stems', type=int, default=None)
+    parser.add_argument('--max_endings', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.model_path:
+        load_tagger = lambda: TrainedHMMTagger(args.model_path)
+    else:
+        emission, transition = synthetic_model()
+        load_tagger = lambda: TrainedHMMTagger(emission=emission, transition=transition)
+    if args.sentences_path:
+        with open(args.sentences_path, encoding='utf-8') as f:
+            sents = [line.strip() for line in f if line.strip()][:args.num_sents]
+    else:
+        sents = SyntheticCorpus(args.num_sents, seed=1).texts
+
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'surface.bin')
+        tagger = load_tagger()
+        begin = time.perf_counter()
+        table = tagger.build_surface_table(path, args.max_stems, args.max_endings)
+        build_sec = time.perf_counter() - begin
+        begin = time.perf_counter()
+        tagger.load_surface_table(path)
+        load_sec = time.perf_counter() - begin
+        print('table: {} entries, {:.1f} KB file, build {:.2f} sec, load {:.3f} sec'.format(
+            len(table), os.path.getsize(path) / 1024, build_sec, load_sec))
+
+        print('table\tcaches\ttag sec\tlemmatize sec\tcalls\ttable hits')
+        reference = None
+        for use_table in (False, True):
+            tagger = load_tagger()
+            if use_table:
+                tagger.load_surface_table(path)
+            for caches in ('cold', 'warm'):
+                pos, stats = run(tagger, sents)
+                if reference is None:
+                    reference = pos
+                assert pos == reference
+                print('{}\t{}\t{:.3f}\t{:.3f}\t{}\t{:.1%}'.format(
+                    'yes' if use_table else 'no', caches, stats['tag_sec'], stats['sec'],
+                    stats['calls'], stats['hits'] / max(stats['calls'], 1)))
+
+if __name__ == '__main__':
+    main()
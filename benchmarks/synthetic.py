@@ -0,0 +1,102 @@
+"""Deterministic synthetic corpus for benchmarks. Sejong corpus is not required"""
+from itertools import accumulate
+import random
+import sys
+sys.path.append('../')
+
+from hmm_postagger import CorpusTrainer
+
+josa_list = ['이', '가', '은', '는', '을', '를', '에', '에서', '으로', '와', '과', '도', '만', '의']
+eomi_list = ['다', '고', '는', '지', '면', '서', '니까', '었다', '았다', '어서', '는데', '습니다', '었어요', '겠다']
+
+# tag sequences of eojeol
+eojeol_templates = [
+    (['Noun', 'Josa'], 30),
+    (['Noun'], 10),
+    (['Noun', 'Noun', 'Josa'], 8),
+    (['Verb', 'Eomi'], 20),
+    (['Adjective', 'Eomi'], 10),
+    (['Adverb'], 6),
+    (['Determiner'], 4),
+    (['Exclamation'], 1),
+]
+
+def make_words(rng, n_words, min_len, max_len):
+    words = set()
+    while len(words) < n_words:
+        length = rng.randint(min_len, max_len)
+        words.add(''.join(chr(0xAC00 + rng.randrange(11172)) for _ in range(length)))
+    return sorted(words)
+
+class SyntheticCorpus:
+    """Tagged sentences and their raw text.
+
+    Words of each tag are sampled from Zipfian distribution, so a few words
+    appear very often like in real text.
+    """
+
+    def __init__(self, n_sents=10000, seed=0, vocab_seed=0, n_nouns=5000,
+        n_verbs=1000, n_adjectives=500, n_adverbs=300, n_determiners=30,
+        n_exclamations=30, min_eojeols=1, max_eojeols=15, noise=0.05):
+
+        # sentences of different seeds share vocabulary of the same vocab_seed
+        rng = random.Random(vocab_seed)
+        self.vocab = {
+            'Noun': make_words(rng, n_nouns, 1, 4),
+            'Verb': make_words(rng, n_verbs, 1, 2),
+            'Adjective': make_words(rng, n_adjectives, 1, 3),
+            'Adverb': make_words(rng, n_adverbs, 2, 3),
+            'Determiner': make_words(rng, n_determiners, 1, 1),
+            'Exclamation': make_words(rng, n_exclamations, 2, 3),
+            'Josa': josa_list,
+            'Eomi': eomi_list,
+        }
+        # cumulative, so that sampling does not sum the weights every time
+        self.weights = {tag:list(accumulate(1 / (rank + 1) for rank in range(len(words))))
+                        for tag, words in self.vocab.items()}
+        rng = random.Random(seed)
+        templates = [template for template, _ in eojeol_templates]
+        template_weights = [weight for _, weight in eojeol_templates]
+
+        self.sents = []
+        self.texts = []
+        for _ in range(n_sents):
+            n_eojeols = rng.randint(min_eojeols, max_eojeols)
+            sent = []
+            eojeols = []
+            for template in rng.choices(templates, template_weights, k=n_eojeols):
+                if rng.random() < noise:
+                    # irregular eojeol, so that most of tag bigrams are observed
+                    template = rng.choices(list(self.vocab), k=rng.randint(1, 3))
+                morphs = [(self.sample(rng, tag), tag) for tag in template]
+                sent += morphs
+                eojeols.append(''.join(word for word, _ in morphs))
+            self.sents.append(sent)
+            self.texts.append(' '.join(eojeols))
+
+    def sample(self, rng, tag):
+        return rng.choices(self.vocab[tag], cum_weights=self.weights[tag])[0]
+
+    def __iter__(self):
+        # same format with hmm_postagger.Corpus
+        for sent in self.sents:
+            yield [[word, tag] for word, tag in sent]
+
+    def __len__(self):
+        return len(self.sents)
+
+    def save(self, corpus_path, text_path=None):
+        with open(corpus_path, 'w', encoding='utf-8') as f:
+            for sent in self.sents:
+                f.write(' '.join('{}/{}'.format(word, tag) for word, tag in sent) + '\n')
+        if text_path:
+            with open(text_path, 'w', encoding='utf-8') as f:
+                for text in self.texts:
+                    f.write(text + '\n')
+
+def synthetic_model(n_sents=10000, seed=0):
+    """Returns emission, transition trained from SyntheticCorpus"""
+    corpus = SyntheticCorpus(n_sents, seed)
+    trainer = CorpusTrainer(min_count_tag=1, verbose=False)
+    trainer.train(corpus)
+    return trainer.emission_, trainer.transition_
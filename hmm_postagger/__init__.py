@@ -1,5 +1,9 @@
+from .corpus_reader import CorpusReader
 from .lemmatizer import lemma_candidate
+from .lexicon import Lexicon
 from .path import ford_list
+from .path import viterbi
+from .pipeline import tag_file
 from .trainer import CorpusTrainer
 from .tagger import TrainedHMMTagger
 from .utils import Corpus
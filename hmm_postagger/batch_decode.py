@@ -0,0 +1,186 @@
+"""Viterbi decoding of many lattices at once with NumPy
+
+Every edge (u, v) of a lattice satisfies u[4] == v[3], so the best score of
+the nodes which begin at position p is a max-plus product of the scores of
+the nodes which end at p and the edge weights between them. The lattices of
+a batch are stored as padded arrays
+
+    W[s, p, k, j] : weight of edge from k-th node ending at p to j-th node
+                    beginning at p in sentence s, or -inf
+    R[s, p, k, j] : index of the edge in E, to break ties as path.viterbi
+
+and the recursion runs over positions for the whole batch. Scores are the
+same float64 sums with viterbi, and a tie is won by the first edge of E, so
+paths are equal to those of viterbi.
+
+NumPy is optional. viterbi_batch raises ImportError without it.
+"""
+from itertools import chain
+from operator import itemgetter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .path import viterbi
+
+_no_rank = np.iinfo(np.int64).max if np is not None else None
+_first, _second, _third = itemgetter(0), itemgetter(1), itemgetter(2)
+
+def _local_index(keys):
+    # index of each item among the items of the same key, in order of items
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    local = np.empty(len(keys), dtype=np.int64)
+    local[order] = np.arange(len(keys)) - np.searchsorted(sorted_keys, sorted_keys)
+    return local
+
+def _nodes_of(E, S):
+    # S is node 0
+    return list(dict.fromkeys(chain((S,), map(_first, E), map(_second, E))))
+
+def viterbi_batch(lattices, batch_size=64, max_cells=1 << 21):
+    """Returns [(path, cost)] of list of (E, S, T), same with path.viterbi
+
+    Lattices are sorted by the number of edges and decoded in batches of at
+    most batch_size. A batch is split so that W and R have at most max_cells
+    items (16 bytes each), and a lattice which is larger than that alone is
+    decoded by viterbi. Raises ValueError if a lattice has no path from S to T.
+    """
+    if np is None:
+        raise ImportError('viterbi_batch requires numpy')
+    results = [None] * len(lattices)
+    order = sorted(range(len(lattices)), key=lambda i: len(lattices[i][0]))
+    for b in range(0, len(order), batch_size):
+        batch = order[b:b + batch_size]
+        for i, result in zip(batch, _decode([lattices[i] for i in batch], max_cells)):
+            results[i] = result
+    return results
+
+def _split(sizes, max_cells):
+    # consecutive groups of which len * max(P) * max(K) * max(J) <= max_cells
+    groups, group, shape = [], [], (0, 0, 0)
+    for s, size in enumerate(sizes):
+        merged = tuple(map(max, shape, size))
+        if group and (len(group) + 1) * merged[0] * merged[1] * merged[2] > max_cells:
+            groups.append(group)
+            group, merged = [], size
+        group.append(s)
+        shape = merged
+    groups.append(group)
+    return groups
+
+def _decode(lattices, max_cells):
+    # node and edge arrays of all lattices, with global node ids
+    nodes, us, vs, ws, node_sent, edge_sent, edge_rank, targets = [], [], [], [], [], [], [], []
+    for s, (E, S, T) in enumerate(lattices):
+        nodes_ = _nodes_of(E, S)
+        ids = dict(zip(nodes_, range(len(nodes), len(nodes) + len(nodes_))))
+        targets.append(ids.get(T, -1))
+        nodes += nodes_
+        us += map(ids.__getitem__, map(_first, E))
+        vs += map(ids.__getitem__, map(_second, E))
+        ws += map(_third, E)
+        node_sent += [s] * len(nodes_)
+        edge_sent += [s] * len(E)
+        edge_rank += range(len(E))
+    us, vs = np.array(us, dtype=np.int64), np.array(vs, dtype=np.int64)
+    ws = np.array(ws, dtype=np.float64)
+    node_sent, edge_sent = np.array(node_sent, dtype=np.int64), np.array(edge_sent, dtype=np.int64)
+    edge_rank = np.array(edge_rank, dtype=np.int64)
+    begin = np.array(list(map(itemgetter(3), nodes)), dtype=np.int64)
+    end = np.array(list(map(itemgetter(4), nodes)), dtype=np.int64)
+    # S is stored before position 0, so that it never becomes a target
+    is_source = np.zeros(len(nodes), dtype=bool)
+    first_node = np.searchsorted(node_sent, np.arange(len(lattices)))
+    is_source[first_node] = True
+    begin[is_source] = -1
+
+    # otherwise the recursion over positions is not in topological order
+    invalid = set(edge_sent[end[us] != begin[vs]].tolist())
+    invalid.update(node_sent[~is_source & (begin >= end)].tolist())
+    invalid.update(s for s, t in enumerate(targets) if t < 0)
+    if invalid:
+        results = [None] * len(lattices)
+        valid = [s for s in range(len(lattices)) if s not in invalid]
+        for s in invalid:
+            results[s] = viterbi(*lattices[s])
+        for s, result in zip(valid, _decode([lattices[s] for s in valid], max_cells) if valid else []):
+            results[s] = result
+        return results
+
+    B = len(lattices)
+    P = int(end.max()) + 1
+    k = _local_index(node_sent * (P + 1) + end)
+    j = _local_index(node_sent * (P + 1) + begin + 1)
+    K, J = int(k.max()) + 1, int(j.max()) + 1
+    if B * P * K * J > max_cells:
+        if B == 1:
+            return [viterbi(*lattices[0])]
+        # shape (P, K, J) of each lattice
+        sizes = np.zeros((B, 3), dtype=np.int64)
+        np.maximum.at(sizes[:, 0], node_sent, end + 1)
+        np.maximum.at(sizes[:, 1], node_sent, k + 1)
+        np.maximum.at(sizes[:, 2], node_sent, j + 1)
+        results = []
+        for group in _split(sizes.tolist(), max_cells):
+            results += _decode([lattices[s] for s in group], max_cells)
+        return results
+
+    # best score of node n is D[s, (begin[n] + 1) * J + j[n]]. The last slot is padding
+    n_slots = (P + 1) * J
+    slot = (begin + 1) * J + j
+    src = np.full((B, P, K), n_slots, dtype=np.int64)
+    src[node_sent, end, k] = slot
+    node_at = np.zeros((B, P, K), dtype=np.int64)
+    node_at[node_sent, end, k] = np.arange(len(nodes))
+
+    # W: weights of edges from k-th node ending at p to j-th node beginning at p
+    # R: indices of the edges in E, to break ties as viterbi
+    W = np.full((B, P, K, J), -np.inf)
+    R = np.full((B, P, K, J), _no_rank, dtype=np.int64)
+    keys = ((edge_sent * P + end[us]) * K + k[us]) * J + j[vs]
+    # of duplicated edges, the first one of the max weight wins
+    order = np.lexsort((-ws, keys))
+    keys, first = np.unique(keys[order], return_index=True)
+    W.reshape(-1)[keys] = ws[order[first]]
+    R.reshape(-1)[keys] = edge_rank[order[first]]
+
+    D = np.full((B, n_slots + 1), -np.inf)
+    D[:, 0] = 0.0
+    prev = np.zeros((B, P, J), dtype=np.int64)
+    for p in range(P - 1):
+        scores = np.take_along_axis(D, src[:, p], axis=1)[:, :, None] + W[:, p]
+        best = scores.max(axis=1)
+        ranks = np.where(scores == best[:, None, :], R[:, p], _no_rank)
+        prev[:, p] = ranks.argmin(axis=1)
+        D[:, (p + 1) * J:(p + 2) * J] = best
+
+    targets = np.array(targets, dtype=np.int64)
+    rows = np.arange(B)
+    costs = D[rows, slot[targets]]
+    if np.isneginf(costs).any():
+        s = int(np.argmax(np.isneginf(costs)))
+        raise ValueError('There is no path from {} to {}'.format(
+            nodes[first_node[s]], nodes[targets[s]]))
+
+    # backtrack all lattices together, until every path reaches its S
+    steps = [targets]
+    current = targets
+    while True:
+        done = is_source[current]
+        if done.all():
+            break
+        p = np.maximum(begin[current], 0)
+        current = np.where(done, current,
+            node_at[rows, p, prev[rows, p, j[current]]])
+        steps.append(current)
+    paths = np.array(steps[::-1]).T.tolist()
+    first_node = first_node.tolist()
+    results = []
+    for s, path in enumerate(paths):
+        # a shorter path begins with repeated S
+        path = path[len(path) - 1 - path[::-1].index(first_node[s]):]
+        results.append(([nodes[n] for n in path], float(costs[s])))
+    return results
@@ -0,0 +1,535 @@
+"""Compact binary HMM model which is loaded with mmap
+
+Layout (little endian, every section is 8-byte aligned)
+
+    header   : magic, n_tags, n_emission_tags, n_words, n_entries
+               and (offset, nbytes) of each section
+    tags     : uint32 offsets[n_tags+1] + utf-8 blob
+    words    : uint32 offsets[n_words+1] + utf-8 blob, sorted
+    emission : tag-major CSR. uint32 tag_ptr[n_tags+1],
+               uint32 word ids[n_entries], float64 scores[n_entries]
+    lexicon  : word-major CSR. uint32 word_ptr[n_words+1], uint16 tag ids[n_entries]
+    transition : float64[n_tags * n_tags], nan if not exist
+
+Quantized models (quantize='float16' or 'uint8') store 2 or 1 byte codes in
+tag_scores and transition, and four more float64[n_tags] sections:
+scale and offset of each tag's emission and of each transition row.
+A score is offset + scale * value of its code, where the value of uint8
+code is the code itself (255 means nan) and the value of float16 code is
+the half precision float in [0, 1].
+
+The first n_emission_tags tags are the keys of emission. The others
+(BOS, EOS, ...) appear only in transition. Pages of mmap are shared among
+processes which load the same file.
+"""
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+import hashlib
+import json
+import math
+import mmap
+import struct
+import sys
+
+from .lexicon import Lexicon
+from .utils import check_dirs
+from .utils import LRUCache
+
+MAGIC = b'HMMPOS\x00\x01'
+# magic of quantized models
+QUANTIZED_MAGICS = {'float16': b'HMMPOS\x00\x02', 'uint8': b'HMMPOS\x00\x03'}
+SECTIONS = ('tag_offsets', 'tag_blob', 'word_offsets', 'word_blob',
+    'tag_ptr', 'tag_words', 'tag_scores', 'word_ptr', 'word_tags', 'transition')
+QUANTIZED_SECTIONS = SECTIONS + ('score_scale', 'score_offset',
+    'transition_scale', 'transition_offset')
+SECTION_TYPES = {'tag_offsets': 'I', 'word_offsets': 'I', 'tag_ptr': 'I',
+    'tag_words': 'I', 'tag_scores': 'd', 'word_ptr': 'I', 'word_tags': 'H',
+    'transition': 'd', 'score_scale': 'd', 'score_offset': 'd',
+    'transition_scale': 'd', 'transition_offset': 'd'}
+# typecode of quantized codes
+CODE_TYPES = {'float16': 'H', 'uint8': 'B'}
+_header = struct.Struct('<8s4I' + 'QQ' * len(SECTIONS))
+_quantized_header = struct.Struct('<8s4I' + 'QQ' * len(QUANTIZED_SECTIONS))
+
+_uint8_nan = 255
+_float16_nan = 0x7e00
+_code_values = {}
+
+def _code_values_of(quantize):
+    """Value of each code. Built once"""
+    if quantize not in _code_values:
+        if quantize == 'uint8':
+            values = array('d', range(256))
+            values[_uint8_nan] = math.nan
+        else:
+            values = array('d', struct.unpack('<65536e', struct.pack('<65536H', *range(65536))))
+        _code_values[quantize] = values
+    return _code_values[quantize]
+
+def is_binary_model(path):
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+    return magic == MAGIC or magic in QUANTIZED_MAGICS.values()
+
+def save_binary_model(model_path, emission, transition, quantize=None):
+    """Write {tag:{word:score}} emission and {(tag0, tag1):score} transition
+
+    quantize is None (float64), 'float16' or 'uint8'
+    """
+    check_dirs(model_path)
+    with open(model_path, 'wb') as f:
+        f.write(dump_binary_model(emission, transition, quantize))
+
+def _quantize(scores, quantize):
+    """Returns (codes, scale, offset) of a list of scores"""
+    finite = [score for score in scores if score == score]
+    offset = min(finite) if finite else 0.0
+    width = (max(finite) - offset) if finite else 0.0
+    if quantize == 'uint8':
+        scale = width / 254 if width > 0 else 1.0
+        codes = array('B', (round((score - offset) / scale) if score == score else _uint8_nan
+            for score in scores))
+    elif quantize == 'float16':
+        scale = width if width > 0 else 1.0
+        codes = array('H', struct.unpack('<%dH' % len(scores), struct.pack('<%de' % len(scores),
+            *((score - offset) / scale for score in scores))))
+        # every nan has the same code
+        for i, score in enumerate(scores):
+            if score != score:
+                codes[i] = _float16_nan
+    else:
+        raise ValueError('quantize must be float16 or uint8: {}'.format(quantize))
+    return codes, scale, offset
+
+def dump_binary_model(emission, transition, quantize=None):
+    """Returns bytes of binary model"""
+    emission_tags = sorted(emission)
+    other_tags = sorted({tag for pair in transition for tag in pair} - set(emission))
+    tags = emission_tags + other_tags
+    tag_index = {tag:i for i, tag in enumerate(tags)}
+    words = sorted({word for observations in emission.values() for word in observations})
+    word_index = {word:i for i, word in enumerate(words)}
+
+    # tag-major emission
+    tag_ptr, tag_words, tag_scores = array('I', [0]), array('I'), array('d')
+    # word-major lexicon
+    word_tag_lists = [[] for _ in words]
+    for i, tag in enumerate(tags):
+        observations = emission.get(tag, {})
+        for wid, word in sorted((word_index[word], word) for word in observations):
+            tag_words.append(wid)
+            tag_scores.append(observations[word])
+            word_tag_lists[wid].append(i)
+        tag_ptr.append(len(tag_words))
+    word_ptr, word_tags = array('I', [0]), array('H')
+    for tag_list in word_tag_lists:
+        word_tags.extend(tag_list)
+        word_ptr.append(len(word_tags))
+
+    n_tags = len(tags)
+    matrix = array('d', [math.nan]) * (n_tags * n_tags)
+    for (tag0, tag1), score in transition.items():
+        matrix[tag_index[tag0] * n_tags + tag_index[tag1]] = score
+
+    tag_offsets, tag_blob = _encode_strings(tags)
+    word_offsets, word_blob = _encode_strings(words)
+    sections = {'tag_offsets': tag_offsets, 'tag_blob': tag_blob,
+        'word_offsets': word_offsets, 'word_blob': word_blob,
+        'tag_ptr': tag_ptr, 'tag_words': tag_words, 'tag_scores': tag_scores,
+        'word_ptr': word_ptr, 'word_tags': word_tags, 'transition': matrix}
+
+    magic, header_struct, names = MAGIC, _header, SECTIONS
+    if quantize is not None:
+        if quantize not in QUANTIZED_MAGICS:
+            raise ValueError('quantize must be float16 or uint8: {}'.format(quantize))
+        magic, header_struct, names = QUANTIZED_MAGICS[quantize], _quantized_header, QUANTIZED_SECTIONS
+        for scores_name, ptr, n_rows in [('tag_scores', tag_ptr, n_tags),
+            ('transition', range(0, n_tags * n_tags + 1, n_tags), n_tags)]:
+            # each tag (row) has its own scale and offset
+            prefix = 'score' if scores_name == 'tag_scores' else 'transition'
+            scores = sections[scores_name]
+            codes = array(CODE_TYPES[quantize])
+            scales, offsets = array('d'), array('d')
+            for i in range(n_rows):
+                codes_, scale, offset = _quantize(scores[ptr[i]:ptr[i+1]].tolist(), quantize)
+                codes.extend(codes_)
+                scales.append(scale)
+                offsets.append(offset)
+            sections[scores_name] = codes
+            sections[prefix + '_scale'] = scales
+            sections[prefix + '_offset'] = offsets
+
+    position = _align(header_struct.size)
+    locations = []
+    payloads = []
+    for name in names:
+        data = sections[name]
+        if isinstance(data, array):
+            if sys.byteorder != 'little':
+                data = array(data.typecode, data)
+                data.byteswap()
+            data = data.tobytes()
+        locations += [position, len(data)]
+        payloads.append((position, data))
+        position = _align(position + len(data))
+
+    header = header_struct.pack(magic, n_tags, len(emission_tags), len(words),
+        len(tag_words), *locations)
+    buffer = bytearray(header)
+    for position, data in payloads:
+        buffer += b'\x00' * (position - len(buffer))
+        buffer += data
+    return bytes(buffer)
+
+def convert_json_to_binary(json_path, binary_path, quantize=None):
+    with open(json_path, encoding='utf-8') as f:
+        model = json.load(f)
+    transition = {tuple(states.split()):prob for states, prob in model['transition'].items()}
+    save_binary_model(binary_path, model['emission'], transition, quantize)
+
+def _align(position):
+    return (position + 7) // 8 * 8
+
+def _encode_strings(strings):
+    offsets = array('I', [0])
+    blob = bytearray()
+    for s in strings:
+        blob += s.encode('utf-8')
+        offsets.append(len(blob))
+    return offsets, bytes(blob)
+
+
+class _StringTable:
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self._blob[self._offsets[i]:self._offsets[i+1]], 'utf-8')
+
+    def index(self, s):
+        i = bisect_left(self, s)
+        if i < len(self) and self[i] == s:
+            return i
+        return -1
+
+
+class _WordList(list):
+    """Sorted list of interned words. index() is binary search"""
+
+    def index(self, s):
+        i = bisect_left(self, s)
+        if i < len(self) and self[i] == s:
+            return i
+        return -1
+
+
+class BinaryModel:
+    """Read-only view of a binary model file. It is pickled as its path
+
+    If path is None, data is the bytes of model (see dump_binary_model) and
+    words are decoded once into a list of interned strings.
+    """
+
+    def __init__(self, path, word_cache_size=100000, data=None):
+        self.path = path
+        if path is None:
+            self._data = data
+            buffer = memoryview(data)
+        else:
+            with open(path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            buffer = memoryview(self._mmap)
+        magic = bytes(buffer[:len(MAGIC)])
+        # None, 'float16' or 'uint8'
+        self.quantize = None
+        header_struct, names, types = _header, SECTIONS, SECTION_TYPES
+        for quantize, magic_ in QUANTIZED_MAGICS.items():
+            if magic == magic_:
+                self.quantize = quantize
+                header_struct, names = _quantized_header, QUANTIZED_SECTIONS
+                types = dict(SECTION_TYPES, tag_scores=CODE_TYPES[quantize],
+                    transition=CODE_TYPES[quantize])
+        if magic != MAGIC and self.quantize is None:
+            raise ValueError('{} is not a binary hmm model'.format(path))
+        header = header_struct.unpack_from(buffer)
+        self.n_tags, self.n_emission_tags, self.n_words, self.n_entries = header[1:5]
+
+        sections = {}
+        for i, name in enumerate(names):
+            position, nbytes = header[5 + 2 * i], header[6 + 2 * i]
+            data = buffer[position:position+nbytes]
+            typecode = types.get(name)
+            if typecode is not None:
+                if sys.byteorder == 'little':
+                    data = data.cast(typecode)
+                else:
+                    data = array(typecode, data.tobytes())
+                    data.byteswap()
+            sections[name] = data
+
+        self.tags = list(_StringTable(sections['tag_offsets'], sections['tag_blob']))
+        self.tag_index = {tag:i for i, tag in enumerate(self.tags)}
+        self.words = _StringTable(sections['word_offsets'], sections['word_blob'])
+        if path is None:
+            self.words = _WordList(sys.intern(word) for word in self.words)
+        self._tag_ptr = sections['tag_ptr']
+        self._tag_words = sections['tag_words']
+        self._tag_scores = sections['tag_scores']
+        self._word_ptr = sections['word_ptr']
+        self._word_tags = sections['word_tags']
+        self._transition = sections['transition']
+        self._word_ids = LRUCache(maxsize=word_cache_size)
+        self._fingerprint = None
+        # decoding of quantized scores
+        self._code_values = None
+        if self.quantize is not None:
+            self._code_values = _code_values_of(self.quantize)
+            self._score_scale = sections['score_scale']
+            self._score_offset = sections['score_offset']
+            self._transition_scale = sections['transition_scale']
+            self._transition_offset = sections['transition_offset']
+
+    def __reduce__(self):
+        if self.path is None:
+            return (BinaryModel, (None, self._word_ids.maxsize, self._data))
+        return (BinaryModel, (self.path,))
+
+    def fingerprint(self):
+        """sha1 hex digest of the model file"""
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.sha1(self._data if self.path is None else self._mmap).hexdigest()
+        return self._fingerprint
+
+    @classmethod
+    def from_model(cls, emission, transition):
+        """In-memory compact model of {tag:{word:score}} emission and {(tag0, tag1):score} transition"""
+        return cls(None, data=dump_binary_model(emission, transition))
+
+    def word_id(self, word):
+        wid = self._word_ids.get(word)
+        if wid is None:
+            wid = self.words.index(word)
+            self._word_ids[word] = wid
+        return wid
+
+    def score(self, tag_id, word_id, default=None):
+        lo, hi = self._tag_ptr[tag_id], self._tag_ptr[tag_id + 1]
+        i = bisect_left(self._tag_words, word_id, lo, hi)
+        if i < hi and self._tag_words[i] == word_id:
+            if self._code_values is not None:
+                return (self._score_offset[tag_id]
+                    + self._score_scale[tag_id] * self._code_values[self._tag_scores[i]])
+            return self._tag_scores[i]
+        return default
+
+    def tag_range(self, tag_id):
+        return self._tag_ptr[tag_id], self._tag_ptr[tag_id + 1]
+
+    def tag_scores(self, tag_id):
+        """Scores of tag in the order of word id"""
+        lo, hi = self._tag_ptr[tag_id], self._tag_ptr[tag_id + 1]
+        if self._code_values is None:
+            # memoryview of mmap. min / max run without creating dict
+            return self._tag_scores[lo:hi]
+        values = self._code_values
+        offset, scale = self._score_offset[tag_id], self._score_scale[tag_id]
+        return [offset + scale * values[code] for code in self._tag_scores[lo:hi]]
+
+    def word_tag_scores(self, word_id):
+        """Returns {tag:score} of word"""
+        b, e = self._word_ptr[word_id], self._word_ptr[word_id + 1]
+        return {self.tags[t]:self.score(t, word_id) for t in self._word_tags[b:e]}
+
+    def emission(self):
+        return MappedEmission(self)
+
+    def transition(self):
+        n = self.n_tags
+        tags = self.tags
+        scores = self._transition
+        if self._code_values is not None:
+            values = self._code_values
+            scores = [self._transition_offset[i // n] + self._transition_scale[i // n] * values[code]
+                for i, code in enumerate(scores)]
+        return {(tags[i // n], tags[i % n]):score
+            for i, score in enumerate(scores) if score == score}
+
+    def lexicon(self):
+        return MappedLexicon(self)
+
+
+class _MappedWords(Mapping):
+    """{word:score} of a tag. Inserted words are stored in an in-memory overlay"""
+
+    def __init__(self, model, tag_id):
+        self._model = model
+        self._tag_id = tag_id
+        self._overlay = {}
+
+    def __getitem__(self, word):
+        if word in self._overlay:
+            return self._overlay[word]
+        wid = self._model.word_id(word)
+        score = None if wid < 0 else self._model.score(self._tag_id, wid)
+        if score is None:
+            raise KeyError(word)
+        return score
+
+    def get(self, word, default=None):
+        if word in self._overlay:
+            return self._overlay[word]
+        wid = self._model.word_id(word)
+        if wid < 0:
+            return default
+        return self._model.score(self._tag_id, wid, default)
+
+    def __setitem__(self, word, score):
+        self._overlay[word] = score
+
+    def copy(self):
+        words = _MappedWords(self._model, self._tag_id)
+        words._overlay = dict(self._overlay)
+        return words
+
+    def __delitem__(self, word):
+        # only inserted words can be removed
+        del self._overlay[word]
+
+    def __contains__(self, word):
+        try:
+            self[word]
+            return True
+        except KeyError:
+            return False
+
+    def _base_words(self):
+        lo, hi = self._model.tag_range(self._tag_id)
+        words = self._model.words
+        return (words[wid] for wid in self._model._tag_words[lo:hi])
+
+    def __iter__(self):
+        for word in self._base_words():
+            yield word
+        for word in self._overlay:
+            if not self._in_base(word):
+                yield word
+
+    def _in_base(self, word):
+        wid = self._model.word_id(word)
+        return wid >= 0 and self._model.score(self._tag_id, wid) is not None
+
+    def __len__(self):
+        lo, hi = self._model.tag_range(self._tag_id)
+        return hi - lo + sum(1 for word in self._overlay if not self._in_base(word))
+
+    def values(self):
+        if not self._overlay:
+            return self._model.tag_scores(self._tag_id)
+        return [self[word] for word in self]
+
+
+class MappedEmission(Mapping):
+    """{tag:{word:score}} interface over BinaryModel"""
+
+    def __init__(self, model):
+        self._model = model
+        self._tags = {tag:_MappedWords(model, i)
+            for i, tag in enumerate(model.tags[:model.n_emission_tags])}
+
+    def __getitem__(self, tag):
+        return self._tags[tag]
+
+    def get(self, tag, default=None):
+        return self._tags.get(tag, default)
+
+    def copy(self, tags=None):
+        """Copy whose overlay of tags (all if None) can be changed independently"""
+        emission = MappedEmission.__new__(MappedEmission)
+        emission._model = self._model
+        emission._tags = {tag:(words.copy() if tags is None or tag in tags else words)
+            for tag, words in self._tags.items()}
+        return emission
+
+    def __iter__(self):
+        return iter(self._tags)
+
+    def __len__(self):
+        return len(self._tags)
+
+
+class MappedLexicon:
+    """Lexicon interface over sorted word table of BinaryModel"""
+
+    def __init__(self, model):
+        self._model = model
+        # user dictionary
+        self._overlay = Lexicon()
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    def __len__(self):
+        return self._model.n_words + sum(
+            1 for word in self._overlay._words if self._model.word_id(word) < 0)
+
+    def get(self, word, default=None):
+        wid = self._model.word_id(word)
+        tags = self._model.word_tag_scores(wid) if wid >= 0 else None
+        overlay = self._overlay.get(word)
+        if overlay:
+            tags = dict(tags) if tags else {}
+            tags.update(overlay)
+        return default if tags is None else tags
+
+    def copy(self):
+        lexicon = MappedLexicon(self._model)
+        lexicon._overlay = self._overlay.copy()
+        return lexicon
+
+    def add(self, word, tag, score):
+        self._overlay.add(word, tag, score)
+
+    def remove(self, word, tag):
+        # only inserted tags can be removed
+        self._overlay.remove(word, tag)
+
+    def common_prefix_search(self, string, begin=0, max_len=-1):
+        end = len(string)
+        if max_len > 0:
+            end = min(end, begin + max_len)
+        words = self._model.words
+        n_words = len(words)
+        matches = {}
+        lo = 0
+        for e in range(begin + 1, end + 1):
+            prefix = string[begin:e]
+            lo = bisect_left(words, prefix, lo)
+            if lo == n_words:
+                break
+            word = words[lo]
+            if word == prefix:
+                matches[e] = (prefix, self._model.word_tag_scores(lo))
+            elif not word.startswith(prefix):
+                break
+        for e, word, tags in self._overlay.common_prefix_search(string, begin, max_len):
+            if e in matches:
+                tags_ = dict(matches[e][1])
+                tags_.update(tags)
+                tags = tags_
+            matches[e] = (word, tags)
+        return [(e, word, tags) for e, (word, tags) in sorted(matches.items())]
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Convert JSON model to binary model')
+    parser.add_argument('json_path', type=str)
+    parser.add_argument('binary_path', type=str)
+    parser.add_argument('--quantize', type=str, default=None, choices=['float16', 'uint8'])
+    args = parser.parse_args()
+    convert_json_to_binary(args.json_path, args.binary_path, args.quantize)
@@ -0,0 +1,147 @@
+"""Counting (tag, word) with bounded memory
+
+At most max_entries distinct (tag, word) counts are kept in memory. When the
+budget is reached, the counts are sorted and spilled to a temporary file,
+and the files are merged by heapq.merge at the end. Words less frequent than
+min_count_word are dropped while merging, so only the counts of the final
+model are ever held at once.
+
+With sketch_width, the corpus is read twice. The first pass counts every
+(tag, word) in a count-min sketch, and the second pass counts only the pairs
+whose estimate is at least min_count_word. The sketch never underestimates,
+so no frequent word is dropped, and the result equals the exact counts.
+"""
+from array import array
+import heapq
+from itertools import groupby
+import os
+import pickle
+import tempfile
+
+from .corpus_reader import CorpusReader
+from .utils import bos, eos
+
+# number of (key, count) in each pickled record of spill files.
+# Merging holds one record of every file
+_record_size = 1000
+
+class CountMinSketch:
+    """Approximate counter. estimate(key) >= the true count of key"""
+
+    def __init__(self, width, depth=4):
+        self.width = width
+        self.depth = depth
+        self._table = array('I', bytes(4 * width * depth))
+
+    def _cells(self, key):
+        # double hashing: h1 + i * h2
+        h1 = hash(key)
+        h2 = hash((h1, key)) | 1
+        width = self.width
+        return [i * width + (h1 + i * h2) % width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        table = self._table
+        for cell in self._cells(key):
+            table[cell] = min(table[cell] + count, 0xffffffff)
+
+    def estimate(self, key):
+        table = self._table
+        return min(table[cell] for cell in self._cells(key))
+
+def _spill(counts, dirname):
+    # counts is {tag:{word:count}}. Writes ((tag, word), count) sorted by key
+    fd, path = tempfile.mkstemp(suffix='.counts', dir=dirname)
+    with os.fdopen(fd, 'wb') as f:
+        records = []
+        for tag in sorted(counts):
+            words = counts[tag]
+            for word in sorted(words):
+                records.append(((tag, word), words[word]))
+                if len(records) == _record_size:
+                    pickle.dump(records, f, pickle.HIGHEST_PROTOCOL)
+                    records = []
+        if records:
+            pickle.dump(records, f, pickle.HIGHEST_PROTOCOL)
+    return path
+
+def _read_spill(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                records = pickle.load(f)
+            except EOFError:
+                return
+            yield from records
+
+def _sentences(corpus):
+    if not isinstance(corpus, CorpusReader):
+        return corpus
+    # iterating CorpusReader caches every distinct token
+    return ([wt for wt in (token.rsplit('/', 1) for token in tokens)
+        if len(wt) == 2 and wt[0] and wt[1]] for tokens in corpus.iter_tokens())
+
+def count_corpus_bounded(corpus, max_entries, min_count_word=1, sketch_width=None,
+    sketch_depth=4, tmp_dir=None, verbose=False):
+    """count_corpus which keeps at most max_entries (tag, word) counts in memory
+
+    Returns {tag:{word:count}} of words whose count >= min_count_word, and
+    {(tag0, tag1):count}. Tags are ordered as count_corpus. If nothing is
+    spilled, words are also ordered as count_corpus, otherwise sorted.
+    Corpus is iterated twice if sketch_width is given.
+    """
+    sketch = None
+    if sketch_width and min_count_word > 1:
+        if iter(corpus) is corpus:
+            raise ValueError('sketch_width needs a corpus which can be iterated twice')
+        sketch = CountMinSketch(sketch_width, sketch_depth)
+        for sent in _sentences(corpus):
+            for word, tag in sent:
+                sketch.add((tag, word))
+
+    # {tag:{word:count}} of at most max_entries words
+    counts = {}
+    n_entries = 0
+    transition = {}
+    spill_paths = []
+    message_format = '\rcounting with bounded memory %d sents, %d spills'
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as dirname:
+        i = 0
+        for i, sent in enumerate(_sentences(corpus)):
+            for word, tag in sent:
+                words = counts.get(tag)
+                if words is None:
+                    words = counts[tag] = {}
+                if word in words:
+                    words[word] += 1
+                elif sketch is None or sketch.estimate((tag, word)) >= min_count_word:
+                    if n_entries >= max_entries:
+                        spill_paths.append(_spill(counts, dirname))
+                        # keep the tags, so that their order is that of appearance
+                        counts = {tag_:{} for tag_ in counts}
+                        words = counts[tag]
+                        n_entries = 0
+                    words[word] = 1
+                    n_entries += 1
+            tags = [bos] + [tag for word, tag in sent] + [eos]
+            for bigram in zip(tags, tags[1:]):
+                transition[bigram] = transition.get(bigram, 0) + 1
+            if (verbose) and (i % 10000 == 0):
+                print(message_format % (i, len(spill_paths)), end='', flush=True)
+        if verbose:
+            print('%s was done' % (message_format % (i, len(spill_paths))), flush=True)
+
+        if not spill_paths:
+            emission = {tag:{word:count for word, count in words.items() if count >= min_count_word}
+                for tag, words in counts.items()}
+            return emission, transition
+
+        spill_paths.append(_spill(counts, dirname))
+        emission = {tag:{} for tag in counts}
+        del counts
+        merged = heapq.merge(*[_read_spill(path) for path in spill_paths])
+        for key, group in groupby(merged, key=lambda item: item[0]):
+            count = sum(count for _, count in group)
+            if count >= min_count_word:
+                emission[key[0]][key[1]] = count
+    return emission, transition
@@ -0,0 +1,88 @@
+import http.client
+import json
+import socket
+from urllib.parse import urlparse
+
+class TaggerServerError(Exception):
+    def __init__(self, status, message):
+        super().__init__('{} {}'.format(status, message))
+        self.status = status
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class TaggerClient:
+    """Client of hmm_postagger.server. It keeps one connection, so use one client per thread
+
+    503 (queue is full) is raised as TaggerServerError with status 503.
+    """
+
+    def __init__(self, url='http://127.0.0.1:8000', unix_socket=None, timeout=None):
+        self.url = url
+        self.unix_socket = unix_socket
+        self.timeout = timeout
+        self._connection = None
+
+    def _connect(self):
+        if self.unix_socket:
+            return _UnixHTTPConnection(self.unix_socket, self.timeout)
+        url = urlparse(self.url)
+        return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=self.timeout)
+
+    def _request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        for retry in (False, True):
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.request(method, path, body, headers)
+                response = self._connection.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # server closed the kept-alive connection
+                self.close()
+                if retry:
+                    raise
+        result = json.loads(data.decode('utf-8'))
+        if response.status != 200:
+            raise TaggerServerError(response.status, result.get('error', ''))
+        return result
+
+    def tag(self, sentence, inference_unknown=True):
+        result = self._request('POST', '/tag',
+            {'sentence': sentence, 'inference_unknown': inference_unknown})
+        return [tuple(wt) for wt in result['pos']]
+
+    def tag_batch(self, sentences, inference_unknown=True):
+        result = self._request('POST', '/tag',
+            {'sentences': list(sentences), 'inference_unknown': inference_unknown})
+        return [[tuple(wt) for wt in pos] for pos in result['pos']]
+
+    def metrics(self):
+        return self._request('GET', '/metrics')
+
+    def health(self):
+        return self._request('GET', '/health')
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,229 @@
+"""Corpus reader with compression, byte-offset index and sentence ranges
+
+The file has one sentence of word/tag tokens in each line, same with
+utils.Corpus. gzip, bz2 and xz files are detected by their magic bytes.
+
+The index file (path + '.idx') has the byte offsets of every line start in
+the decompressed stream. With the index, a range of sentences of a plain
+text file is read by one seek, and the file is split into shards of exactly
+the same number of sentences. Compressed files are also split exactly, but
+seeking decompresses the stream from its beginning.
+"""
+from array import array
+import bz2
+import gzip
+from itertools import islice
+import lzma
+import os
+import struct
+import sys
+
+from .utils import check_dirs
+
+INDEX_MAGIC = b'HMMIDX\x00\x01'
+# magic, size and mtime_ns of source file, number of sentences
+_index_header = struct.Struct('<8sQQQ')
+
+_openers = [(b'\x1f\x8b', gzip.open), (b'BZh', bz2.open), (b'\xfd7zXZ\x00', lzma.open)]
+
+def open_corpus_file(path):
+    """Opens plain text or gzip, bz2, xz compressed file in binary mode"""
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    for magic, opener in _openers:
+        if head.startswith(magic):
+            return opener(path, 'rb')
+    return open(path, 'rb')
+
+def index_path_of(path):
+    return path + '.idx'
+
+def build_index(path, index_path=None):
+    """Writes uint64 offsets of line starts and the end of file. Returns the offsets"""
+    offsets = array('Q', [0])
+    position = 0
+    with open_corpus_file(path) as f:
+        for line in f:
+            position += len(line)
+            offsets.append(position)
+    stat = os.stat(path)
+    index_path = index_path or index_path_of(path)
+    check_dirs(index_path)
+    data = offsets
+    if sys.byteorder != 'little':
+        data = array('Q', offsets)
+        data.byteswap()
+    # write and rename, so that readers never see a half written index
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_index_header.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(offsets) - 1))
+        f.write(data.tobytes())
+    os.replace(tmp_path, index_path)
+    return offsets
+
+def load_index(path, index_path=None):
+    """Returns offsets, or None if the index does not exist or is older than the file"""
+    index_path = index_path or index_path_of(path)
+    if not os.path.exists(index_path):
+        return None
+    stat = os.stat(path)
+    with open(index_path, 'rb') as f:
+        header = f.read(_index_header.size)
+        if len(header) < _index_header.size:
+            return None
+        magic, size, mtime_ns, n_sents = _index_header.unpack(header)
+        if magic != INDEX_MAGIC or size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+            return None
+        offsets = array('Q')
+        offsets.frombytes(f.read())
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+    if len(offsets) != n_sents + 1:
+        return None
+    return offsets
+
+
+class _WordTagOfToken(dict):
+    # word/tag token -> (word, tag), or None if token is not valid
+    def __missing__(self, token):
+        wt = token.rsplit('/', 1)
+        wordtag = (wt[0], wt[1]) if len(wt) == 2 and wt[0] and wt[1] else None
+        self[token] = wordtag
+        return wordtag
+
+
+class Vocabulary:
+    """word <-> id and tag <-> id. Tag ids 0 and 1 are BOS and EOS"""
+
+    def __init__(self, bos='BOS', eos='EOS'):
+        self.words = []
+        self.tags = [bos, eos]
+        self._word_index = {}
+        self._tag_index = {bos:0, eos:1}
+        # token -> (word id, tag id), or None if token is not word/tag
+        self._tokens = {}
+
+    def word_id(self, word):
+        i = self._word_index.get(word)
+        if i is None:
+            i = len(self.words)
+            self.words.append(word)
+            self._word_index[word] = i
+        return i
+
+    def tag_id(self, tag):
+        i = self._tag_index.get(tag)
+        if i is None:
+            i = len(self.tags)
+            self.tags.append(tag)
+            self._tag_index[tag] = i
+        return i
+
+    def encode_token(self, token):
+        ids = self._tokens.get(token, False)
+        if ids is False:
+            wt = token.rsplit('/', 1)
+            if len(wt) == 2 and wt[0] and wt[1]:
+                ids = (self.word_id(wt[0]), self.tag_id(wt[1]))
+            else:
+                ids = None
+            self._tokens[token] = ids
+        return ids
+
+
+class CorpusReader:
+    """Sentences [start, stop) of a corpus file
+
+    It yields the same sentences with utils.Corpus, as lists of (word, tag).
+    If index is True, the offset index is loaded, or built if it does not
+    exist. Shards from split() are pickled without the index.
+    """
+
+    def __init__(self, path, start=0, stop=None, index=True, index_path=None):
+        self.path = path
+        self.start = start
+        self.stop = stop
+        self.index_path = index_path
+        # byte offset of start. known without index for shards
+        self._begin = 0 if start == 0 else None
+        self._offsets = None
+        if index:
+            self._offsets = load_index(path, index_path)
+            if self._offsets is None:
+                self._offsets = build_index(path, index_path)
+            n_sents = len(self._offsets) - 1
+            self.stop = n_sents if stop is None else min(stop, n_sents)
+            self._begin = self._offsets[min(start, n_sents)]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_offsets'] = None
+        return state
+
+    def __len__(self):
+        if self.stop is None:
+            raise TypeError('Length is unknown without index')
+        return max(0, self.stop - self.start)
+
+    def __getitem__(self, i):
+        if self._offsets is None:
+            raise TypeError('Random access requires index')
+        if i < 0:
+            i += len(self)
+        if not (0 <= i < len(self)):
+            raise IndexError(i)
+        return next(iter(self.sentences(self.start + i, self.start + i + 1)))
+
+    def sentences(self, start, stop=None):
+        """Reader of sentences [start, stop) of the file"""
+        reader = CorpusReader(self.path, start, stop, index=False, index_path=self.index_path)
+        if self._offsets is not None:
+            n_sents = len(self._offsets) - 1
+            reader.start = min(start, n_sents)
+            reader.stop = n_sents if stop is None else min(stop, n_sents)
+            reader._begin = self._offsets[reader.start]
+            reader._offsets = self._offsets
+        return reader
+
+    def split(self, n_shards):
+        """Split into at most n_shards readers of the same number of sentences"""
+        if self.stop is None:
+            raise TypeError('Splitting requires index')
+        n = len(self)
+        n_shards = max(1, min(n_shards, n))
+        bounds = [self.start + n * i // n_shards for i in range(n_shards + 1)]
+        shards = []
+        for b, e in zip(bounds, bounds[1:]):
+            shard = self.sentences(b, e)
+            shard._offsets = None
+            shards.append(shard)
+        return shards
+
+    def _lines(self):
+        with open_corpus_file(self.path) as f:
+            if self._begin is not None:
+                f.seek(self._begin)
+                lines = f
+            else:
+                lines = islice(f, self.start, None)
+            if self.stop is not None:
+                lines = islice(lines, self.stop - self.start)
+            for line in lines:
+                yield line
+
+    def iter_tokens(self):
+        """Yields list of word/tag tokens of each sentence. Tokens are not validated"""
+        for line in self._lines():
+            yield line.decode('utf-8').split()
+
+    def __iter__(self):
+        # each distinct token is split only once
+        get = _WordTagOfToken().__getitem__
+        for tokens in self.iter_tokens():
+            yield list(filter(None, map(get, tokens)))
+
+    def iter_encoded(self, vocabulary):
+        """Yields list of (word id, tag id) of each sentence. vocabulary grows while reading"""
+        encode = vocabulary.encode_token
+        for tokens in self.iter_tokens():
+            yield list(filter(None, map(encode, tokens)))
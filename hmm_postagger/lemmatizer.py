@@ -1,3 +1,5 @@
+from .utils import LRUCache
+
 kor_begin = 44032
 kor_end = 55203
 chosung_base = 588
@@ -28,28 +30,57 @@ jaum_list = ['ㄱ', 'ㄲ', 'ㄳ', 'ㄴ', 'ㄵ', 'ㄶ', 'ㄷ', 'ㄸ', 'ㄹ',
 moum_list = ['ㅏ', 'ㅐ', 'ㅑ', 'ㅒ', 'ㅓ', 'ㅔ', 'ㅕ', 'ㅖ', 'ㅗ', 'ㅘ', 
               'ㅙ', 'ㅚ', 'ㅛ', 'ㅜ', 'ㅝ', 'ㅞ', 'ㅟ', 'ㅠ', 'ㅡ', 'ㅢ', 'ㅣ']
 
+# (chosung, jungsung, jongsung) -> syllable
+compose_table = {
+    (cho, jung, jong): chr(kor_begin + chosung_base * i + jungsung_base * j + k)
+    for i, cho in enumerate(chosung_list)
+    for j, jung in enumerate(jungsung_list)
+    for k, jong in enumerate(jongsung_list)
+}
+
+# ord(syllable) - kor_begin -> (chosung, jungsung, jongsung)
+decompose_table = [
+    (chosung_list[i // chosung_base],
+     jungsung_list[(i % chosung_base) // jungsung_base],
+     jongsung_list[i % jungsung_base])
+    for i in range(kor_end - kor_begin + 1)
+]
+
 def compose(chosung, jungsung, jongsung):
-    return chr(
-        kor_begin + chosung_base * chosung_list.index(chosung) +
-        jungsung_base * jungsung_list.index(jungsung) +
-        jongsung_list.index(jongsung)
-    )
+    try:
+        return compose_table[(chosung, jungsung, jongsung)]
+    except KeyError:
+        raise ValueError('Unable to compose ({}, {}, {})'.format(
+            chosung, jungsung, jongsung)) from None
 
 def decompose(c):
     i = ord(c)
+    if (kor_begin <= i <= kor_end):
+        return decompose_table[i - kor_begin]
     if (jaum_begin <= i <= jaum_end):
         return (c, ' ', ' ')
     if (moum_begin <= i <= moum_end):
         return (' ', c, ' ')
-    if not (kor_begin <= i <= kor_end):
-        return (c, '', '')
-    i -= kor_begin
-    cho  = i // chosung_base
-    jung = ( i - cho * chosung_base ) // jungsung_base 
-    jong = ( i - cho * chosung_base - jung * jungsung_base )    
-    return (chosung_list[cho], jungsung_list[jung], jongsung_list[jong])
+    return (c, '', '')
+
+_lemma_cache = LRUCache(maxsize=100000)
+
+def set_lemma_cache_size(maxsize):
+    _lemma_cache.resize(maxsize)
+
+def lemma_cache_info():
+    return _lemma_cache.info()
 
 def lemma_candidate(l, r):
+    """Returns frozenset of (stem, ending) candidates. Results are LRU cached"""
+    key = (l, r)
+    candidates = _lemma_cache.get(key)
+    if candidates is None:
+        candidates = frozenset(_lemma_candidate(l, r))
+        _lemma_cache[key] = candidates
+    return candidates
+
+def _lemma_candidate(l, r):
     def add_lemma(stem, ending):
         candidates.add((stem, ending))
 
@@ -164,4 +195,90 @@ def lemma_candidate(l, r):
         r_canon = compose('ㅇ', 'ㅓ', l_last[2])+ r
         add_lemma(l_stem, r_canon)
 
-    return candidates
\ No newline at end of file
+    return candidates
+
+def _is_syllable(c):
+    return kor_begin <= ord(c) <= kor_end
+
+def conjugate(stem, ending):
+    """Returns set of surface (l, r) of stem + ending. Forward of lemma_candidate
+
+    Every (l, r) has (stem, ending) in lemma_candidate(l, r).
+    """
+    surfaces = {(stem, ending)}
+    if not stem or not _is_syllable(stem[-1]):
+        return surfaces
+
+    def add(l, r):
+        # keep only the forms which lemma_candidate analyzes back
+        try:
+            if (stem, ending) in _lemma_candidate(l, r):
+                surfaces.add((l, r))
+        except ValueError:
+            # r begins with a jamo
+            pass
+
+    cho, jung, jong = decompose(stem[-1])
+    front = stem[:-1]
+    vowel = bool(ending) and _is_syllable(ending[0]) and decompose(ending[0])[0] == 'ㅇ'
+    e_jung, e_jong = decompose(ending[0])[1:] if vowel else ('', '')
+    e_end = ending[1:]
+
+    # ㄷ 불규칙 활용: 깨닫 + 아 -> 깨달 + 아
+    if jong == 'ㄷ' and vowel:
+        add(front + compose(cho, jung, 'ㄹ'), ending)
+
+    # 르 불규칙 활용: 구르 + 어 -> 굴 + 러
+    if (stem[-1] == '르' and len(stem) >= 2 and _is_syllable(stem[-2])
+        and vowel and (e_jung == 'ㅏ' or e_jung == 'ㅓ')):
+        prev = decompose(stem[-2])
+        if prev[2] == ' ':
+            add(stem[:-2] + compose(prev[0], prev[1], 'ㄹ'), compose('ㄹ', e_jung, e_jong) + e_end)
+
+    # ㅂ 불규칙 활용: 더럽 + 어서 -> 더러 + 워서
+    if jong == 'ㅂ' and vowel and (e_jung == 'ㅏ' or e_jung == 'ㅓ'):
+        add(front + compose(cho, jung, ' '),
+            compose('ㅇ', 'ㅘ' if e_jung == 'ㅏ' else 'ㅝ', e_jong) + e_end)
+
+    # 어미의 첫글자가 종성일 경우: 이 + ㅂ니다 -> 입 + 니다
+    if jong == ' ' and ending and ending[0] in ('ㄴ', 'ㄹ', 'ㅂ', 'ㅆ'):
+        add(front + compose(cho, jung, ending[0]), e_end)
+
+    # ㅅ 불규칙 활용: 붓 + 어 -> 부 + 어
+    if jong == 'ㅅ' and vowel:
+        add(front + compose(cho, jung, ' '), ending)
+
+    # 우 불규칙 활용: 푸 + 어 -> 퍼 + ''
+    if stem[-1] == '푸' and vowel and e_jung == 'ㅓ':
+        add(front + compose('ㅍ', 'ㅓ', e_jong), e_end)
+
+    # 우 불규칙 활용: 주 + 었어 -> 줬 + 어
+    if jung == 'ㅜ' and jong == ' ' and vowel and e_jung == 'ㅓ':
+        add(front + compose(cho, 'ㅝ', e_jong), e_end)
+
+    # 오 불규칙 활용: 오 + 았어 -> 왔 + 어
+    if jung == 'ㅗ' and jong == ' ' and vowel and e_jung == 'ㅏ':
+        add(front + compose(cho, 'ㅘ', e_jong), e_end)
+
+    # ㅡ 탈락 불규칙 활용: 끄 + 어 -> 꺼 + '' / 트 + 었어 -> 텄 + 어
+    if jung == 'ㅡ' and jong == ' ' and vowel and (e_jung == 'ㅏ' or e_jung == 'ㅓ'):
+        add(front + compose(cho, e_jung, e_jong), e_end)
+
+    # 여 불규칙 활용 (2): 하 + 았다 -> 했 + 다
+    if stem[-1] == '하' and vowel and e_jung == 'ㅏ':
+        add(front + compose('ㅎ', 'ㅐ', e_jong), e_end)
+
+    if jong == 'ㅎ' and (jung == 'ㅏ' or jung == 'ㅓ'):
+        # ㅎ (탈락) 불규칙 활용: 파랗 + 면 -> 파라 + 면, 파랗 + ㄴ -> 파란 + ''
+        add(front + compose(cho, jung, ' '), ending)
+        if ending and ending[0] in ('ㄴ', 'ㄹ', 'ㅂ', 'ㅆ'):
+            add(front + compose(cho, jung, ending[0]), e_end)
+        # ㅎ (축약) 불규칙 활용: 파랗 + 았다 -> 파랬 + 다
+        if vowel and e_jung == jung:
+            add(front + compose(cho, 'ㅐ' if jung == 'ㅏ' else 'ㅔ', e_jong), e_end)
+
+    # 이었 -> 였 규칙활용: 좋아지 + 었어 -> 좋아졌 + 어
+    if jung == 'ㅣ' and jong == ' ' and vowel and e_jung == 'ㅓ':
+        add(front + compose(cho, 'ㅕ', e_jong), e_end)
+
+    return surfaces
@@ -0,0 +1,111 @@
+class _Node(dict):
+    # trie node or tag dict, with the generation of the lexicon which created it
+    __slots__ = ('generation',)
+
+class Lexicon:
+    """Inverted index {word:{tag:score}} of emission with a character trie"""
+
+    def __init__(self, emission=None):
+        # token of the trie nodes and tag dicts which this lexicon may change.
+        # see copy()
+        self._generation = object()
+        self._words = {}
+        self._root = self._new()
+        if emission:
+            for tag, words in emission.items():
+                for word, score in words.items():
+                    self.add(word, tag, score)
+
+    def __contains__(self, word):
+        return word in self._words
+
+    def __len__(self):
+        return len(self._words)
+
+    def get(self, word, default=None):
+        """Returns {tag:score} of word"""
+        return self._words.get(word, default)
+
+    def copy(self):
+        """Copy which shares the trie and tags with this lexicon
+
+        Changes of the copy do not change this lexicon, and vice versa. Only
+        the shared nodes and tags on the path of a changed word are copied.
+        """
+        lexicon = Lexicon()
+        lexicon._words = dict(self._words)
+        lexicon._root = self._root
+        # the shared dicts belong to neither generation now
+        self._generation = object()
+        return lexicon
+
+    def _new(self, d=None):
+        node = _Node() if d is None else _Node(d)
+        node.generation = self._generation
+        return node
+
+    def _writable(self, d):
+        if getattr(d, 'generation', None) is self._generation:
+            return d
+        return self._new(d)
+
+    def _path(self, word):
+        # writable trie nodes from root to the node of word
+        self._root = self._writable(self._root)
+        path = [self._root]
+        for char in word:
+            child = path[-1].get(char)
+            child = self._new() if child is None else self._writable(child)
+            path[-1][char] = child
+            path.append(child)
+        return path
+
+    def add(self, word, tag, score):
+        tags = self._words.get(word)
+        tags_ = self._new() if tags is None else self._writable(tags)
+        tags_[tag] = score
+        if tags_ is not tags:
+            self._words[word] = tags_
+            # None is never a character, so it marks the end of a word
+            self._path(word)[-1][None] = (word, tags_)
+
+    def remove(self, word, tag):
+        """Removes tag of word. The word is removed from trie if it has no tag"""
+        tags = self._words.get(word)
+        if tags is None or tag not in tags:
+            return
+        tags_ = self._writable(tags)
+        del tags_[tag]
+        if tags_:
+            if tags_ is not tags:
+                self._words[word] = tags_
+                self._path(word)[-1][None] = (word, tags_)
+            return
+        del self._words[word]
+        path = self._path(word)
+        del path[-1][None]
+        # remove empty nodes from the leaf
+        for node, char in zip(reversed(path[:-1]), reversed(word)):
+            if node[char]:
+                break
+            del node[char]
+
+    def common_prefix_search(self, string, begin=0, max_len=-1):
+        """Returns all words in lexicon which start at string[begin]
+
+        Returns a list of (end, word, {tag:score}) ordered by end index,
+        where word == string[begin:end].
+        """
+        end = len(string)
+        if max_len > 0:
+            end = min(end, begin + max_len)
+        matches = []
+        node = self._root
+        for i in range(begin, end):
+            node = node.get(string[i])
+            if node is None:
+                break
+            terminal = node.get(None)
+            if terminal is not None:
+                matches.append((i + 1, terminal[0], terminal[1]))
+        return matches
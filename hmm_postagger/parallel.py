@@ -0,0 +1,99 @@
+from collections import deque
+import copy
+from itertools import islice
+import multiprocessing as mp
+
+# tagger of a worker process, set by the initializer of its pool.
+# With fork start method, initargs are inherited by workers, so the model is
+# neither pickled per task nor per worker.
+_tagger = None
+
+def _init_worker(tagger):
+    global _tagger
+    _tagger = tagger
+
+def _tag_chunk(args):
+    sentences, inference_unknown, vectorized = args
+    if vectorized:
+        return _tag_many(_tagger, sentences, inference_unknown, vectorized)
+    return [_tagger.tag(sent, inference_unknown) for sent in sentences]
+
+def _tag_many(tagger, sentences, inference_unknown, vectorized):
+    pruning = tagger._pruning(None, None, None)
+    return tagger._snapshot._tag_many(sentences, inference_unknown, pruning, vectorized)
+
+def _worker_copy(snapshot):
+    # the connection and lock of result cache are not shared with workers
+    worker = copy.copy(snapshot)
+    worker.result_cache = None
+    worker._snapshot = worker
+    return worker
+
+def iter_chunks(iterable, chunksize):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+def tag_iter(tagger, sentences, n_jobs=1, chunksize=100,
+    inference_unknown=True, max_pending=None, vectorized=False):
+    """Lazily yields tagged sentences in input order
+
+    At most max_pending chunks are in flight, so sentences can be an
+    arbitrarily long iterator. n_jobs <= 0 uses all cores. If vectorized,
+    each chunk is decoded at once. See batch_decode.
+    """
+    if getattr(tagger, 'result_cache', None) is not None:
+        yield from _tag_iter_cached(tagger, sentences, n_jobs, chunksize,
+            inference_unknown, vectorized)
+        return
+
+    if n_jobs == 1:
+        if vectorized:
+            for chunk in iter_chunks(sentences, chunksize):
+                yield from _tag_many(tagger, chunk, inference_unknown, vectorized)
+            return
+        for sent in sentences:
+            yield tagger.tag(sent, inference_unknown)
+        return
+
+    if n_jobs <= 0:
+        n_jobs = mp.cpu_count()
+    if max_pending is None:
+        max_pending = 2 * n_jobs
+
+    if 'fork' in mp.get_all_start_methods():
+        context = mp.get_context('fork')
+    else:
+        # pickled once per worker, not per task
+        context = mp.get_context()
+
+    with context.Pool(n_jobs, initializer=_init_worker, initargs=(tagger,)) as pool:
+        pending = deque()
+        for chunk in iter_chunks(sentences, chunksize):
+            pending.append(pool.apply_async(_tag_chunk, ((chunk, inference_unknown, vectorized),)))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+def _tag_iter_cached(tagger, sentences, n_jobs, chunksize, inference_unknown, vectorized):
+    # result cache is read and written only in this process, by one bulk get
+    # and put for each batch. The misses are tagged by workers
+    snapshot = tagger._snapshot
+    pruning = tagger._pruning(None, None, None)
+    worker = _worker_copy(snapshot)
+    if n_jobs <= 0:
+        n_jobs = mp.cpu_count()
+
+    def tag_misses(misses):
+        if n_jobs == 1 or len(misses) <= chunksize:
+            return worker._tag_many(misses, inference_unknown, pruning, vectorized)
+        return list(tag_iter(worker, misses, n_jobs, chunksize, inference_unknown,
+            vectorized=vectorized))
+
+    batch_size = chunksize if n_jobs == 1 else 4 * n_jobs * chunksize
+    for batch in iter_chunks(sentences, batch_size):
+        yield from snapshot._tag_cached(batch, inference_unknown, pruning, tag_misses)
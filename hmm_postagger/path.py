@@ -39,4 +39,66 @@ def ford_list(E, V, S, T):
         prev_ = prev[prev_]
     path.append(S)
 
-    return path[::-1], d[T]
\ No newline at end of file
+    return path[::-1], d[T]
+
+def viterbi(E, S, T, stats=None, beam_width=None, score_margin=None):
+    # Every edge (u, v) satisfies u[4] == v[3], so relaxing edges in the order
+    # of u's end index visits the lattice in topological order.
+    # Ties are broken by the order of E, same as ford_list.
+    # Nodes which end at the same position compete for the same suffixes, so
+    # with beam_width or score_margin only the best of them are expanded.
+
+    ## Initialize ##
+    n = T[4] + 1
+    buckets = [[] for _ in range(n)]
+    for edge in E:
+        buckets[edge[0][4]].append(edge)
+
+    # distance
+    d = {S: 0}
+    # previous node
+    prev = {S: None}
+    prune = bool(beam_width) or score_margin is not None
+    # expanded nodes
+    alive = set() if prune else d
+
+    ## Relaxation in topological (position) order ##
+    for bucket in buckets:
+        if prune and bucket:
+            alive.update(_beam(bucket, d, beam_width, score_margin))
+        for u, v, Wuv in bucket:
+            if u not in alive:
+                continue
+            d_new = d[u] + Wuv
+            if (v not in d) or (d_new > d[v]):
+                d[v] = d_new
+                prev[v] = u
+
+    if stats is not None:
+        # counted after relaxation, so that the loop is not slowed down
+        stats['decoder_iterations'] = sum(1 for u, _, _ in E if u in alive)
+
+    if T not in d:
+        raise ValueError('There is no path from {} to {}'.format(S, T))
+
+    # Finding path
+    path = [T]
+    node = prev[T]
+    while node is not None:
+        path.append(node)
+        node = prev[node]
+
+    return path[::-1], d[T]
+
+def _beam(bucket, d, beam_width, score_margin):
+    # reachable source nodes of bucket in order of edges
+    nodes = list(dict.fromkeys(u for u, _, _ in bucket if u in d))
+    if not nodes:
+        return nodes
+    if beam_width and len(nodes) > beam_width:
+        # stable sort keeps the order of edges among ties
+        nodes = sorted(nodes, key=lambda u: -d[u])[:beam_width]
+    if score_margin is not None:
+        threshold = max(d[u] for u in nodes) - score_margin
+        nodes = [u for u in nodes if d[u] >= threshold]
+    return nodes
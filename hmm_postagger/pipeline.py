@@ -0,0 +1,147 @@
+from collections import deque
+import json
+import os
+import sys
+import time
+
+from .parallel import tag_iter
+
+def format_corpus(sentence, pos):
+    # same format with utils.Corpus
+    return ' '.join('{}/{}'.format(word, tag) for word, tag in pos)
+
+def format_jsonl(sentence, pos):
+    return json.dumps({'sentence': sentence, 'pos': pos}, ensure_ascii=False)
+
+formatters = {'corpus': format_corpus, 'jsonl': format_jsonl}
+
+def load_checkpoint(checkpoint_path):
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, encoding='utf-8') as f:
+            return json.load(f)
+    return {'input_offset': 0, 'output_offset': 0, 'n_sents': 0}
+
+def save_checkpoint(checkpoint_path, state):
+    # write and rename, so that the checkpoint is never half written
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, checkpoint_path)
+
+def tag_file(tagger, input_path, output_path, output_format='corpus',
+    n_jobs=1, chunksize=1000, inference_unknown=True,
+    checkpoint_path=None, checkpoint_every=10000, verbose=True):
+    """Tags a text file, one sentence per line, to output_path line by line
+
+    input_path / output_path '-' means stdin / stdout. Memory usage does not
+    depend on the file size because tag_iter keeps only a few chunks in flight.
+    If checkpoint_path is given, the byte offsets of input and output are saved
+    every checkpoint_every sentences and the next call resumes from there.
+    Checkpoints require files, since stdin / stdout can not be seeked.
+    """
+    formatter = formatters[output_format]
+    use_stdin = input_path == '-'
+    use_stdout = output_path == '-'
+    if checkpoint_path and (use_stdin or use_stdout):
+        raise ValueError('Checkpoint requires input and output files, not stdin / stdout')
+    state = load_checkpoint(checkpoint_path)
+
+    fin = sys.stdin.buffer if use_stdin else open(input_path, 'rb')
+    if use_stdout:
+        fout = sys.stdout.buffer
+    elif state['output_offset'] > 0:
+        # drop lines written after the last checkpoint
+        fout = open(output_path, 'r+b')
+        fout.truncate(state['output_offset'])
+        fout.seek(state['output_offset'])
+    else:
+        fout = open(output_path, 'wb')
+    if state['input_offset'] > 0:
+        fin.seek(state['input_offset'])
+
+    # (end offset, sentence) of lines which are being tagged
+    lines = deque()
+
+    def read_sentences():
+        position = state['input_offset']
+        for line in fin:
+            position += len(line)
+            sentence = line.decode('utf-8', errors='replace').rstrip('\r\n')
+            lines.append((position, sentence))
+            yield sentence
+
+    message_format = '\rtagged %d sents (%.1f sents/sec)'
+    n_sents = state['n_sents']
+    begin_time = time.time()
+    try:
+        for i, pos in enumerate(tag_iter(tagger, read_sentences(),
+            n_jobs, chunksize, inference_unknown)):
+
+            position, sentence = lines.popleft()
+            fout.write((formatter(sentence, pos) + '\n').encode('utf-8'))
+            n_sents += 1
+
+            if checkpoint_path and (i + 1) % checkpoint_every == 0:
+                fout.flush()
+                save_checkpoint(checkpoint_path, {'input_offset': position,
+                    'output_offset': fout.tell(), 'n_sents': n_sents})
+            if verbose and (i + 1) % 1000 == 0:
+                speed = (i + 1) / max(time.time() - begin_time, 1e-9)
+                print(message_format % (n_sents, speed), end='', file=sys.stderr, flush=True)
+
+        fout.flush()
+        elapsed = time.time() - begin_time
+        n_tagged = n_sents - state['n_sents']
+        if checkpoint_path and n_tagged > 0:
+            save_checkpoint(checkpoint_path, {'input_offset': position,
+                'output_offset': fout.tell(), 'n_sents': n_sents})
+    finally:
+        if not use_stdin:
+            fin.close()
+        if not use_stdout:
+            fout.close()
+
+    speed = n_tagged / max(elapsed, 1e-9)
+    if verbose:
+        print('%s was done' % (message_format % (n_sents, speed)), file=sys.stderr, flush=True)
+    return {'n_sents': n_sents, 'n_tagged': n_tagged,
+            'elapsed': elapsed, 'sents_per_sec': speed}
+
+def main():
+    import argparse
+    from .tagger import TrainedHMMTagger
+
+    parser = argparse.ArgumentParser(description='Tag a text file line by line')
+    parser.add_argument('--model_path', type=str, required=True)
+    parser.add_argument('--input', type=str, default='-', help='text file or - (stdin)')
+    parser.add_argument('--output', type=str, default='-', help='output file or - (stdout)')
+    parser.add_argument('--format', type=str, default='corpus', choices=sorted(formatters))
+    parser.add_argument('--n_jobs', type=int, default=1)
+    parser.add_argument('--chunksize', type=int, default=1000)
+    parser.add_argument('--checkpoint', type=str, default=None)
+    parser.add_argument('--checkpoint_every', type=int, default=10000)
+    parser.add_argument('--result_cache', type=str, default=None, help='SQLite file of tagged sentences')
+    parser.add_argument('--result_cache_size', type=int, default=1000000)
+    parser.add_argument('--no_inference_unknown', dest='inference_unknown', action='store_false')
+    parser.add_argument('--quiet', dest='verbose', action='store_false')
+    args = parser.parse_args()
+    if args.checkpoint and '-' in (args.input, args.output):
+        parser.error('--checkpoint requires --input and --output files')
+
+    tagger = TrainedHMMTagger(args.model_path)
+    if args.result_cache:
+        tagger.enable_result_cache(args.result_cache, args.result_cache_size)
+    tag_file(tagger, args.input, args.output, args.format, args.n_jobs,
+        args.chunksize, args.inference_unknown, args.checkpoint,
+        args.checkpoint_every, args.verbose)
+    if args.result_cache:
+        cache = tagger.disable_result_cache()
+        if args.verbose:
+            info = cache.info()
+            print('result cache: {} hits, {} misses ({:.1%}), {} entries, {:.1f} MB'.format(
+                info.hits, info.misses, info.hit_rate, info.currsize, info.nbytes / 2**20),
+                file=sys.stderr, flush=True)
+        cache.close()
+
+if __name__ == '__main__':
+    main()
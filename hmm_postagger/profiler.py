@@ -0,0 +1,104 @@
+from bisect import bisect_left
+from time import perf_counter
+
+STAGES = ('lookup', 'edge', 'weight', 'decode', 'inference', 'postprocess')
+COUNTS = ('chars', 'nodes', 'edges', 'lemma_candidates', 'unknown_spans',
+    'decoder_iterations')
+
+# upper bounds of histogram buckets. milliseconds for stages, numbers for counts
+TIME_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+COUNT_BUCKETS = (10, 30, 100, 300, 1000, 3000, 10000, 30000, 100000)
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # the last bucket is (bounds[-1], inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+        self.n = 0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.n += 1
+
+    def export(self, prefix):
+        metrics = {}
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            metrics['{}.le_{}'.format(prefix, bound)] = cumulative
+        metrics[prefix + '.le_inf'] = self.n
+        metrics[prefix + '.sum'] = self.sum
+        metrics[prefix + '.count'] = self.n
+        return metrics
+
+
+class TagProfiler:
+    """Per-stage wall time and lattice statistics of TrainedHMMTagger.tag
+
+    last is the statistics of the latest call, {'ms':{stage:ms}, 'counts':{name:n}}.
+    Every call is also accumulated to counters and histograms, and export()
+    returns them as flat {metric name:value}. If sink is given, it is called
+    with (sentence, last) after every call.
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.reset()
+
+    def reset(self):
+        self.n_calls = 0
+        self.last = None
+        self.total_ms = {stage:0.0 for stage in STAGES}
+        self.total_counts = {name:0 for name in COUNTS}
+        self.ms_histograms = {stage:Histogram(TIME_BUCKETS) for stage in STAGES + ('total',)}
+        self.count_histograms = {name:Histogram(COUNT_BUCKETS) for name in COUNTS}
+        self.begin()
+
+    def begin(self):
+        self._ms = {}
+        self._counts = dict.fromkeys(COUNTS, 0)
+        self._time = perf_counter()
+
+    def lap(self, stage):
+        # time from the previous lap
+        now = perf_counter()
+        self._ms[stage] = (now - self._time) * 1000
+        self._time = now
+
+    def count(self, name, n=1):
+        self._counts[name] += n
+
+    def end_call(self, sentence):
+        ms = self._ms
+        counts = self._counts
+        ms['total'] = sum(ms.values())
+        self.last = {'ms': ms, 'counts': counts}
+        self.n_calls += 1
+        for stage, value in ms.items():
+            self.ms_histograms[stage].add(value)
+            if stage in self.total_ms:
+                self.total_ms[stage] += value
+        for name, value in counts.items():
+            self.total_counts[name] += value
+            self.count_histograms[name].add(value)
+        if self.sink is not None:
+            self.sink(sentence, self.last)
+
+    def export(self, prefix='tag'):
+        metrics = {prefix + '.calls': self.n_calls}
+        for stage, histogram in self.ms_histograms.items():
+            metrics.update(histogram.export('{}.{}.ms'.format(prefix, stage)))
+        for name, histogram in self.count_histograms.items():
+            metrics.update(histogram.export('{}.{}'.format(prefix, name)))
+        return metrics
+
+    def summary(self):
+        """Mean time and counts per call"""
+        n = max(self.n_calls, 1)
+        return {
+            'calls': self.n_calls,
+            'ms': {stage:value / n for stage, value in self.total_ms.items()},
+            'counts': {name:value / n for name, value in self.total_counts.items()}
+        }
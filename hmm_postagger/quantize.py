@@ -0,0 +1,84 @@
+"""Export quantized binary model with a report of size and tagging agreement
+
+    python -m hmm_postagger.quantize model.json model.uint8.bin --quantize uint8 \
+        --eval_path sentences.txt --report_path report.json
+
+The report compares the quantized model with the float64 binary model of
+the same emission and transition. Agreement is measured by tagging every
+sentence of the evaluation corpus (one sentence per line) with both.
+"""
+from collections import Counter
+import json
+import os
+
+from .binary_model import BinaryModel
+from .binary_model import dump_binary_model
+from .binary_model import save_binary_model
+from .tagger import TrainedHMMTagger
+from .utils import check_dirs
+
+def export_quantized_model(model_path, emission, transition, quantize='uint8',
+    eval_sentences=None, acceptable_transition=None):
+    """Saves quantized binary model and returns the report"""
+    save_binary_model(model_path, emission, transition, quantize)
+    model = BinaryModel(model_path)
+    emission_, transition_ = model.emission(), model.transition()
+    report = {
+        'quantize': quantize,
+        'float64_bytes': len(dump_binary_model(emission, transition)),
+        'quantized_bytes': os.path.getsize(model_path),
+        'max_emission_error': max((abs(emission_[tag][word] - score)
+            for tag, words in emission.items() for word, score in words.items()), default=0.0),
+        'max_transition_error': max((abs(transition_[pair] - score)
+            for pair, score in transition.items()), default=0.0),
+    }
+    report['size_ratio'] = report['quantized_bytes'] / report['float64_bytes']
+
+    if eval_sentences is not None:
+        reference = TrainedHMMTagger(emission=emission, transition=transition,
+            acceptable_transition=acceptable_transition)
+        quantized = TrainedHMMTagger(model_path, acceptable_transition=acceptable_transition)
+        n_sents = n_same_sents = n_tokens = n_same_tokens = 0
+        for sent in eval_sentences:
+            pos = reference.tag(sent)
+            pos_ = quantized.tag(sent)
+            n_sents += 1
+            n_same_sents += (pos == pos_)
+            n_tokens += len(pos)
+            n_same_tokens += sum((Counter(pos) & Counter(pos_)).values())
+        report['eval_sentences'] = n_sents
+        report['sentence_agreement'] = n_same_sents / max(n_sents, 1)
+        report['token_agreement'] = n_same_tokens / max(n_tokens, 1)
+    return report
+
+def read_sentences(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Export quantized binary model')
+    parser.add_argument('model_path', type=str, help='JSON or binary float64 model')
+    parser.add_argument('quantized_path', type=str)
+    parser.add_argument('--quantize', type=str, default='uint8', choices=['float16', 'uint8'])
+    parser.add_argument('--eval_path', type=str, default=None, help='one sentence per line')
+    parser.add_argument('--report_path', type=str, default=None)
+    args = parser.parse_args()
+
+    tagger = TrainedHMMTagger(args.model_path)
+    emission = {tag:dict(zip(words, words.values())) for tag, words in tagger.emission.items()}
+    sentences = read_sentences(args.eval_path) if args.eval_path else None
+    report = export_quantized_model(args.quantized_path, emission, dict(tagger.transition),
+        args.quantize, sentences)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.report_path:
+        check_dirs(args.report_path)
+        with open(args.report_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+if __name__ == '__main__':
+    main()
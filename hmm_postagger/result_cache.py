@@ -0,0 +1,211 @@
+"""Persistent cache of tag() results in a SQLite file
+
+A result is keyed by the fingerprint of the model, the inference_unknown
+flag and the whitespace-normalized sentence. The fingerprint is a sha1 of
+emission, transition, user dictionary and the settings which change the
+result of tag(), so a changed model never reads the results of the old one.
+The model is hashed once, and a user dictionary update hashes only the
+user dictionary.
+The old results are evicted as least recently used items.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from .binary_model import MappedEmission
+from .utils import CacheInfo
+from .utils import doublespace_pattern
+
+# bound variables of one SQL statement
+_max_variables = 500
+
+def normalize_sentence(sentence):
+    return doublespace_pattern.sub(' ', sentence)
+
+def _update_words(sha, words):
+    for word in sorted(words):
+        sha.update('{}\t{!r}\n'.format(word, words[word]).encode('utf-8'))
+
+def _base_fingerprint(tagger):
+    # emission without user words, transition and acceptable_transition
+    sha = hashlib.sha1()
+    emission = tagger.emission
+    if isinstance(emission, MappedEmission):
+        # the overlays are the user words
+        sha.update(emission._model.fingerprint().encode('ascii'))
+    else:
+        for tag in sorted(emission):
+            words = emission[tag]
+            user_words = tagger.user_dictionary.get(tag)
+            if user_words:
+                words = {word:score for word, score in words.items() if word not in user_words}
+                for word in user_words:
+                    base_score = tagger._user_base_scores.get((tag, word))
+                    if base_score is not None:
+                        words[word] = base_score
+            sha.update('\0{}\n'.format(tag).encode('utf-8'))
+            _update_words(sha, words)
+    sha.update(b'\0transition\n')
+    _update_words(sha, {' '.join(pair):score for pair, score in tagger.transition.items()})
+    sha.update(b'\0acceptable transition\n')
+    for pair in sorted(' '.join(pair) for pair in tagger.acceptable_transition):
+        sha.update('{}\n'.format(pair).encode('utf-8'))
+    return sha.hexdigest()
+
+def model_fingerprint(tagger, pruning=None):
+    """sha1 hex digest of the model and settings of tagger and pruning
+
+    The digest of the model without user dictionary is computed once and
+    kept in tagger._model_digest, which is shared by the snapshots until the
+    model is reloaded. So only the user dictionary is hashed after it changes.
+    """
+    digest = tagger._model_digest
+    base = digest.get('sha1')
+    if base is None:
+        base = digest['sha1'] = _base_fingerprint(tagger)
+    sha = hashlib.sha1(base.encode('ascii'))
+    sha.update(b'\0user dictionary\n')
+    for tag in sorted(tagger.user_dictionary):
+        if not tagger.user_dictionary[tag]:
+            continue
+        sha.update('\0{}\n'.format(tag).encode('utf-8'))
+        _update_words(sha, tagger.user_dictionary[tag])
+    settings = {
+        'no_inference_tags': sorted(tagger.no_inference_tags),
+        'pruning': pruning,
+    }
+    sha.update(json.dumps(settings, ensure_ascii=False).encode('utf-8'))
+    return sha.hexdigest()
+
+class ResultCache:
+    """{(fingerprint, inference_unknown, sentence):pos} stored in a SQLite file
+
+    At most max_entries results are kept. When the cache is full, the least
+    recently used tenth of it is removed. One instance can be used by threads.
+    """
+
+    def __init__(self, path, max_entries=1000000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection as c:
+            c.execute('PRAGMA journal_mode=WAL')
+            c.execute('PRAGMA synchronous=NORMAL')
+            c.execute('CREATE TABLE IF NOT EXISTS models (id INTEGER PRIMARY KEY, fingerprint TEXT UNIQUE)')
+            c.execute('CREATE TABLE IF NOT EXISTS results (model INTEGER, inference INTEGER, '
+                'sentence TEXT, pos TEXT, used INTEGER, PRIMARY KEY (model, inference, sentence))')
+            c.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+        self._count = self._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        # increased by every get_many / put_many, and stored in used column
+        self._clock = self._connection.execute('SELECT MAX(used) FROM results').fetchone()[0] or 0
+        # fingerprint -> id of models table
+        self._model_ids = {}
+
+    def __len__(self):
+        return self._count
+
+    def __getstate__(self):
+        # sqlite connection can not be pickled, so the copy opens the file again
+        return {'path': self.path, 'max_entries': self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['max_entries'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _model_id(self, fingerprint):
+        # the caller stores the id in _model_ids after the transaction is committed,
+        # since the id of a rolled back INSERT is given to the next model
+        model_id = self._model_ids.get(fingerprint)
+        if model_id is None:
+            c = self._connection
+            c.execute('INSERT OR IGNORE INTO models (fingerprint) VALUES (?)', (fingerprint,))
+            model_id = c.execute('SELECT id FROM models WHERE fingerprint = ?',
+                (fingerprint,)).fetchone()[0]
+        return model_id
+
+    def get(self, fingerprint, inference_unknown, sentence):
+        return self.get_many(fingerprint, inference_unknown, [sentence])[0]
+
+    def put(self, fingerprint, inference_unknown, sentence, pos):
+        self.put_many(fingerprint, inference_unknown, [(sentence, pos)])
+
+    def get_many(self, fingerprint, inference_unknown, sentences):
+        """Returns list of pos, or None for the sentences which are not cached.
+        sentences must be normalized with normalize_sentence"""
+        results = {}
+        with self._lock:
+            with self._connection as c:
+                model_id = self._model_id(fingerprint)
+                self._clock += 1
+                unique = list(dict.fromkeys(sentences))
+                for b in range(0, len(unique), _max_variables):
+                    batch = unique[b:b + _max_variables]
+                    marks = ','.join('?' * len(batch))
+                    args = [model_id, int(inference_unknown)] + batch
+                    rows = c.execute('SELECT sentence, pos FROM results WHERE model = ? AND '
+                        'inference = ? AND sentence IN ({})'.format(marks), args).fetchall()
+                    if rows:
+                        c.execute('UPDATE results SET used = {} WHERE model = ? AND inference = ? '
+                            'AND sentence IN ({})'.format(self._clock, marks), args)
+                    for sentence, pos in rows:
+                        results[sentence] = [tuple(wt) for wt in json.loads(pos)]
+            self._model_ids[fingerprint] = model_id
+            n_hits = sum(1 for sentence in sentences if sentence in results)
+            self.hits += n_hits
+            self.misses += len(sentences) - n_hits
+        return [results.get(sentence) for sentence in sentences]
+
+    def put_many(self, fingerprint, inference_unknown, items):
+        """Stores iterable of (normalized sentence, pos)"""
+        with self._lock:
+            count = self._count
+            with self._connection as c:
+                model_id = self._model_id(fingerprint)
+                self._clock += 1
+                rows = [(model_id, int(inference_unknown), sentence,
+                    json.dumps(pos, ensure_ascii=False), self._clock) for sentence, pos in items]
+                cursor = c.executemany('INSERT OR IGNORE INTO results '
+                    '(model, inference, sentence, pos, used) VALUES (?, ?, ?, ?, ?)', rows)
+                count += max(cursor.rowcount, 0)
+                if count > self.max_entries:
+                    n_removed = count - self.max_entries + self.max_entries // 10
+                    cursor = c.execute('DELETE FROM results WHERE rowid IN '
+                        '(SELECT rowid FROM results ORDER BY used LIMIT ?)', (n_removed,))
+                    count -= cursor.rowcount
+            self._model_ids[fingerprint] = model_id
+            self._count = count
+
+    def clear(self):
+        with self._lock, self._connection as c:
+            c.execute('DELETE FROM results')
+            c.execute('DELETE FROM models')
+            self._model_ids = {}
+            self._count = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """CacheInfo. nbytes is the size of the database file"""
+        with self._lock:
+            c = self._connection
+            page_count = c.execute('PRAGMA page_count').fetchone()[0]
+            page_size = c.execute('PRAGMA page_size').fetchone()[0]
+        return CacheInfo(self.hits, self.misses, self.max_entries, self._count,
+            page_count * page_size)
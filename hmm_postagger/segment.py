@@ -0,0 +1,61 @@
+import re
+
+# end of sentence followed by spaces, or line break
+boundary_pattern = re.compile(r'[.?!。]+[\'")\]]*\s+|\n+')
+space_pattern = re.compile(r'\s')
+
+def iter_chunks(text, chunksize=4096):
+    """Yields str chunks of str, file object or iterable of str"""
+    if isinstance(text, str):
+        for i in range(0, len(text), chunksize):
+            yield text[i:i+chunksize]
+    elif hasattr(text, 'read'):
+        for chunk in iter(lambda: text.read(chunksize), ''):
+            yield chunk
+    else:
+        for chunk in text:
+            yield chunk
+
+def iter_segments(text, max_len=200):
+    """Splits text into segments of at most max_len characters
+
+    Yields (segment, continued). Text is split at the end of sentences first,
+    and at the last space before max_len if a sentence is longer than max_len.
+    If there is no space either, text is cut at max_len and continued is True,
+    which means the next segment begins inside the same eojeol.
+    The buffer never exceeds max_len + length of a chunk.
+    """
+    buffer = ''
+    for chunk in iter_chunks(text):
+        buffer += chunk
+        while True:
+            segment, continued, buffer = _split(buffer, max_len)
+            if segment is None:
+                break
+            if segment:
+                yield segment, continued
+    buffer = buffer.strip()
+    while buffer:
+        segment, continued, buffer = _split(buffer, max_len)
+        if segment is None:
+            segment, continued, buffer = buffer, False, ''
+        if segment:
+            yield segment, continued
+
+def _split(buffer, max_len):
+    # returns (segment, continued, rest), or (None, False, buffer) if more text is required
+    m = boundary_pattern.search(buffer, 0, max_len + 1)
+    if m and m.end() < len(buffer):
+        return buffer[:m.end()].strip(), False, buffer[m.end():]
+    if len(buffer) <= max_len:
+        return None, False, buffer
+    # the last space in the first max_len + 1 characters
+    last_space = -1
+    for m in space_pattern.finditer(buffer, 0, max_len + 1):
+        last_space = m.start()
+    if last_space > 0:
+        return buffer[:last_space].strip(), False, buffer[last_space+1:]
+    buffer = buffer.lstrip()
+    if len(buffer) <= max_len:
+        return None, False, buffer
+    return buffer[:max_len], True, buffer[max_len:]
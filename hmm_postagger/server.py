@@ -0,0 +1,372 @@
+"""Tagging server which loads a model once and tags concurrent requests in micro-batches
+
+    python -m hmm_postagger.server --model_path model.bin --port 8000
+    python -m hmm_postagger.server --model_path model.bin --unix_socket /tmp/hmm_postagger.sock
+
+HTTP/1.1 API (JSON, keep-alive)
+
+    POST /tag      {"sentence": str} or {"sentences": [str]}, optional "inference_unknown"
+                   -> {"pos": [[word, tag]]} or {"pos": [[[word, tag]]]}
+    GET  /metrics  counters, batch size and latency histograms
+    GET  /health   {"status": "ok", "model_version": int}
+
+With n_jobs > 1, workers are processes which keep the model of the time
+they were started. When the model or user dictionary of the tagger is
+changed, the workers are restarted before the next batch, and model_version
+is the version of the model which the workers use.
+
+Requests are queued and a batch is dispatched when max_batch_size sentences
+are waiting or max_delay_ms has passed since the oldest one. At most n_jobs
+batches run at the same time. If more than max_queue sentences are waiting,
+the request is rejected with 503.
+"""
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+import json
+import multiprocessing as mp
+import os
+import signal
+import time
+
+from . import parallel
+from .profiler import COUNT_BUCKETS
+from .profiler import Histogram
+from .profiler import TIME_BUCKETS
+
+reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error',
+    503: 'Service Unavailable'}
+
+class QueueFull(Exception):
+    pass
+
+
+class MicroBatcher:
+    """Coalesces sentences of concurrent requests into batches
+
+    run_batch(sentences, inference_unknown) is a coroutine function which
+    returns the pos of sentences.
+    """
+
+    def __init__(self, run_batch, max_batch_size=64, max_delay_ms=5,
+        max_queue=10000, max_inflight=1):
+
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.max_queue = max_queue
+        # (sentence, inference_unknown, future, enqueued time)
+        self._queue = deque()
+        self._event = asyncio.Event()
+        self._inflight = asyncio.Semaphore(max_inflight)
+        self._tasks = set()
+        self.n_batches = 0
+        self.batch_sizes = Histogram(COUNT_BUCKETS)
+
+    def __len__(self):
+        return len(self._queue)
+
+    async def submit(self, sentences, inference_unknown=True):
+        if len(self._queue) + len(sentences) > self.max_queue:
+            raise QueueFull('{} sentences are waiting'.format(len(self._queue)))
+        loop = asyncio.get_running_loop()
+        now = time.perf_counter()
+        futures = []
+        for sentence in sentences:
+            future = loop.create_future()
+            self._queue.append((sentence, inference_unknown, future, now))
+            futures.append(future)
+        self._event.set()
+        return await asyncio.gather(*futures)
+
+    async def run(self):
+        while True:
+            if not self._queue:
+                self._event.clear()
+                await self._event.wait()
+            # wait for more sentences until the batch is full or the oldest one is late
+            deadline = self._queue[0][3] + self.max_delay
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._event.clear()
+                try:
+                    await asyncio.wait_for(self._event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            await self._inflight.acquire()
+            batch = self._pop_batch()
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _pop_batch(self):
+        # sentences of the same inference_unknown
+        inference_unknown = self._queue[0][1]
+        batch = []
+        rest = deque()
+        while self._queue and len(batch) < self.max_batch_size:
+            item = self._queue.popleft()
+            if item[2].cancelled():
+                continue
+            (batch if item[1] == inference_unknown else rest).append(item)
+        self._queue.extendleft(reversed(rest))
+        return batch
+
+    async def _dispatch(self, batch):
+        try:
+            if not batch:
+                return
+            self.n_batches += 1
+            self.batch_sizes.add(len(batch))
+            try:
+                results = await self.run_batch([item[0] for item in batch], batch[0][1])
+            except Exception as e:
+                for item in batch:
+                    if not item[2].done():
+                        item[2].set_exception(e)
+                return
+            for item, pos in zip(batch, results):
+                if not item[2].done():
+                    item[2].set_result(pos)
+        finally:
+            self._inflight.release()
+
+
+class TaggerServer:
+    def __init__(self, tagger, max_batch_size=64, max_delay_ms=5, max_queue=10000, n_jobs=1):
+        self.tagger = tagger
+        self.n_jobs = os.cpu_count() if n_jobs <= 0 else n_jobs
+        self.max_batch_size = max_batch_size
+        self.max_delay_ms = max_delay_ms
+        self.max_queue = max_queue
+        self._executor = None
+        # snapshot of the tagger which worker processes use
+        self._worker_snapshot = None
+        self._server = None
+        self._batcher = None
+        self._batcher_task = None
+        # task of each connection -> its writer
+        self._handlers = {}
+
+        self.n_requests = 0
+        self.n_sentences = 0
+        self.n_rejected = 0
+        self.n_errors = 0
+        self.latency = Histogram(TIME_BUCKETS)
+        self._begin_time = time.time()
+
+    def _create_executor(self):
+        if self.n_jobs == 1:
+            # a thread keeps the event loop responsive while tagging
+            return ThreadPoolExecutor(1)
+        # workers use parallel._tagger, like tag_iter.
+        # with fork, initargs are inherited by workers without pickling
+        if 'fork' in mp.get_all_start_methods():
+            context = mp.get_context('fork')
+        else:
+            context = mp.get_context()
+        # workers tag without result cache, which is used only in this process
+        self._worker_snapshot = self.tagger._snapshot
+        return ProcessPoolExecutor(self.n_jobs, mp_context=context,
+            initializer=parallel._init_worker,
+            initargs=(parallel._worker_copy(self._worker_snapshot),))
+
+    @property
+    def model_version(self):
+        """Version of the model which tags the requests"""
+        if self._worker_snapshot is not None:
+            return self._worker_snapshot.model_version
+        return self.tagger.model_version
+
+    async def _run_batch(self, sentences, inference_unknown):
+        loop = asyncio.get_running_loop()
+        if self.n_jobs == 1:
+            return await loop.run_in_executor(self._executor,
+                self._tag_sentences, sentences, inference_unknown)
+        if self.tagger._snapshot is not self._worker_snapshot:
+            # the tagger was changed after the workers were started.
+            # running batches are finished by the old workers
+            executor = self._executor
+            self._executor = self._create_executor()
+            executor.shutdown(wait=False)
+        snapshot = self._worker_snapshot
+        executor = self._executor
+        if snapshot.result_cache is None:
+            return await loop.run_in_executor(executor,
+                parallel._tag_chunk, (sentences, inference_unknown, False))
+
+        # one bulk get and put of result cache in a thread of this process,
+        # which waits for the workers tagging the misses
+        def tag_misses(misses):
+            return executor.submit(parallel._tag_chunk,
+                (misses, inference_unknown, False)).result()
+
+        pruning = snapshot._pruning(None, None, None)
+        return await loop.run_in_executor(None, snapshot._tag_cached,
+            sentences, inference_unknown, pruning, tag_misses)
+
+    def _tag_sentences(self, sentences, inference_unknown):
+        return [self.tagger.tag(sent, inference_unknown) for sent in sentences]
+
+    async def start(self, host='127.0.0.1', port=8000, unix_socket=None):
+        self._executor = self._create_executor()
+        self._batcher = MicroBatcher(self._run_batch, self.max_batch_size,
+            self.max_delay_ms, self.max_queue, max_inflight=self.n_jobs)
+        self._batcher_task = asyncio.ensure_future(self._batcher.run())
+        if unix_socket:
+            self._server = await asyncio.start_unix_server(self._handle, path=unix_socket)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        self._begin_time = time.time()
+        return self._server
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self, host='127.0.0.1', port=8000, unix_socket=None):
+        await self.start(host, port, unix_socket)
+        stop = asyncio.Event()
+        try:
+            # close the workers too when the server is terminated
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # not supported on the platform or out of the main thread
+            pass
+        try:
+            await stop.wait()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher_task is not None:
+            self._batcher_task.cancel()
+        # connections which are kept alive. closing them ends their handlers
+        handlers = dict(self._handlers)
+        for writer in handlers.values():
+            writer.close()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def metrics(self):
+        elapsed = max(time.time() - self._begin_time, 1e-9)
+        metrics = {
+            'requests': self.n_requests,
+            'sentences': self.n_sentences,
+            'rejected': self.n_rejected,
+            'errors': self.n_errors,
+            'queue_size': len(self._batcher) if self._batcher is not None else 0,
+            'batches': self._batcher.n_batches if self._batcher is not None else 0,
+            'uptime_sec': elapsed,
+            'sents_per_sec': self.n_sentences / elapsed,
+            'model_version': self.model_version,
+        }
+        metrics.update(self.latency.export('latency_ms'))
+        if self._batcher is not None:
+            metrics.update(self._batcher.batch_sizes.export('batch_size'))
+        return metrics
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split(None, 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, value = line.decode('latin-1').split(':', 1)
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, payload = await self._route(method, target, body)
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                    and not version.startswith('HTTP/1.0'))
+                writer.write(('HTTP/1.1 {} {}\r\nContent-Type: application/json; charset=utf-8\r\n'
+                    'Content-Length: {}\r\nConnection: {}\r\n\r\n').format(
+                    status, reasons[status], len(data),
+                    'keep-alive' if keep_alive else 'close').encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._handlers.pop(task, None)
+            writer.close()
+
+    async def _route(self, method, target, body):
+        path = target.split('?', 1)[0]
+        if method == 'GET' and path == '/metrics':
+            return 200, self.metrics()
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok', 'model_version': self.model_version}
+        if method == 'POST' and path == '/tag':
+            return await self._tag(body)
+        return 404, {'error': 'Unknown path {} {}'.format(method, path)}
+
+    async def _tag(self, body):
+        begin = time.perf_counter()
+        try:
+            request = json.loads(body.decode('utf-8'))
+            single = 'sentence' in request
+            sentences = [request['sentence']] if single else request['sentences']
+            if not all(isinstance(sent, str) for sent in sentences):
+                raise ValueError('sentences must be str')
+            inference_unknown = bool(request.get('inference_unknown', True))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            return 400, {'error': 'Invalid request: {}'.format(e)}
+
+        self.n_requests += 1
+        try:
+            pos = await self._batcher.submit(sentences, inference_unknown)
+        except QueueFull as e:
+            self.n_rejected += 1
+            return 503, {'error': str(e)}
+        except Exception as e:
+            self.n_errors += 1
+            return 500, {'error': '{}: {}'.format(type(e).__name__, e)}
+        self.n_sentences += len(sentences)
+        self.latency.add((time.perf_counter() - begin) * 1000)
+        return 200, {'pos': pos[0] if single else pos}
+
+def serve(tagger, host='127.0.0.1', port=8000, unix_socket=None, **kwargs):
+    server = TaggerServer(tagger, **kwargs)
+    asyncio.run(server.serve_forever(host, port, unix_socket))
+
+def main():
+    import argparse
+    from .tagger import TrainedHMMTagger
+
+    parser = argparse.ArgumentParser(description='Tagging server with micro-batching')
+    parser.add_argument('--model_path', type=str, required=True)
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix_socket', type=str, default=None)
+    parser.add_argument('--max_batch_size', type=int, default=64)
+    parser.add_argument('--max_delay_ms', type=float, default=5)
+    parser.add_argument('--max_queue', type=int, default=10000)
+    parser.add_argument('--n_jobs', type=int, default=1)
+    args = parser.parse_args()
+
+    tagger = TrainedHMMTagger(args.model_path)
+    serve(tagger, args.host, args.port, args.unix_socket,
+        max_batch_size=args.max_batch_size, max_delay_ms=args.max_delay_ms,
+        max_queue=args.max_queue, n_jobs=args.n_jobs)
+
+if __name__ == '__main__':
+    main()
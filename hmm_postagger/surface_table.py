@@ -0,0 +1,161 @@
+"""Pre-analyzed table of conjugated surface forms
+
+Stems of Verb / Adjective and Eomi of a model are conjugated forward with
+lemmatizer.conjugate, and the lemmas of every (surface, split) of the forms
+are computed once. Then TrainedHMMTagger._lemmatize of those forms is a dict
+lookup, and the rules run only for the other substrings.
+
+The table is valid only for the model and user dictionary which it is
+built with, so the file stores their fingerprint, and load rejects a table
+of another model.
+
+File layout (little endian)
+
+    header   : magic, model fingerprint, n_surfaces, n_keys, n_refs, n_analyses
+    surfaces : uint32 offsets[n_surfaces+1] + utf-8 blob, sorted
+    keys     : uint32 key_ptr[n_surfaces+1], uint8 splits[n_keys]
+    lemmas   : uint32 ref_ptr[n_keys+1], uint32 analysis ids[n_refs]
+    analyses : uint32 offsets[n_analyses+1] + utf-8 blob of 'word<TAB>tag0<TAB>tag1'
+"""
+from array import array
+import struct
+import sys
+
+from .binary_model import _encode_strings
+from .lemmatizer import conjugate
+from .utils import check_dirs
+
+MAGIC = b'HMMSRF\x00\x02'
+_header = struct.Struct('<8s40s4I')
+
+class SurfaceTable:
+    """(surface, split) -> tuple of (word, tag0, tag1) lemmas"""
+
+    def __init__(self, lemmas=None):
+        self._lemmas = dict(lemmas) if lemmas else {}
+
+    def __len__(self):
+        return len(self._lemmas)
+
+    def __contains__(self, key):
+        return key in self._lemmas
+
+    def get(self, key, default=None):
+        return self._lemmas.get(key, default)
+
+    def copy(self):
+        return SurfaceTable(self._lemmas)
+
+    def invalidate(self, predicate):
+        """Removes entries of surfaces which predicate(surface) is True"""
+        for key in [key for key in self._lemmas if predicate(key[0])]:
+            del self._lemmas[key]
+
+    def save(self, path, fingerprint):
+        """fingerprint is TrainedHMMTagger.model_fingerprint() of the model
+        which the table is built with"""
+        surfaces = sorted({surface for surface, _ in self._lemmas})
+        analyses = sorted({'\t'.join(lemma) for lemmas in self._lemmas.values() for lemma in lemmas})
+        analysis_index = {analysis:i for i, analysis in enumerate(analyses)}
+        splits = {}
+        for surface, i in self._lemmas:
+            splits.setdefault(surface, []).append(i)
+
+        key_ptr, key_splits = array('I', [0]), array('B')
+        ref_ptr, refs = array('I', [0]), array('I')
+        for surface in surfaces:
+            for i in sorted(splits[surface]):
+                key_splits.append(i)
+                refs.extend(analysis_index['\t'.join(lemma)] for lemma in self._lemmas[(surface, i)])
+                ref_ptr.append(len(refs))
+            key_ptr.append(len(key_splits))
+        surface_offsets, surface_blob = _encode_strings(surfaces)
+        analysis_offsets, analysis_blob = _encode_strings(analyses)
+
+        check_dirs(path)
+        with open(path, 'wb') as f:
+            f.write(_header.pack(MAGIC, fingerprint.encode('ascii'),
+                len(surfaces), len(key_splits), len(refs), len(analyses)))
+            for data in [surface_offsets, surface_blob, key_ptr, key_splits,
+                ref_ptr, refs, analysis_offsets, analysis_blob]:
+                if isinstance(data, array):
+                    if sys.byteorder != 'little':
+                        data = array(data.typecode, data)
+                        data.byteswap()
+                    data = data.tobytes()
+                f.write(data)
+
+    @classmethod
+    def load(cls, path, fingerprint=None):
+        """Raises ValueError if fingerprint is given and the table is built
+        with another model or user dictionary"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, stored, n_surfaces, n_keys, n_refs, n_analyses = _header.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('{} is not a surface table of this version'.format(path))
+        if fingerprint is not None and stored.decode('ascii') != fingerprint:
+            raise ValueError('{} was built with another model or user dictionary'.format(path))
+        position = _header.size
+
+        def read_array(typecode, n):
+            nonlocal position
+            values = array(typecode)
+            values.frombytes(data[position:position + n * values.itemsize])
+            if sys.byteorder != 'little':
+                values.byteswap()
+            position += n * values.itemsize
+            return values
+
+        def read_strings(n):
+            nonlocal position
+            offsets = read_array('I', n + 1)
+            blob = data[position:position + offsets[-1]]
+            position += offsets[-1]
+            return [sys.intern(str(blob[b:e], 'utf-8')) for b, e in zip(offsets, offsets[1:])]
+
+        surfaces = read_strings(n_surfaces)
+        key_ptr = read_array('I', n_surfaces + 1)
+        key_splits = read_array('B', n_keys)
+        ref_ptr = read_array('I', n_keys + 1)
+        refs = read_array('I', n_refs)
+        analyses = [tuple(analysis.split('\t')) for analysis in read_strings(n_analyses)]
+
+        lemmas = {}
+        for s, surface in enumerate(surfaces):
+            for k in range(key_ptr[s], key_ptr[s + 1]):
+                lemmas[(surface, key_splits[k])] = tuple(
+                    analyses[a] for a in refs[ref_ptr[k]:ref_ptr[k + 1]])
+        return cls(lemmas)
+
+def _top_words(words, n):
+    # words of the highest emission scores
+    if n is None or n >= len(words):
+        return list(words)
+    return sorted(words, key=lambda word: -words[word])[:n]
+
+def build_surface_table(tagger, max_stems=None, max_endings=None):
+    """Conjugates max_stems Verb / Adjective stems and max_endings Eomi of the
+    highest scores (all if None), and stores the lemmas of their surfaces"""
+    stems = [stem for tag in ('Verb', 'Adjective') if tag in tagger.emission
+        for stem in _top_words(tagger.emission[tag], max_stems)]
+    # a surface ending is at most 2 characters, and conjugation shortens an ending by 1 at most
+    endings = [ending for ending in _top_words(tagger.emission.get('Eomi', {}), max_endings)
+        if len(ending) <= 3]
+
+    keys = set()
+    for stem in set(stems):
+        for ending in endings:
+            for l, r in conjugate(stem, ending):
+                i = len(l)
+                if (i <= tagger._max_modifier_len and len(r) <= 2
+                    and i + len(r) <= tagger._max_word_len):
+                    keys.add((l + r, i))
+
+    lemmas = {}
+    for word, i in keys:
+        try:
+            lemmas[(word, i)] = tuple(tagger._lemmatize_uncached(word, i))
+        except ValueError:
+            lemmas[(word, i)] = ()
+    return SurfaceTable(lemmas)
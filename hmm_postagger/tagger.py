@@ -1,18 +1,104 @@
 from collections import defaultdict
+from itertools import chain
 import json
-import re
-
-from .path import ford_list
+from operator import itemgetter
+import sys
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .binary_model import BinaryModel
+from .binary_model import is_binary_model
+from .batch_decode import viterbi_batch
+from .binary_model import MappedEmission
+from .lemmatizer import chosung_base
+from .lemmatizer import kor_begin
+from .lemmatizer import kor_end
 from .lemmatizer import lemma_candidate
+from .lemmatizer import lemma_cache_info
+from .lexicon import Lexicon
+from .parallel import tag_iter
+from .path import viterbi
+from .profiler import TagProfiler
+from .result_cache import model_fingerprint
+from .result_cache import normalize_sentence
+from .result_cache import ResultCache
+from .segment import iter_segments
+from .surface_table import build_surface_table
+from .surface_table import SurfaceTable
 from .utils import bos as bos_state
 from .utils import eos as eos_state
 from .utils import unk as unk_state
-
-doublespace_pattern = re.compile(u'\s+', re.UNICODE)
+from .user_dictionary import read_user_dictionary
+from .utils import LRUCache
+from .utils import doublespace_pattern
+
+_first, _second, _third = itemgetter(0), itemgetter(1), itemgetter(2)
+
+def _sizeof_lookup(pos):
+    # approximate memory of _word_lookup result. strings are shared with lexicon
+    return sys.getsizeof(pos) + sum(
+        sys.getsizeof(words) + sum(sys.getsizeof(word) for word in words)
+        for words in pos)
+
+def _chosung_of(c):
+    i = ord(c)
+    if kor_begin <= i <= kor_end:
+        return (i - kor_begin) // chosung_base
+    return -1
+
+def _affected_predicate(words):
+    """Returns a function which tells whether the lookup of an eojeol may depend on words
+
+    lemma_candidate changes only the jungsung and jongsung of the last
+    syllable of stem (구르 is the only exception, 굴 + 러), and the first
+    character of ending. So a stem w appears in eojeol as w[:-1] followed by
+    a syllable of the same chosung, and an ending w contains w[1:].
+    Returns None if every eojeol may depend on words.
+    """
+    tails = set()
+    heads = set()
+    max_len = 0
+    for word in words:
+        if len(word) < 2:
+            return None
+        tails.add(word[1:])
+        if _chosung_of(word[-1]) >= 0:
+            heads.add((word[:-1], _chosung_of(word[-1])))
+        if word[-1] == '르' and _chosung_of(word[-2]) >= 0:
+            heads.add((word[:-2], _chosung_of(word[-2])))
+        max_len = max(max_len, len(word))
+
+    def affected(eojeol):
+        n = len(eojeol)
+        for b in range(n):
+            for e in range(b, min(n, b + max_len) + 1):
+                sub = eojeol[b:e]
+                if sub in tails:
+                    return True
+                if e < n and (sub, _chosung_of(eojeol[e])) in heads:
+                    return True
+        return False
+    return affected
 
 class TrainedHMMTagger:
+    """HMM tagger. One instance can be shared by threads
+
+    tag() reads an immutable snapshot of the model, a shallow copy of the
+    tagger. Updates of the user dictionary and the model build new emission,
+    lexicon and caches without changing the current ones, and publish a new
+    snapshot at once. So tag() needs no lock, and a call sees either the
+    model before an update or after it. Updates are serialized by a lock.
+    """
+
     def __init__(self, model_path=None, transition=None,
-        emission=None, acceptable_transition=None, no_inference_tags=None):
+        emission=None, acceptable_transition=None, no_inference_tags=None,
+        lemmatize_cache_size=100000, eojeol_cache_size=10000,
+        beam_width=None, score_margin=None, max_nodes_per_position=None,
+        compact=False):
 
         self.transition = transition if transition else {}
         self.emission = emission if emission else {}
@@ -28,13 +114,84 @@ class TrainedHMMTagger:
         self._noun_preference = 3.0
         self._a_syllable_noun_penalty = 5.0
 
+        # (word, i) -> lemmas
+        self._lemmatize_cache = LRUCache(maxsize=lemmatize_cache_size)
+        # eojeol -> _word_lookup result with offset 0
+        self._eojeol_cache = LRUCache(maxsize=eojeol_cache_size, sizeof=_sizeof_lookup)
+        # increased whenever emission changes
+        self.model_version = 0
+        # {tag:{word:score}} of user dictionary. kept when model is reloaded.
+        # None score means the max score of the tag
+        self.user_dictionary = {}
+        # (tag, word) -> score of the model before the user word is added, or None
+        self._user_base_scores = {}
+        # lattice pruning. None means no pruning
+        # beam_width / score_margin: nodes which end at the same position are
+        # expanded only if they are in top beam_width and within score_margin
+        # of the best one. max_nodes_per_position: candidate words per position
+        self.beam_width = beam_width
+        self.score_margin = score_margin
+        self.max_nodes_per_position = max_nodes_per_position
+
+        # TagProfiler. tag() is not instrumented if None
+        self.profiler = None
+        # persistent ResultCache of tag(). None means no cache
+        self.result_cache = None
+        # sha1 of the model without user dictionary, computed when it is first used.
+        # shared by the snapshots of the same model. See result_cache.model_fingerprint
+        self._model_digest = {}
+        # SurfaceTable of pre-analyzed conjugated forms. not kept when model is reloaded
+        self.surface_table = None
+        # if True, dict emission is stored in an in-memory BinaryModel
+        self.compact = compact
+        # serializes updates. tag() does not use it
+        self._update_lock = threading.Lock()
+
         if isinstance(model_path, str):
-            self.load_model_from_json(model_path)
-            self._initialize(acceptable_transition)
-        elif (transition is not None) and (emission is not None):
-            self._initialize(acceptable_transition)
-        else:
+            self.load_model(model_path)
+        elif (transition is None) or (emission is None):
             raise ValueError('Insert model path or transition and emission manually')
+        if compact and not isinstance(self.emission, MappedEmission):
+            self._compact_model()
+        self._initialize(acceptable_transition)
+        self._publish()
+
+    def _publish(self, **changes):
+        """Sets changed attributes and publishes a new snapshot for tag()
+
+        Objects referred by a published snapshot must not be changed, except
+        the LRU caches which are shared by snapshots and safe for threads.
+        """
+        self.__dict__.update(changes)
+        snapshot = object.__new__(TrainedHMMTagger)
+        snapshot.__dict__.update(self.__dict__)
+        snapshot._snapshot = snapshot
+        self._snapshot = snapshot
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('_update_lock', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._update_lock = threading.Lock()
+
+    def _compact_model(self):
+        model = BinaryModel.from_model(self.emission, self.transition)
+        self.emission = model.emission()
+        self.transition = model.transition()
+
+    def load_model(self, model_path):
+        if is_binary_model(model_path):
+            self.load_model_from_binary(model_path)
+        else:
+            self.load_model_from_json(model_path)
+
+    def load_model_from_binary(self, model_path):
+        model = BinaryModel(model_path)
+        self.emission = model.emission()
+        self.transition = model.transition()
 
     def load_model_from_json(self, model_path):
         with open(model_path, encoding='utf-8') as f:
@@ -64,18 +221,104 @@ class TrainedHMMTagger:
             for state, observations in self.emission.items()
         }
 
-    def tag(self, sentence, inference_unknown=True):
+        # word -> {tag:score} index with common prefix search
+        if isinstance(self.emission, MappedEmission):
+            self.lexicon = self.emission._model.lexicon()
+        else:
+            self.lexicon = Lexicon(self.emission)
+
+        self._initialize_tag_index()
+        self._initialize_inference_table()
+
+    def _initialize_tag_index(self):
+        # tag -> integer id
+        tags = set(self.emission)
+        tags.update(tag for pair in self.transition for tag in pair)
+        tags.update((bos_state, eos_state, unk_state))
+        self._tags = sorted(tags)
+        self._tag_index = {tag:i for i, tag in enumerate(self._tags)}
+
+        # dense T x T transition score and acceptable transition mask
+        n_tags = len(self._tags)
+        tag_index = self._tag_index
+        self._transition_matrix = [[self.unknown_transition] * n_tags for _ in range(n_tags)]
+        for (tag0, tag1), score in self.transition.items():
+            self._transition_matrix[tag_index[tag0]][tag_index[tag1]] = score
+        self._acceptable_mask = [[False] * n_tags for _ in range(n_tags)]
+        for tag0, tag1 in self.acceptable_transition:
+            if tag0 in tag_index and tag1 in tag_index:
+                self._acceptable_mask[tag_index[tag0]][tag_index[tag1]] = True
+        # for the gather of _add_weights. NumPy is optional
+        if np is not None:
+            self._transition_array = np.array(self._transition_matrix, dtype=np.float64)
+
+    def tag(self, sentence, inference_unknown=True, beam_width=None,
+        score_margin=None, max_nodes_per_position=None):
+        """Pruning arguments override those of the constructor. 0 disables them"""
+        pruning = self._pruning(beam_width, score_margin, max_nodes_per_position)
+        snapshot = self._snapshot
+        if snapshot.result_cache is not None:
+            return snapshot._tag_cached([sentence], inference_unknown, pruning)[0]
+        return snapshot._tag(sentence, inference_unknown, pruning)
+
+    def _tag_cached(self, sentences, inference_unknown, pruning, tag_misses=None):
+        """tag() of sentences with one bulk get and put of result_cache
+
+        Sentences are normalized first, so a miss is tagged as the normalized
+        sentence. tag_misses(list of str) tags the misses if given.
+        """
+        cache = self.result_cache
+        fingerprint = self.model_fingerprint(pruning)
+        keys = [normalize_sentence(sentence) for sentence in sentences]
+        results = cache.get_many(fingerprint, inference_unknown, keys)
+        misses = [i for i, pos in enumerate(results) if pos is None]
+        if misses:
+            if tag_misses is None:
+                tagged = [self._tag(keys[i], inference_unknown, pruning) for i in misses]
+            else:
+                tagged = tag_misses([keys[i] for i in misses])
+            for i, pos in zip(misses, tagged):
+                results[i] = pos
+            cache.put_many(fingerprint, inference_unknown, zip([keys[i] for i in misses], tagged))
+        return results
+
+    def model_fingerprint(self, pruning=None):
+        """sha1 of the model, user dictionary and settings. See result_cache"""
+        snapshot = self._snapshot
+        # computed once for each snapshot, which never changes
+        fingerprints = snapshot.__dict__.get('_fingerprints')
+        if fingerprints is None:
+            fingerprints = snapshot._fingerprints = {}
+        fingerprint = fingerprints.get(pruning)
+        if fingerprint is None:
+            fingerprint = fingerprints[pruning] = model_fingerprint(snapshot, pruning)
+        return fingerprint
+
+    def enable_result_cache(self, path, max_entries=1000000):
+        """Stores the results of tag(), tag_iter() and tag_batch() in a SQLite
+        file, and returns the ResultCache. See result_cache"""
+        cache = ResultCache(path, max_entries)
+        with self._update_lock:
+            self._publish(result_cache=cache)
+        return cache
+
+    def disable_result_cache(self):
+        """Returns the ResultCache, which is not closed"""
+        with self._update_lock:
+            cache = self.result_cache
+            self._publish(result_cache=None)
+        return cache
+
+    def _tag(self, sentence, inference_unknown, pruning):
+        if self.profiler is not None:
+            return self._tag_profiled(sentence, inference_unknown, pruning)
+
         # lookup
         chars = sentence.replace(' ','')
         lookupeds = self._sentence_lookup(sentence)
 
-        # generate candidates
-        edges, bos, eos = self._generate_edge(chars, lookupeds)
-        edges = self._add_weight(edges)
-        nodes = {node for edge in edges for node in edge[:2]}
-
-        # choose optimal sequence
-        path, cost = ford_list(edges, nodes, bos, eos)
+        # generate candidates and choose optimal sequence
+        path = self._best_path(chars, lookupeds, pruning)
 
         pos = self._separate_morphemes(path)
 
@@ -85,6 +328,178 @@ class TrainedHMMTagger:
         pos = self._postprocess(pos)
         return pos
 
+    def _tag_profiled(self, sentence, inference_unknown, pruning):
+        profiler = self.profiler
+        profiler.begin()
+        chars = sentence.replace(' ','')
+        lookupeds = self._sentence_lookup(sentence)
+        profiler.lap('lookup')
+        profiler.count('chars', len(chars))
+        profiler.count('nodes', sum(len(words) for words in lookupeds))
+
+        path = self._best_path(chars, lookupeds, pruning, profiler)
+
+        pos = self._separate_morphemes(path)
+        if inference_unknown:
+            pos = self._inference_unknown(pos)
+        profiler.lap('inference')
+
+        pos = self._postprocess(pos)
+        profiler.lap('postprocess')
+        profiler.end_call(sentence)
+        return pos
+
+    def _pruning(self, beam_width, score_margin, max_nodes_per_position):
+        if beam_width is None:
+            beam_width = self.beam_width
+        if score_margin is None:
+            score_margin = self.score_margin
+        if max_nodes_per_position is None:
+            max_nodes_per_position = self.max_nodes_per_position
+        if not (beam_width or score_margin or max_nodes_per_position):
+            return None
+        return beam_width, score_margin, max_nodes_per_position
+
+    def _best_path(self, chars, lookupeds, pruning=None, profiler=None):
+        node_weights = {}
+        if pruning is not None:
+            beam_width, score_margin, max_nodes = pruning
+            full_lookupeds = lookupeds
+            lookupeds = self._cap_nodes(lookupeds, max_nodes, node_weights)
+        else:
+            beam_width, score_margin = None, None
+
+        edges, bos, eos = self._generate_edge(chars, lookupeds)
+        if profiler is not None:
+            profiler.lap('edge')
+            profiler.count('edges', len(edges))
+            profiler.count('unknown_spans', len({v for _, v in edges if v[1] == unk_state}))
+
+        edges = self._add_weight(edges, node_weights)
+        if profiler is not None:
+            profiler.lap('weight')
+
+        stats = {} if profiler is not None else None
+        try:
+            path, cost = viterbi(edges, bos, eos, stats, beam_width, score_margin or None)
+        except ValueError:
+            if pruning is None:
+                raise
+            # pruning removed every path to EOS. decode the whole lattice
+            return self._best_path(chars, full_lookupeds, None, profiler)
+        if profiler is not None:
+            profiler.lap('decode')
+            profiler.count('decoder_iterations', stats['decoder_iterations'])
+        return path
+
+    def _cap_nodes(self, sent, max_nodes, node_weights):
+        # copy, because _generate_edge appends nodes to the lists
+        if not max_nodes:
+            return [list(words) for words in sent]
+        sent_ = []
+        for words in sent:
+            if len(words) > max_nodes:
+                for node in words:
+                    if node not in node_weights:
+                        node_weights[node] = self._node_weight(node)
+                words = sorted(words, key=lambda node: -node_weights[node])[:max_nodes]
+            else:
+                words = list(words)
+            sent_.append(words)
+        return sent_
+
+    def enable_profiling(self, sink=None):
+        """Instruments tag() and returns TagProfiler. See profiler.TagProfiler
+
+        A profiler measures the calls of one thread at a time.
+        """
+        with self._update_lock:
+            self._publish(profiler=TagProfiler(sink))
+        return self.profiler
+
+    def disable_profiling(self):
+        with self._update_lock:
+            profiler = self.profiler
+            self._publish(profiler=None)
+        return profiler
+
+    def tag_long(self, text, max_len=200, overlap=20, inference_unknown=True):
+        """Lazily tags a long text segment by segment
+
+        text is str, file object or iterable of str. It yields the pos of each
+        segment. See segment.iter_segments. An eojeol longer than max_len is
+        decoded in windows of max_len characters, and only the morphemes which
+        end before the last overlap characters of a window are yielded.
+        """
+        if max_len < 2 * overlap:
+            raise ValueError('max_len must be at least 2 * overlap')
+        # the whole text is tagged with one snapshot
+        snapshot = self._snapshot
+        pruning = self._pruning(None, None, None)
+        # beginning of the eojeol which was not yielded
+        carry = ''
+        for segment, continued in iter_segments(text, max_len):
+            segment = carry + segment
+            carry = ''
+            if not continued:
+                yield snapshot._tag(segment, inference_unknown, pruning)
+                continue
+            pos, carry = snapshot._tag_window(segment, overlap, inference_unknown, pruning)
+            if pos:
+                yield pos
+        if carry:
+            yield snapshot._tag(carry, inference_unknown, pruning)
+
+    def _tag_window(self, chars, overlap, inference_unknown, pruning):
+        # segment has no space
+        path = self._best_path(chars, self._sentence_lookup(chars), pruning)
+        nodes = path[1:-1]
+        limit = len(chars) - overlap
+        # commit morphemes up to the last node which ends before limit
+        n_commit = 1
+        for i, node in enumerate(nodes):
+            if node[4] <= limit:
+                n_commit = i + 1
+        commit_end = nodes[n_commit-1][4]
+        pos = self._separate_morphemes(path[:n_commit+1])
+        # the next morpheme is the context of unknown word inference
+        pos += self._separate_morphemes(path[n_commit+1:n_commit+2])[:1]
+        if inference_unknown:
+            pos = self._inference_unknown(pos)
+        return self._postprocess(pos), chars[commit_end:]
+
+    def tag_iter(self, sentences, n_jobs=1, chunksize=100, inference_unknown=True,
+        vectorized=False):
+        """Lazily tags sentences with n_jobs processes, preserving input order
+
+        If vectorized, the lattices of each chunk are decoded at once with
+        NumPy. See batch_decode. Results are the same with tag().
+        """
+        return tag_iter(self, sentences, n_jobs, chunksize, inference_unknown,
+            vectorized=vectorized)
+
+    def tag_batch(self, sentences, n_jobs=1, chunksize=100, inference_unknown=True,
+        vectorized=False):
+        return list(self.tag_iter(sentences, n_jobs, chunksize, inference_unknown, vectorized))
+
+    def _tag_many(self, sentences, inference_unknown, pruning, vectorized=False):
+        # pruning and profiling are supported only by _tag
+        if not vectorized or pruning is not None or self.profiler is not None:
+            return [self._tag(sentence, inference_unknown, pruning) for sentence in sentences]
+        lattices = []
+        for sentence in sentences:
+            chars = sentence.replace(' ','')
+            lattices.append(self._generate_edge(chars, self._sentence_lookup(sentence)))
+        graphs = self._add_weights([edges for edges, _, _ in lattices])
+        lattices = [(graph, bos, eos) for graph, (_, bos, eos) in zip(graphs, lattices)]
+        tagged = []
+        for path, _ in viterbi_batch(lattices):
+            pos = self._separate_morphemes(path)
+            if inference_unknown:
+                pos = self._inference_unknown(pos)
+            tagged.append(self._postprocess(pos))
+        return tagged
+
     def _separate_morphemes(self, path):
         pos = []
         for word, tag0, tag1, b, e in path:
@@ -95,6 +510,7 @@ class TrainedHMMTagger:
         return pos
 
     def _inference_unknown(self, pos):
+        table = self._inference_table
         pos_ = []
         for i, pos_i in enumerate(pos[:-1]):
             # skip bos or known state
@@ -102,35 +518,65 @@ class TrainedHMMTagger:
                 pos_.append(pos_i)
                 continue
 
-            # previous -> current transition
-            tag_prob = {
-                tag:prob for (prev_tag, tag), prob in self.transition.items()
-                if prev_tag == pos[i-1][1]
-            }
-
-            # current -> next transition
-            for (tag, next_tag), prob in self.transition.items():
-                if next_tag == pos[i+1][1]:
-                    tag_prob[tag] = tag_prob.get(tag, 0) + prob
-
-            for tag in self._no_inference_tags:
-                if tag in tag_prob:
-                    tag_prob.pop(tag)
-
-            if not tag_prob:
-                infered_tag = 'Noun'
-            else:
-                infered_tag = sorted(tag_prob, key=lambda x:-tag_prob[x])[0]
+            key = (pos[i-1][1], pos[i+1][1])
+            infered_tag = table.get(key)
+            # the table is shared by snapshots, so it is not changed here
+            if infered_tag is None:
+                infered_tag = self._infer_tag(*key)
 
             pos_.append((pos_i[0], infered_tag))
         pos_.append(pos[-1])
 
         return pos_
 
+    @property
+    def no_inference_tags(self):
+        return self._no_inference_tags
+
+    @no_inference_tags.setter
+    def no_inference_tags(self, tags):
+        with self._update_lock:
+            self._no_inference_tags = tags
+            self._initialize_inference_table()
+            self._publish()
+
+    def _initialize_inference_table(self):
+        # transitions grouped by previous and next tag, in order of self.transition
+        self._transition_from = defaultdict(list)
+        self._transition_to = defaultdict(list)
+        for (prev_tag, next_tag), prob in self.transition.items():
+            self._transition_from[prev_tag].append((next_tag, prob))
+            self._transition_to[next_tag].append((prev_tag, prob))
+
+        # (previous tag, next tag) -> inferred tag of unknown word between them
+        self._inference_table = {
+            (prev_tag, next_tag):self._infer_tag(prev_tag, next_tag)
+            for prev_tag in self._tags for next_tag in self._tags
+        }
+
+    def _infer_tag(self, prev_tag, next_tag):
+        # previous -> current transition
+        tag_prob = dict(self._transition_from.get(prev_tag, ()))
+
+        # current -> next transition
+        for tag, prob in self._transition_to.get(next_tag, ()):
+            tag_prob[tag] = tag_prob.get(tag, 0) + prob
+
+        for tag in self._no_inference_tags:
+            if tag in tag_prob:
+                tag_prob.pop(tag)
+
+        if not tag_prob:
+            return 'Noun'
+        return max(tag_prob, key=tag_prob.get)
+
     def _postprocess(self, pos):
         return pos[1:-1]
 
     def log_probability(self, sequence):
+        if self._snapshot is not self:
+            return self._snapshot.log_probability(sequence)
+
         # emission probability
         log_prob = sum(
             (self.emission.get(t, {}).get(w,self.unknown_word)
@@ -159,7 +605,7 @@ class TrainedHMMTagger:
         return log_prob
 
     def _get_pos(self, word):
-        return [tag for tag, words in self.emission.items() if word in words]
+        return list(self.lexicon.get(word, ()))
 
     def _sentence_lookup(self, sentence):
         sentence = doublespace_pattern.sub(' ', sentence)
@@ -169,15 +615,29 @@ class TrainedHMMTagger:
         return sent
 
     def _word_lookup(self, eojeol, offset):
+        pos = self._eojeol_cache.get(eojeol)
+        if pos is None:
+            # a snapshot and its caches are replaced together when the model changes
+            pos = self._word_lookup_uncached(eojeol)
+            self._eojeol_cache[eojeol] = pos
+        # _generate_edge appends nodes to the lists, so always return copies
+        if offset == 0:
+            return [list(words) for words in pos]
+        return [[(word, tag0, tag1, b + offset, e + offset)
+                 for word, tag0, tag1, b, e in words] for words in pos]
+
+    def _word_lookup_uncached(self, eojeol, offset=0):
         n = len(eojeol)
         pos = [[] for _ in range(n)]
         for b in range(n):
+            matches = {e:tags for e, _, tags in
+                self.lexicon.common_prefix_search(eojeol, b, self._max_word_len)}
             for r in range(1, self._max_word_len+1):
                 e = b+r
                 if e > n:
                     continue
                 sub = eojeol[b:e]
-                for tag in self._get_pos(sub):
+                for tag in matches.get(e, ()):
                     pos[b].append((sub, tag, tag, b+offset, e+offset))
                 for i in range(1, self._max_modifier_len + 1):
                     len_r = r - i
@@ -193,18 +653,43 @@ class TrainedHMMTagger:
         return pos
 
     def _lemmatize(self, word, i):
+        key = (word, i)
+        if self.surface_table is not None:
+            lemmas = self.surface_table.get(key)
+            if lemmas is not None:
+                return lemmas
+        lemmas = self._lemmatize_cache.get(key)
+        if lemmas is None:
+            try:
+                lemmas = tuple(self._lemmatize_uncached(word, i))
+            except ValueError:
+                # l or r is not a Hangle syllable
+                lemmas = ()
+            self._lemmatize_cache[key] = lemmas
+        return lemmas
+
+    def _lemmatize_uncached(self, word, i):
         l = word[:i]
         r = word[i:]
         lemmas = []
         len_word = len(word)
-        for l_, r_ in lemma_candidate(l, r):
+        lexicon = self.lexicon
+        is_noun = 'Noun' in lexicon.get(word, ())
+        candidates = lemma_candidate(l, r)
+        if self.profiler is not None:
+            self.profiler.count('lemma_candidates', len(candidates))
+        for l_, r_ in candidates:
+            l_tags = lexicon.get(l_)
+            r_tags = lexicon.get(r_)
+            if not l_tags or not r_tags:
+                continue
             word_ = l_ + ' + ' + r_
-            if (l_ in self.emission['Verb']) and (r_ in self.emission['Eomi']):
+            if ('Verb' in l_tags) and ('Eomi' in r_tags):
                 lemmas.append((word_, 'Verb', 'Eomi'))
-            if (l_ in self.emission['Adjective']) and (r_ in self.emission['Eomi']):
+            if ('Adjective' in l_tags) and ('Eomi' in r_tags):
                 lemmas.append((word_, 'Adjective', 'Eomi'))
-            if len_word > 1 and not (word in self.emission['Noun']):
-                if (l_ in self.emission['Noun']) and (r_ in self.emission['Josa']):
+            if len_word > 1 and not is_noun:
+                if ('Noun' in l_tags) and ('Josa' in r_tags):
                     lemmas.append((word_, 'Noun', 'Josa'))
         return lemmas
 
@@ -228,6 +713,11 @@ class TrainedHMMTagger:
             first_node = (chars[:e], unk_state, unk_state, 0, e)
             sent[0].append(first_node)
 
+        tag_index = self._tag_index
+        acceptable = self._acceptable_mask
+        # tag ids of nodes which begin at each position
+        sent_tags = [[tag_index[word[1]] for word in words] for words in sent]
+
         last_end_index = 0
         edges = []
         for words in sent[:-1]:
@@ -240,8 +730,9 @@ class TrainedHMMTagger:
                     unk = (chars[end:b], unk_state, unk_state, end, b)
                     edges.append((word, unk))
                 # else
-                for adjacent in sent[end]:
-                    if (word[1], adjacent[1]) in self.acceptable_transition:
+                row = acceptable[tag_index[word[1]]]
+                for adjacent, adjacent_tag in zip(sent[end], sent_tags[end]):
+                    if row[adjacent_tag]:
                         edges.append((word, adjacent))
                 # update last end index
                 if last_end_index < end:
@@ -257,7 +748,7 @@ class TrainedHMMTagger:
         # edge from unk to next node
         unks = {to_node for _, to_node in edges if to_node[1] == unk_state}
         for unk in unks:
-            for adjacent in sent[unk[3]]:
+            for adjacent in sent[unk[4]]:
                 edges.append((unk, adjacent))
 
         # edge from bos to first node
@@ -270,33 +761,220 @@ class TrainedHMMTagger:
 
         return edges, bos, eos
 
-    def _add_weight(self, edges):
-
-        def weight(from_, to_):
-            morphs = to_[0].split(' + ')
-
-            # score of first word
-            w = self.emission.get(to_[1], {}).get(morphs[0], self.unknown_word)
-            if to_[1] == 'Noun': ## noun preference
-                w /= self._noun_preference # because score is - log prob
-                if len(morphs[0]) == 1:
-                    w *= self._a_syllable_noun_penalty
-            w += self.transition.get((from_[2], to_[1]), self.unknown_transition)
-
-            # score of second word
-            if len(morphs) == 2:
-                w += self.emission.get(to_[2], {}).get(morphs[1], self.unknown_word)
-                w += self.transition.get(to_[1], {}).get(to_[2], self.unknown_transition)
-            return w
-
-        graph = [(from_, to_, weight(from_, to_)) for from_, to_ in edges]
+    def _add_weight(self, edges, node_weights=None):
+        tag_index = self._tag_index
+        transition = self._transition_matrix
+
+        # emission scores and transition between morphemes do not depend on
+        # previous node. compute them once for each node
+        if node_weights is None:
+            node_weights = {}
+        graph = []
+        for from_, to_ in edges:
+            w = node_weights.get(to_)
+            if w is None:
+                w = self._node_weight(to_)
+                node_weights[to_] = w
+            w += transition[tag_index[from_[2]]][tag_index[to_[1]]]
+            graph.append((from_, to_, w))
         return graph
 
-    def add_user_dictionary(self, tag, words):
+    def _add_weights(self, lattices):
+        """_add_weight of list of edges, with one NumPy gather of the
+        transition scores of all their edges. Same floats with _add_weight"""
+        node_weights = {}
+        if np is None:
+            return [self._add_weight(edges, node_weights) for edges in lattices]
+        all_edges = list(chain.from_iterable(lattices))
+        n_edges = len(all_edges)
+        tag_id = self._tag_index.__getitem__
+        from_ids = np.fromiter(map(tag_id, map(_third, map(_first, all_edges))), np.intp, n_edges)
+        to_ids = np.fromiter(map(tag_id, map(_second, map(_second, all_edges))), np.intp, n_edges)
+        transitions = iter(self._transition_array[from_ids, to_ids].tolist())
+
+        graphs = []
+        for edges in lattices:
+            graph = []
+            for (from_, to_), transition in zip(edges, transitions):
+                w = node_weights.get(to_)
+                if w is None:
+                    w = self._node_weight(to_)
+                    node_weights[to_] = w
+                graph.append((from_, to_, w + transition))
+            graphs.append(graph)
+        return graphs
+
+    def _node_weight(self, node):
+        tag_index = self._tag_index
+        word, tag0, tag1 = node[:3]
+        morphs = word.split(' + ')
+
+        # score of first word
+        w = self.emission.get(tag0, {}).get(morphs[0], self.unknown_word)
+        if tag0 == 'Noun': ## noun preference
+            w /= self._noun_preference # because score is - log prob
+            if len(morphs[0]) == 1:
+                w *= self._a_syllable_noun_penalty
+
+        # score of second word
+        if len(morphs) == 2:
+            w += self.emission.get(tag1, {}).get(morphs[1], self.unknown_word)
+            w += self._transition_matrix[tag_index[tag0]][tag_index[tag1]]
+        return w
+
+    def add_user_dictionary(self, tag, words, score=None):
+        """Adds words with score. If score is None, the max score of tag is used"""
+        if isinstance(words, str):
+            words = [words]
+        self._update_user_dictionary({(tag, word):score for word in words}, ())
+
+    def remove_user_dictionary(self, tag, words):
+        """Removes user words. The scores of the model are restored if exist"""
         if isinstance(words, str):
             words = [words]
-        if not (tag in self.emission):
-            raise ValueError('{} tag does not exist in model'.format(tag))
-        append_score = self._max_score[tag]
-        for word in words:
-            self.emission[tag][word] = append_score
\ No newline at end of file
+        user_words = self.user_dictionary.get(tag, {})
+        self._update_user_dictionary({}, [(tag, word) for word in words if word in user_words])
+
+    def load_user_dictionary(self, path):
+        """Adds words of TSV or compiled user dictionary file. See user_dictionary"""
+        entries = {(tag, word):score for tag, words in read_user_dictionary(path).items()
+            for word, score in words.items()}
+        self._update_user_dictionary(entries, ())
+
+    def reload_user_dictionary(self, path):
+        """Replaces the user dictionary with the file
+
+        The file is read and compared with the current dictionary first, and
+        only the difference is applied. tag() is not blocked while reloading.
+        Returns the number of (added or changed, removed) words.
+        """
+        entries = {(tag, word):score for tag, words in read_user_dictionary(path).items()
+            for word, score in words.items()}
+        current = {(tag, word):score for tag, words in self.user_dictionary.items()
+            for word, score in words.items()}
+        removed = [key for key in current if key not in entries]
+        added = {key:score for key, score in entries.items()
+            if key not in current or current[key] != score}
+        self._update_user_dictionary(added, removed)
+        return len(added), len(removed)
+
+    def _update_user_dictionary(self, added, removed):
+        # added: {(tag, word):score or None}, removed: [(tag, word)]
+        with self._update_lock:
+            self._update_user_dictionary_locked(added, removed)
+
+    def _update_user_dictionary_locked(self, added, removed):
+        for tag, _ in added:
+            if not (tag in self.emission):
+                raise ValueError('{} tag does not exist in model'.format(tag))
+        if not (added or removed):
+            return
+
+        # copy on write. the current snapshot is not changed
+        tags = {tag for tag, _ in added} | {tag for tag, _ in removed}
+        mapped = isinstance(self.emission, MappedEmission)
+        if mapped:
+            emission = self.emission.copy(tags)
+        else:
+            emission = {tag:(dict(words) if tag in tags else words)
+                for tag, words in self.emission.items()}
+        lexicon = self.lexicon.copy()
+        user_dictionary = {tag:(dict(words) if tag in tags else words)
+            for tag, words in self.user_dictionary.items()}
+        user_base_scores = dict(self._user_base_scores)
+
+        for tag, word in removed:
+            base_score = user_base_scores.pop((tag, word))
+            if mapped:
+                # removing the overlay restores the score of model file
+                del emission[tag][word]
+                lexicon.remove(word, tag)
+            elif base_score is None:
+                del emission[tag][word]
+                lexicon.remove(word, tag)
+            else:
+                emission[tag][word] = base_score
+                lexicon.add(word, tag, base_score)
+            del user_dictionary[tag][word]
+
+        for (tag, word), score in added.items():
+            key = (tag, word)
+            if key not in user_base_scores:
+                user_base_scores[key] = emission[tag].get(word)
+            append_score = self._max_score[tag] if score is None else score
+            emission[tag][word] = append_score
+            lexicon.add(word, tag, append_score)
+            user_dictionary.setdefault(tag, {})[word] = score
+
+        changes = self._invalidated({word for _, word in added} | {word for _, word in removed})
+        self._publish(emission=emission, lexicon=lexicon, user_dictionary=user_dictionary,
+            _user_base_scores=user_base_scores, **changes)
+
+    def reload_model(self, model_path=None, transition=None, emission=None,
+        acceptable_transition=None):
+        """Replace the model with an updated one. User dictionary is kept
+
+        The new model is prepared completely before it replaces the current one.
+        """
+        with self._update_lock:
+            tagger = TrainedHMMTagger(model_path, transition, emission,
+                acceptable_transition, self._no_inference_tags,
+                self._lemmatize_cache.maxsize, self._eojeol_cache.maxsize,
+                self.beam_width, self.score_margin, self.max_nodes_per_position,
+                self.compact)
+            tagger._update_user_dictionary({(tag, word):score
+                for tag, words in self.user_dictionary.items() if tag in tagger.emission
+                for word, score in words.items()}, ())
+            state = dict(tagger.__dict__)
+            del state['_update_lock'], state['_snapshot']
+            state['model_version'] = self.model_version + 1
+            state['profiler'] = self.profiler
+            state['result_cache'] = self.result_cache
+            self._publish(**state)
+
+    def _invalidated(self, words=None):
+        """Returns new caches without the lookups which may depend on the
+        changed words, or empty ones if words is None"""
+        changes = {'model_version': self.model_version + 1}
+        affected = _affected_predicate(words) if words is not None else None
+        if affected is None:
+            lemmatize_cache = LRUCache(maxsize=self._lemmatize_cache.maxsize)
+            eojeol_cache = LRUCache(maxsize=self._eojeol_cache.maxsize, sizeof=_sizeof_lookup)
+            changes['surface_table'] = None
+        else:
+            lemmatize_cache = self._lemmatize_cache.copy()
+            eojeol_cache = self._eojeol_cache.copy()
+            lemmatize_cache.invalidate(lambda key: affected(key[0]))
+            eojeol_cache.invalidate(affected)
+            if self.surface_table is not None:
+                surface_table = self.surface_table.copy()
+                surface_table.invalidate(affected)
+                changes['surface_table'] = surface_table
+        changes['_lemmatize_cache'] = lemmatize_cache
+        changes['_eojeol_cache'] = eojeol_cache
+        return changes
+
+    def build_surface_table(self, path=None, max_stems=None, max_endings=None):
+        """Pre-analyzes conjugated forms of max_stems Verb / Adjective stems and
+        max_endings Eomi of the highest scores (all if None). Saved if path is given"""
+        with self._update_lock:
+            surface_table = build_surface_table(self, max_stems, max_endings)
+            self._publish(surface_table=surface_table)
+            fingerprint = self.model_fingerprint()
+        if path:
+            surface_table.save(path, fingerprint)
+        return surface_table
+
+    def load_surface_table(self, path):
+        """Table must be built with the same model and user dictionary,
+        otherwise ValueError is raised"""
+        with self._update_lock:
+            surface_table = SurfaceTable.load(path, self.model_fingerprint())
+            self._publish(surface_table=surface_table)
+
+    def cache_info(self):
+        return {
+            'eojeol': self._eojeol_cache.info(),
+            'lemmatize': self._lemmatize_cache.info(),
+            'lemma_candidate': lemma_cache_info()
+        }
\ No newline at end of file
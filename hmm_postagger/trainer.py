@@ -1,90 +1,348 @@
+from collections import Counter
 from collections import defaultdict
+from itertools import chain
 import json
 import math
+import multiprocessing as mp
 
+from .binary_model import save_binary_model
+from .bounded_count import count_corpus_bounded
+from .corpus_reader import CorpusReader
 from .utils import check_dirs
 from .utils import bos, eos
 from .utils import has_alphabet
+from .utils import Corpus
+
+def count_corpus(corpus, verbose=False):
+    """Returns raw counts, {tag:{word:count}} and {(tag0, tag1):count}"""
+    if isinstance(corpus, CorpusReader):
+        return count_tokens(corpus.iter_tokens(), verbose)
+
+    emission = defaultdict(lambda: defaultdict(int))
+    transition = defaultdict(int)
+
+    message_format = '\rtraining observation/transition prob from %d sents'
+
+    i = 0
+    for i, sent in enumerate(corpus):
+        # generation prob
+        for word, pos in sent:
+            emission[pos][word] += 1
+        tags = [bos] + [tag for word, tag in sent] + [eos]
+        for t0, t1 in zip(tags, tags[1:]):
+            bigram = (t0, t1)
+            transition[bigram] += 1
+        if (verbose) and (i % 10000 == 0):
+            print('%s ...'%(message_format%i), end='', flush=True)
+    if verbose:
+        print('%s was done'%(message_format%i), flush=True)
+
+    emission = {pos:dict(words) for pos, words in emission.items()}
+    return emission, dict(transition)
+
+class _TagOfToken(dict):
+    # word/tag token -> tag, or None if token is not valid
+    def __missing__(self, token):
+        wt = token.rsplit('/', 1)
+        tag = wt[1] if len(wt) == 2 and wt[0] and wt[1] else None
+        self[token] = tag
+        return tag
+
+def count_tokens(sents, verbose=False):
+    """count_corpus of lists of raw word/tag tokens
+
+    Tokens are counted as they are, and split into word and tag only once for
+    each distinct token. The counts and their key order equal to count_corpus.
+    """
+    tokens = Counter()
+    transition = Counter()
+    tag_of = _TagOfToken()
+    get_tag = tag_of.__getitem__
+    bos_, eos_ = (bos,), (eos,)
+
+    message_format = '\rtraining observation/transition prob from %d sents'
+    i = 0
+    for i, sent in enumerate(sents):
+        tokens.update(sent)
+        tags = list(filter(None, map(get_tag, sent)))
+        transition.update(zip(chain(bos_, tags), chain(tags, eos_)))
+        if (verbose) and (i % 10000 == 0):
+            print('%s ...'%(message_format%i), end='', flush=True)
+    if verbose:
+        print('%s was done'%(message_format%i), flush=True)
+
+    emission = {}
+    for token, count in tokens.items():
+        tag = tag_of[token]
+        if tag is not None:
+            emission.setdefault(tag, {})[token[:-len(tag)-1]] = count
+    return emission, dict(transition)
+
+def _count_shard(args):
+    path, begin, end = args
+    return count_corpus(Corpus(path, begin=begin, end=end))
+
+def merge_counts(counts):
+    """Sum list of (emission, transition) counts.
+
+    Keys are inserted in order of appearance, so merging shards in file order
+    gives the same dicts with counting the whole file at once.
+    """
+    if len(counts) == 1:
+        return counts[0]
+    emission = {}
+    transition = {}
+    for emission_, transition_ in counts:
+        for pos, words in emission_.items():
+            merged = emission.setdefault(pos, {})
+            for word, count in words.items():
+                merged[word] = merged.get(word, 0) + count
+        for bigram, count in transition_.items():
+            transition[bigram] = transition.get(bigram, 0) + count
+    return emission, transition
+
+def save_counts(path, emission, transition):
+    check_dirs(path)
+    transition_json = {' '.join(pos):count for pos, count in transition.items()}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'emission': emission, 'transition': transition_json},
+            f, ensure_ascii=False)
+
+def counts_path_of(model_path):
+    # models/hmm.json -> models/hmm.counts.json
+    for ext in ('.json', '.bin'):
+        if model_path.endswith(ext):
+            model_path = model_path[:-len(ext)]
+    return model_path + '.counts.json'
+
+def load_counts(path):
+    with open(path, encoding='utf-8') as f:
+        counts = json.load(f)
+    transition = {tuple(pos.split()):count for pos, count in counts['transition'].items()}
+    return counts['emission'], transition
 
 class CorpusTrainer:
+    """If max_count_entries is given, at most that many (tag, word) counts are
+    kept in memory while counting, and the rest are spilled to files in tmp_dir.
+    Then count() returns only the words of count >= min_count_word, and
+    emission_counts_ has only those words. sketch_width pre-filters rare words
+    with a count-min sketch of sketch_width x 4 uint32, reading corpus twice.
+    """
+
     def __init__(self, tagset=None, min_count_tag=5,
-        min_count_word=1, verbose=True, remove_alphabet=True):
+        min_count_word=1, verbose=True, remove_alphabet=True,
+        max_count_entries=None, sketch_width=None, tmp_dir=None):
 
         self.tagset = tagset
         self.min_count_tag = min_count_tag
         self.min_count_word = min_count_word
         self.verbose = verbose
         self.remove_alphabet = remove_alphabet
+        self.max_count_entries = max_count_entries
+        self.sketch_width = sketch_width
+        self.tmp_dir = tmp_dir
+
+    def train(self, corpus, model_path=None, n_jobs=1):
+        """If n_jobs > 1 and corpus is Corpus, the file is counted by byte-range shards"""
+        emission, transition = self.count(corpus, n_jobs)
+        self.train_from_counts([(emission, transition)], model_path)
 
-    def train(self, corpus, model_path=None):
+    def train_from_counts(self, counts, model_path=None):
+        """Train from list of (emission, transition) counts or paths of save_counts"""
+        counts = [load_counts(c) if isinstance(c, str) else c for c in counts]
+        emission, transition = merge_counts(counts)
 
-        emission, transition = self._count_pos_words(corpus)
+        # sufficient statistics for update
+        self.emission_counts_ = {pos:dict(words) for pos, words in emission.items()}
+        self.transition_counts_ = dict(transition)
+        self.emission_totals_ = {pos:self._word_totals(words)
+                                 for pos, words in emission.items()}
+
+        emission, transition = self._trim_counts(emission, transition)
 
         self.emission_, self.transition_ = self._to_log_prob(
             emission, transition)
 
         if model_path:
+            self._save(model_path)
+
+    def update(self, corpus, model_path=None, n_jobs=1):
+        """Add counts of corpus to trained model without retraining"""
+        emission, transition = self.count(corpus, n_jobs)
+        self.update_from_counts([(emission, transition)], model_path)
+
+    def update_from_counts(self, counts, model_path=None):
+        """Add list of (emission, transition) counts or paths of save_counts.
+
+        Only the changed words of a tag are trimmed and derived again. The
+        others are shifted by the change of the log total count of the tag, so
+        an update is still O(vocabulary) of the tags which appear in counts.
+        Transition is derived again entirely because it has only T x T items.
+        """
+        if not hasattr(self, 'emission_counts_'):
+            raise ValueError('Train model or load counts first')
+
+        counts = [load_counts(c) if isinstance(c, str) else c for c in counts]
+        emission, transition = merge_counts(counts)
+
+        for pos, words in emission.items():
+            self._update_words(pos, words)
+        for bigram, count in transition.items():
+            self.transition_counts_[bigram] = self.transition_counts_.get(bigram, 0) + count
+
+        transition = self._trim_transition(self.transition_counts_, self.emission_)
+        self.transition_ = self._to_log_prob_transition(transition)
+
+        if model_path:
+            self._save(model_path)
+
+    def export_quantized(self, model_path, quantize='uint8', eval_sentences=None):
+        """Saves trained model as quantized binary model ('float16' or 'uint8').
+
+        Returns report of size reduction, and tagging agreement with the
+        float64 model if eval_sentences, iterable of str, is given.
+        """
+        from .quantize import export_quantized_model
+        return export_quantized_model(model_path, self.emission_, self.transition_,
+            quantize, eval_sentences)
+
+    def load_counts(self, counts_path):
+        """Load counts saved next to the model, and derive the model"""
+        self.train_from_counts([counts_path])
+
+    def _save(self, model_path):
+        if model_path[-4:] == '.bin':
+            self._save_as_binary(model_path)
+        else:
             if model_path[-4:] != 'json':
                 model_path += '.json'
             self._save_as_json(model_path)
+        save_counts(counts_path_of(model_path),
+            self.emission_counts_, self.transition_counts_)
 
-    def _count_pos_words(self, corpus):
-
-        def trim_words(words, min_count):
-            return {word:count for word, count in words.items() if count >= min_count}
+    def count(self, corpus, n_jobs=1, counts_path=None):
+        """Returns raw counts. If counts_path is given, they are saved with save_counts"""
+        if n_jobs <= 0:
+            n_jobs = mp.cpu_count()
+        if self.max_count_entries:
+            emission, transition = self._count_bounded(corpus)
+        elif n_jobs > 1 and isinstance(corpus, CorpusReader) and corpus.stop is not None:
+            # shards of the same number of sentences
+            shards = corpus.split(n_jobs)
+            with mp.Pool(n_jobs) as pool:
+                counts = pool.map(count_corpus, shards)
+            emission, transition = merge_counts(counts)
+            if self.verbose:
+                print('counted %d shards' % len(shards), flush=True)
+        elif n_jobs == 1 or not isinstance(corpus, Corpus) or corpus.num_sent > 0:
+            emission, transition = count_corpus(corpus, self.verbose)
+        else:
+            shards = [(shard.path, shard.begin, shard.end) for shard in corpus.split(n_jobs)]
+            with mp.Pool(n_jobs) as pool:
+                counts = pool.map(_count_shard, shards)
+            emission, transition = merge_counts(counts)
+            if self.verbose:
+                print('counted %d shards' % len(shards), flush=True)
 
-        emission = defaultdict(lambda: defaultdict(int))
-        transition = defaultdict(int)
+        if counts_path:
+            save_counts(counts_path, emission, transition)
+        return emission, transition
 
-        message_format = '\rtraining observation/transition prob from %d sents'
+    def _count_bounded(self, corpus):
+        return count_corpus_bounded(corpus, self.max_count_entries, self.min_count_word,
+            self.sketch_width, tmp_dir=self.tmp_dir, verbose=self.verbose)
 
-        for i, sent in enumerate(corpus):
-            # generation prob
-            for word, pos in sent:
-                emission[pos][word] += 1
-            tags = [bos] + [tag for word, tag in sent] + [eos]
-            for t0, t1 in zip(tags, tags[1:]):
-                bigram = (t0, t1)
-                transition[bigram] += 1
-            if (self.verbose) and (i % 10000 == 0):
-                print('%s ...'%(message_format%i), end='', flush=True)
-        if self.verbose:
-            print('%s was done'%(message_format%i), flush=True)
+    def _count_pos_words(self, corpus):
+        if self.max_count_entries:
+            emission, transition = self._count_bounded(corpus)
+        else:
+            emission, transition = count_corpus(corpus, self.verbose)
+        return self._trim_counts(emission, transition)
 
-        emission = {pos:trim_words(words, self.min_count_word)
-                    for pos, words in emission.items()}
-        emission = {pos:words for pos, words in emission.items()
-                    if sum(words.values()) >= self.min_count_tag}
+    def _trim_counts(self, emission, transition):
+        trimmed = ((pos, self._trim_words(words)) for pos, words in emission.items())
+        emission = {pos:words for pos, words in trimmed if words is not None}
+        transition = self._trim_transition(transition, emission)
+        return emission, transition
 
+    def _trim_words(self, words):
+        """Returns None if the tag is infrequent"""
+        words = {word:count for word, count in words.items()
+                 if count >= self.min_count_word}
+        if sum(words.values()) < self.min_count_tag:
+            return None
         if self.remove_alphabet:
+            words = {word:count for word, count in words.items()
+                     if not has_alphabet(word)}
+        return words
 
-            def remove_alphabet_words(words):
-                words_ = {word:count for word, count in words.items()
-                          if not has_alphabet(word)}
-                return words_
+    def _is_kept(self, word):
+        return not (self.remove_alphabet and has_alphabet(word))
 
-            emission = {pos:remove_alphabet_words(words)
-                        for pos, words in emission.items()}
+    def _word_totals(self, words):
+        # total count of words of count >= min_count_word, and of those kept by _trim_words
+        frequent, kept = 0, 0
+        for word, count in words.items():
+            if count >= self.min_count_word:
+                frequent += count
+                if self._is_kept(word):
+                    kept += count
+        return frequent, kept
 
-        transition = {pos:count for pos, count in transition.items()
-                      if (pos[0] in emission) or (pos[0] == bos) }
+    def _update_words(self, pos, words):
+        counts_ = self.emission_counts_.setdefault(pos, {})
+        frequent, kept = self.emission_totals_.get(pos, (0, 0))
+        kept_before = kept
+        changed = []
+        for word, count in words.items():
+            before = counts_.get(word, 0)
+            after = before + count
+            counts_[word] = after
+            if after < self.min_count_word:
+                continue
+            if before < self.min_count_word:
+                before = 0
+            frequent += after - before
+            if self._is_kept(word):
+                kept += after - before
+                changed.append(word)
+        self.emission_totals_[pos] = (frequent, kept)
 
-        return emission, transition
+        if frequent < self.min_count_tag:
+            self.emission_.pop(pos, None)
+            return
+        log_probs = self.emission_.get(pos)
+        if not log_probs:
+            # the tag was infrequent, or had no kept word
+            self.emission_[pos] = self._to_log_prob_words(self._trim_words(counts_))
+            return
+        # log(count / kept) = log(count / kept_before) + log(kept_before) - log(kept)
+        shift = math.log(kept_before) - math.log(kept)
+        log_probs = {word:log_prob + shift for word, log_prob in log_probs.items()}
+        for word in changed:
+            log_probs[word] = math.log(counts_[word]/kept)
+        self.emission_[pos] = log_probs
+
+    def _trim_transition(self, transition, emission):
+        return {pos:count for pos, count in transition.items()
+                if (pos[0] in emission) or (pos[0] == bos) }
 
     def _to_log_prob(self, emission, transition):
+        emission_ = {pos:self._to_log_prob_words(words)
+                     for pos, words in emission.items()}
+        transition_ = self._to_log_prob_transition(transition)
+        return emission_, transition_
 
+    def _to_log_prob_words(self, words):
         # observation
-        base = {pos:sum(words.values()) for pos, words in emission.items()}
-        emission_ = {pos:{word:math.log(count/base[pos]) for word, count in words.items()}
-                    for pos, words in emission.items()}
+        base = sum(words.values())
+        return {word:math.log(count/base) for word, count in words.items()}
 
-        # transition
+    def _to_log_prob_transition(self, transition):
         base = defaultdict(int)
         for (pos0, pos1), count in transition.items():
             base[pos0] += count
-        transition_ = {pos:math.log(count/base[pos[0]]) for pos, count in transition.items()}
-
-        return emission_, transition_
+        return {pos:math.log(count/base[pos[0]]) for pos, count in transition.items()}
 
     def _save_as_json(self, model_path, emission_=None, transition_=None):
         check_dirs(model_path)
@@ -102,4 +360,11 @@ class CorpusTrainer:
                  'transition': transition_json
                 },
                 f, ensure_ascii=False, indent=2
-            )
\ No newline at end of file
+            )
+
+    def _save_as_binary(self, model_path, emission_=None, transition_=None):
+        if not emission_:
+            emission_ = self.emission_
+        if not transition_:
+            transition_ = self.transition_
+        save_binary_model(model_path, emission_, transition_)
@@ -0,0 +1,84 @@
+"""User dictionary files
+
+TSV file has a word, a tag and an optional score in each line.
+Empty lines and lines beginning with # are ignored.
+
+    아이오아이	Noun
+    주간아이돌	Noun	-3.5
+
+Compiled file is a binary model (see binary_model) which has only emission.
+It is loaded with mmap and its entries are already validated.
+Missing score means the default score of the tag, the max score of the tag
+in the model.
+"""
+import math
+
+from .binary_model import BinaryModel
+from .binary_model import is_binary_model
+from .binary_model import save_binary_model
+from .utils import check_dirs
+
+def read_user_dictionary(path):
+    """Returns {tag:{word:score}} from TSV or compiled file. score is None if not given"""
+    if is_binary_model(path):
+        return _read_compiled(path)
+    return _read_tsv(path)
+
+def _read_tsv(path):
+    dictionary = {}
+    with open(path, encoding='utf-8') as f:
+        for i, line in enumerate(f):
+            line = line.strip()
+            if not line or line[0] == '#':
+                continue
+            columns = line.split('\t')
+            if len(columns) == 2:
+                word, tag = columns
+                score = None
+            elif len(columns) == 3:
+                word, tag, score = columns
+                try:
+                    score = float(score)
+                except ValueError:
+                    raise ValueError('Invalid score in line {} of {}: {}'.format(
+                        i + 1, path, line)) from None
+            else:
+                raise ValueError('Line {} of {} is not word<TAB>tag[<TAB>score]: {}'.format(
+                    i + 1, path, line))
+            if not word.strip() or ' ' in word:
+                raise ValueError('Invalid word in line {} of {}: {}'.format(i + 1, path, line))
+            dictionary.setdefault(tag, {})[word] = score
+    return dictionary
+
+def _read_compiled(path):
+    emission = BinaryModel(path).emission()
+    dictionary = {}
+    for tag, words in emission.items():
+        # nan means the default score
+        dictionary[tag] = {word:(None if math.isnan(score) else score)
+            for word, score in zip(words, words.values())}
+    return dictionary
+
+def save_user_dictionary(path, dictionary):
+    check_dirs(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        for tag, words in sorted(dictionary.items()):
+            for word, score in sorted(words.items()):
+                if score is None:
+                    f.write('{}\t{}\n'.format(word, tag))
+                else:
+                    f.write('{}\t{}\t{}\n'.format(word, tag, score))
+
+def compile_user_dictionary(tsv_path, compiled_path):
+    dictionary = _read_tsv(tsv_path)
+    emission = {tag:{word:(math.nan if score is None else score)
+        for word, score in words.items()} for tag, words in dictionary.items()}
+    save_binary_model(compiled_path, emission, {})
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Compile TSV user dictionary')
+    parser.add_argument('tsv_path', type=str)
+    parser.add_argument('compiled_path', type=str)
+    args = parser.parse_args()
+    compile_user_dictionary(args.tsv_path, args.compiled_path)
@@ -1,24 +1,149 @@
+from collections import namedtuple
+from collections import OrderedDict
 import os
 import re
+import threading
 
 class Corpus:
-    def __init__(self, path, num_sent=-1):
+    """Sentences of word/tag tokens. begin and end are byte offsets of the file"""
+
+    def __init__(self, path, num_sent=-1, begin=0, end=-1):
         self.path = path
         self.num_sent = num_sent
+        self.begin = begin
+        self.end = end
     def __iter__(self):
-        with open(self.path, encoding='utf-8') as f:
+        with open(self.path, 'rb') as f:
+            f.seek(self.begin)
+            position = self.begin
             for i, sent in enumerate(f):
                 if self.num_sent > 0 and i >= self.num_sent:
                     break
+                if self.end >= 0 and position >= self.end:
+                    break
+                position += len(sent)
+                sent = sent.decode('utf-8')
                 wordpos = [token.rsplit('/', 1) for token in sent.split()]
                 wordpos = [wp for wp in wordpos if len(wp) == 2 and wp[0] and wp[1]]
                 yield wordpos
+    def split(self, n_shards):
+        """Split into at most n_shards Corpus whose byte ranges begin at line starts"""
+        end = os.path.getsize(self.path) if self.end < 0 else self.end
+        bounds = [self.begin]
+        with open(self.path, 'rb') as f:
+            for i in range(1, n_shards):
+                position = self.begin + (end - self.begin) * i // n_shards
+                if position <= bounds[-1]:
+                    continue
+                # move to the first line start at or after position
+                f.seek(position - 1)
+                f.readline()
+                bounds.append(min(f.tell(), end))
+        bounds.append(end)
+        return [Corpus(self.path, begin=b, end=e)
+                for b, e in zip(bounds, bounds[1:]) if b < e]
+
+class CacheInfo(namedtuple('CacheInfo', 'hits misses maxsize currsize nbytes')):
+    @property
+    def hit_rate(self):
+        n = self.hits + self.misses
+        return self.hits / n if n else 0.0
+
+_missing = object()
+
+class LRUCache:
+    """Dict-like cache which evicts the least recently used item
+
+    If sizeof is given, nbytes tracks the approximate memory of cached values.
+    Every method takes the lock of the cache, so threads can share it, and
+    copy() never sees the items being changed, also on free-threaded builds.
+    """
+
+    def __init__(self, maxsize=10000, sizeof=None):
+        self.maxsize = maxsize
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _missing)
+            if value is _missing:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._discard(key)
+            self._data[key] = value
+            if self.sizeof is not None:
+                self.nbytes += self.sizeof(value)
+            self._evict(self.maxsize)
+
+    def _evict(self, maxsize):
+        while len(self._data) > maxsize:
+            _, value = self._data.popitem(last=False)
+            if self.sizeof is not None:
+                self.nbytes -= self.sizeof(value)
+
+    def _discard(self, key):
+        value = self._data.pop(key, _missing)
+        if value is not _missing and self.sizeof is not None:
+            self.nbytes -= self.sizeof(value)
+
+    def copy(self):
+        cache = LRUCache(self.maxsize, self.sizeof)
+        with self._lock:
+            cache._data = self._data.copy()
+            cache.hits, cache.misses, cache.nbytes = self.hits, self.misses, self.nbytes
+        return cache
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict(max(0, maxsize))
+
+    def invalidate(self, predicate):
+        """Removes items whose key satisfies predicate. Returns the number of removed items"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._discard(key)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.nbytes = 0
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data), self.nbytes)
 
 def check_dirs(path):
     dirname = os.path.dirname(path)
     if dirname and dirname != '.' and not os.path.exists(dirname):
         os.makedirs(dirname)
 
+doublespace_pattern = re.compile(r'\s+', re.UNICODE)
+
 alphabet = re.compile('[a-zA-Z]+')
 
 def has_alphabet(word):
@@ -0,0 +1,116 @@
+import os
+import pickle
+import sys
+import tempfile
+sys.path.append('../')
+
+from hmm_postagger import CorpusTrainer
+from hmm_postagger import TrainedHMMTagger
+from hmm_postagger.binary_model import BinaryModel
+from hmm_postagger.binary_model import convert_json_to_binary
+from hmm_postagger.binary_model import MappedEmission
+from hmm_postagger.binary_model import save_binary_model
+from hmm_postagger.quantize import export_quantized_model
+from toy_model import toy_acceptable_transition
+from toy_model import toy_corpus
+from toy_model import toy_sents
+from toy_model import toy_tagger
+from toy_model import train_toy_model
+
+
+def test_binary_model_lookup():
+    emission, transition = train_toy_model()
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'toy.bin')
+        save_binary_model(path, emission, transition)
+        model = BinaryModel(path)
+
+        assert model.transition() == transition
+        emission_ = model.emission()
+        assert set(emission_) == set(emission)
+        for tag, words in emission.items():
+            assert dict(emission_[tag].items()) == words
+            assert min(emission_[tag].values()) == min(words.values())
+        assert '없는단어' not in emission_['Noun']
+
+        lexicon = model.lexicon()
+        assert lexicon.get('아이돌') == {'Noun': emission['Noun']['아이돌']}
+        assert [e for e, _, _ in lexicon.common_prefix_search('노래야', 0)] == [2]
+        lexicon.add('노래야', 'Noun', -1.0)
+        assert [e for e, _, _ in lexicon.common_prefix_search('노래야', 0)] == [2, 3]
+
+        model = pickle.loads(pickle.dumps(model))
+        assert model.transition() == transition
+
+
+def test_binary_model_tagger():
+    tagger = toy_tagger()
+    emission, transition = train_toy_model()
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'toy.bin')
+        save_binary_model(path, emission, transition)
+        tagger_bin = TrainedHMMTagger(path,
+            acceptable_transition=toy_acceptable_transition(emission))
+        for sent in toy_sents:
+            assert tagger_bin.tag(sent) == tagger.tag(sent)
+
+        tagger.add_user_dictionary('Noun', ['아이오아이', '주간아이돌'])
+        tagger_bin.add_user_dictionary('Noun', ['아이오아이', '주간아이돌'])
+        assert tagger_bin.emission['Noun']['아이오아이'] == tagger.emission['Noun']['아이오아이']
+        for sent in toy_sents:
+            assert tagger_bin.tag(sent) == tagger.tag(sent)
+
+
+def test_compact_tagger():
+    tagger = toy_tagger()
+    emission, transition = train_toy_model()
+    tagger_compact = TrainedHMMTagger(emission=emission, transition=transition,
+        acceptable_transition=toy_acceptable_transition(emission), compact=True)
+    assert isinstance(tagger_compact.emission, MappedEmission)
+    for sent in toy_sents:
+        assert tagger_compact.tag(sent) == tagger.tag(sent)
+
+    model = pickle.loads(pickle.dumps(tagger_compact.emission._model))
+    assert model.path is None
+    assert model.emission()['Noun'] == tagger.emission['Noun']
+
+
+def test_quantized_model():
+    emission, transition = train_toy_model()
+    acceptable_transition = toy_acceptable_transition(emission)
+    with tempfile.TemporaryDirectory() as dirname:
+        for quantize, max_error in [('float16', 0.01), ('uint8', 0.1)]:
+            path = os.path.join(dirname, 'toy.{}.bin'.format(quantize))
+            report = export_quantized_model(path, emission, transition, quantize,
+                toy_sents, acceptable_transition)
+            assert report['quantized_bytes'] < report['float64_bytes']
+            assert report['max_emission_error'] < max_error
+            assert report['max_transition_error'] < max_error
+            assert report['sentence_agreement'] == 1.0
+
+            model = BinaryModel(path)
+            assert model.quantize == quantize
+            assert set(model.transition()) == set(transition)
+            tagger = TrainedHMMTagger(path, acceptable_transition=acceptable_transition)
+            assert tagger.tag(toy_sents[0]) == toy_tagger().tag(toy_sents[0])
+
+
+def test_train_and_convert():
+    trainer = CorpusTrainer(min_count_tag=1, verbose=False)
+    with tempfile.TemporaryDirectory() as dirname:
+        json_path = os.path.join(dirname, 'toy.json')
+        bin_path = os.path.join(dirname, 'toy.bin')
+        converted_path = os.path.join(dirname, 'converted.bin')
+        trainer.train(toy_corpus, json_path)
+        trainer.train(toy_corpus, bin_path)
+        convert_json_to_binary(json_path, converted_path)
+        with open(bin_path, 'rb') as f, open(converted_path, 'rb') as g:
+            assert f.read() == g.read()
+
+
+if __name__ == '__main__':
+    test_binary_model_lookup()
+    test_binary_model_tagger()
+    test_compact_tagger()
+    test_quantized_model()
+    test_train_and_convert()
@@ -0,0 +1,84 @@
+import bz2
+import gzip
+import lzma
+import os
+import pickle
+import sys
+import tempfile
+sys.path.append('../')
+
+from hmm_postagger import Corpus
+from hmm_postagger import CorpusReader
+from hmm_postagger import CorpusTrainer
+from hmm_postagger.corpus_reader import Vocabulary
+from hmm_postagger.corpus_reader import load_index
+from hmm_postagger.trainer import count_corpus
+from toy_model import toy_corpus
+
+
+def write_corpus(path, corpus):
+    with open(path, 'w', encoding='utf-8') as f:
+        for sent in corpus:
+            f.write(' '.join('{}/{}'.format(word, tag) for word, tag in sent) + '\n')
+        # invalid tokens and an empty line
+        f.write('a/ /b c a/b/Noun\n\n')
+
+
+def as_lists(sents):
+    return [[list(wt) for wt in sent] for sent in sents]
+
+
+def test_corpus_reader():
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'corpus.txt')
+        write_corpus(path, toy_corpus)
+        expected = list(Corpus(path))
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        for suffix, opener in [('', open), ('.gz', gzip.open), ('.bz2', bz2.open), ('.xz', lzma.open)]:
+            path_ = path + suffix + '.data'
+            with opener(path_, 'wb') as f:
+                f.write(data)
+            reader = CorpusReader(path_)
+            assert load_index(path_) is not None
+            assert len(reader) == len(expected)
+            assert as_lists(reader) == expected
+            assert as_lists([reader[3], reader[-1]]) == [expected[3], expected[-1]]
+            assert as_lists(reader.sentences(2, 5)) == expected[2:5]
+            for n_shards in [1, 3, 100]:
+                shards = [pickle.loads(pickle.dumps(shard)) for shard in reader.split(n_shards)]
+                assert max(len(s) for s in shards) - min(len(s) for s in shards) <= 1
+                assert as_lists(sent for shard in shards for sent in shard) == expected
+            assert count_corpus(reader) == count_corpus(Corpus(path))
+
+        # stale index is rebuilt
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('노래/Noun\n')
+        assert len(CorpusReader(path)) == len(expected) + 1
+        # without index
+        assert as_lists(CorpusReader(path, 2, 4, index=False)) == expected[2:4]
+
+
+def test_encoded_and_sharded_training():
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'corpus.txt')
+        write_corpus(path, toy_corpus * 3)
+        reader = CorpusReader(path)
+
+        vocabulary = Vocabulary()
+        decoded = [[(vocabulary.words[w], vocabulary.tags[t]) for w, t in sent]
+                   for sent in reader.iter_encoded(vocabulary)]
+        assert decoded == list(reader)
+
+        trainer = CorpusTrainer(min_count_tag=1, verbose=False)
+        trainer.train(Corpus(path))
+        emission, transition = trainer.emission_, trainer.transition_
+        trainer.train(reader, n_jobs=2)
+        assert trainer.emission_ == emission
+        assert trainer.transition_ == transition
+
+
+if __name__ == '__main__':
+    test_corpus_reader()
+    test_encoded_and_sharded_training()
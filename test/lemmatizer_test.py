@@ -0,0 +1,98 @@
+import sys
+import threading
+sys.path.append('../')
+
+from hmm_postagger import lemmatizer
+from hmm_postagger.lemmatizer import compose
+from hmm_postagger.lemmatizer import decompose
+from hmm_postagger.lemmatizer import lemma_candidate
+from hmm_postagger.utils import LRUCache
+from toy_model import toy_tagger
+
+
+def test_compose_decompose():
+    assert decompose('깨') == ('ㄲ', 'ㅐ', ' ')
+    assert decompose('닫') == ('ㄷ', 'ㅏ', 'ㄷ')
+    assert decompose('ㄴ') == ('ㄴ', ' ', ' ')
+    assert decompose('ㅏ') == (' ', 'ㅏ', ' ')
+    assert decompose('a') == ('a', '', '')
+    for i in range(lemmatizer.kor_begin, lemmatizer.kor_end + 1):
+        assert compose(*decompose(chr(i))) == chr(i)
+    try:
+        compose('a', '', '')
+        assert False
+    except ValueError:
+        pass
+
+
+def test_lemma_candidate_cache():
+    lemmatizer.set_lemma_cache_size(10)
+    assert ('깨닫', '아') in lemma_candidate('깨달', '아')
+    assert ('주', '었어') in lemma_candidate('줬', '어')
+    before = lemmatizer.lemma_cache_info()
+    lemma_candidate('깨달', '아')
+    after = lemmatizer.lemma_cache_info()
+    assert after.hits == before.hits + 1
+    assert after.maxsize == 10
+    lemmatizer.set_lemma_cache_size(100000)
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    assert 'b' not in cache and 'a' in cache
+    assert cache.get('b') is None
+    assert cache.info() == (1, 1, 2, 2, 0)
+    assert cache.info().hit_rate == 0.5
+
+    cache = LRUCache(maxsize=2, sizeof=len)
+    cache['a'] = 'xx'
+    cache['b'] = 'yyy'
+    cache['a'] = 'z'
+    cache['c'] = 'wwww'
+    assert cache.nbytes == 5 and 'b' not in cache
+
+
+def test_lru_cache_copy_while_writing():
+    cache = LRUCache(maxsize=100, sizeof=len)
+    done = threading.Event()
+
+    def write(offset):
+        i = 0
+        while not done.is_set():
+            cache[offset + i % 1000] = 'x' * (i % 7)
+            cache.get(offset + i % 500)
+            i += 1
+
+    threads = [threading.Thread(target=write, args=(offset,)) for offset in (0, 10000)]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(200):
+            copied = cache.copy()
+            # items and nbytes of a copy are taken at once
+            assert len(copied) <= 100
+            assert copied.nbytes == sum(map(len, copied._data.values()))
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_lemmatize_cache_invalidation():
+    tagger = toy_tagger(lemmatize_cache_size=100)
+    assert tagger._lemmatize('깨달아', 2) == ()
+    tagger.add_user_dictionary('Verb', '깨닫')
+    assert ('깨닫 + 아', 'Verb', 'Eomi') in tagger._lemmatize('깨달아', 2)
+    assert tagger.cache_info()['lemmatize'].currsize == 1
+
+
+if __name__ == '__main__':
+    test_compose_decompose()
+    test_lemma_candidate_cache()
+    test_lru_cache()
+    test_lru_cache_copy_while_writing()
+    test_lemmatize_cache_invalidation()
@@ -0,0 +1,73 @@
+import sys
+sys.path.append('../')
+
+from hmm_postagger.lexicon import Lexicon
+from toy_model import toy_tagger
+
+
+def test_common_prefix_search():
+    emission = {
+        'Noun': {'노래': -1.0, '노래방': -2.0, '방': -3.0},
+        'Josa': {'야': -0.5},
+        'Verb': {'노': -4.0}
+    }
+    lexicon = Lexicon(emission)
+    assert lexicon.get('노래') == {'Noun': -1.0}
+    assert '노래방' in lexicon and '노래방에' not in lexicon
+    assert lexicon.common_prefix_search('노래방에') == [
+        (1, '노', {'Verb': -4.0}),
+        (2, '노래', {'Noun': -1.0}),
+        (3, '노래방', {'Noun': -2.0})]
+    assert lexicon.common_prefix_search('그노래야', begin=1, max_len=2) == [
+        (2, '노', {'Verb': -4.0}), (3, '노래', {'Noun': -1.0})]
+    assert lexicon.common_prefix_search('야', begin=1) == []
+
+    lexicon.add('노래', 'Verb', -5.0)
+    assert lexicon.get('노래') == {'Noun': -1.0, 'Verb': -5.0}
+
+    lexicon.remove('노래', 'Verb')
+    lexicon.remove('노래방', 'Noun')
+    assert lexicon.get('노래') == {'Noun': -1.0} and '노래방' not in lexicon
+    assert lexicon.common_prefix_search('노래방에') == [
+        (1, '노', {'Verb': -4.0}), (2, '노래', {'Noun': -1.0})]
+    assert lexicon._root == Lexicon({'Noun': {'노래': -1.0, '방': -3.0},
+        'Josa': {'야': -0.5}, 'Verb': {'노': -4.0}})._root
+
+
+def test_copy_on_write():
+    emission = {'Noun': {'노래': -1.0, '노래방': -2.0}, 'Verb': {'노': -4.0}}
+    lexicon = Lexicon(emission)
+    root = repr(lexicon._root)
+    copied = lexicon.copy()
+    copied.add('노래', 'Verb', -5.0)
+    copied.add('노래방송', 'Noun', -6.0)
+    copied.remove('노래방', 'Noun')
+    copied.remove('노', 'Verb')
+    # the original is not changed
+    assert repr(lexicon._root) == root and lexicon.get('노래') == {'Noun': -1.0}
+    assert copied.common_prefix_search('노래방송') == [
+        (2, '노래', {'Noun': -1.0, 'Verb': -5.0}), (4, '노래방송', {'Noun': -6.0})]
+    assert copied._root == Lexicon({'Noun': {'노래': -1.0, '노래방송': -6.0},
+        'Verb': {'노래': -5.0}})._root
+
+    # changes of the original do not change the copy either
+    copied = lexicon.copy()
+    lexicon.add('노래', 'Josa', -7.0)
+    assert copied.get('노래') == {'Noun': -1.0}
+    assert copied.common_prefix_search('노래') == [
+        (1, '노', {'Verb': -4.0}), (2, '노래', {'Noun': -1.0})]
+
+
+def test_get_pos_matches_emission():
+    tagger = toy_tagger()
+    for tag, words in tagger.emission.items():
+        for word in words:
+            assert tag in tagger._get_pos(word)
+    tagger.add_user_dictionary('Noun', '아이오아이')
+    assert tagger._get_pos('아이오아이') == ['Noun']
+
+
+if __name__ == '__main__':
+    test_common_prefix_search()
+    test_copy_on_write()
+    test_get_pos_matches_emission()
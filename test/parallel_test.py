@@ -0,0 +1,53 @@
+import sys
+sys.path.append('../')
+
+import pytest
+
+from toy_model import toy_sents
+from toy_model import toy_tagger
+
+
+def test_tag_batch():
+    tagger = toy_tagger()
+    sents = toy_sents * 5
+    expected = [tagger.tag(sent) for sent in sents]
+    assert tagger.tag_batch(sents) == expected
+    assert tagger.tag_batch(sents, n_jobs=2, chunksize=3) == expected
+    assert list(tagger.tag_iter(iter(sents), n_jobs=2, chunksize=4)) == expected
+
+
+def test_tag_iter_of_two_taggers():
+    from hmm_postagger import parallel
+    tagger = toy_tagger()
+    with_word = toy_tagger()
+    with_word.add_user_dictionary('Noun', ['아이오아이', '출연했'])
+    expected = [tagger.tag(sent) for sent in toy_sents]
+    expected_with_word = [with_word.tag(sent) for sent in toy_sents]
+    assert expected != expected_with_word
+
+    # workers get the tagger from their pool, not from this process
+    iters = [parallel.tag_iter(tagger, toy_sents, n_jobs=2, chunksize=1, max_pending=1),
+        parallel.tag_iter(with_word, toy_sents, n_jobs=2, chunksize=1, max_pending=1)]
+    results = [[], []]
+    for _ in toy_sents:
+        for it, result in zip(iters, results):
+            result.append(next(it))
+            assert parallel._tagger is None
+    assert results == [expected, expected_with_word]
+
+
+def test_tag_batch_vectorized():
+    pytest.importorskip('numpy')
+    tagger = toy_tagger()
+    sents = toy_sents * 5
+    expected = [tagger.tag(sent) for sent in sents]
+    assert tagger.tag_batch(sents, vectorized=True) == expected
+    assert tagger.tag_batch(sents, n_jobs=2, chunksize=7, vectorized=True) == expected
+    assert tagger.tag_batch(sents, inference_unknown=False, vectorized=True) == [
+        tagger.tag(sent, inference_unknown=False) for sent in sents]
+
+
+if __name__ == '__main__':
+    test_tag_batch()
+    test_tag_iter_of_two_taggers()
+    test_tag_batch_vectorized()
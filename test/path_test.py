@@ -0,0 +1,82 @@
+import random
+import sys
+sys.path.append('../')
+
+import pytest
+
+from hmm_postagger import ford_list
+from hmm_postagger import viterbi
+from toy_model import toy_sents
+from toy_model import toy_tagger
+
+
+def _ford_list(edges, bos, eos):
+    nodes = {node for edge in edges for node in edge[:2]}
+    result = ford_list(edges, nodes, bos, eos)
+    if isinstance(result, dict):
+        return result['paths'][0], result['cost']
+    return result
+
+
+def test_viterbi_equals_ford_list():
+    tagger = toy_tagger()
+    for sent in toy_sents:
+        chars = sent.replace(' ', '')
+        edges, bos, eos = tagger._generate_edge(chars, tagger._sentence_lookup(sent))
+        edges = tagger._add_weight(edges)
+        path, cost = viterbi(edges, bos, eos)
+        path_, cost_ = _ford_list(edges, bos, eos)
+        assert path == path_
+        assert abs(cost - cost_) < 1e-9
+        assert path[0] == bos and path[-1] == eos
+
+
+def test_viterbi_single_hop():
+    bos = ('BOS', 'BOS', 'BOS', 0, 0)
+    eos = ('EOS', 'EOS', 'EOS', 0, 1)
+    path, cost = viterbi([(bos, eos, -1.0)], bos, eos)
+    assert path == [bos, eos]
+    assert cost == -1.0
+
+
+def test_tag():
+    tagger = toy_tagger()
+    assert tagger.tag('이번 경기에서는 누가 이겼을까') == [
+        ('이번', 'Noun'), ('경기', 'Noun'), ('에서는', 'Josa'),
+        ('누가', 'Noun'), ('이기', 'Verb'), ('었을까', 'Eomi')]
+
+
+def test_viterbi_batch():
+    pytest.importorskip('numpy')
+    from hmm_postagger.batch_decode import viterbi_batch
+    tagger = toy_tagger()
+    lattices = []
+    for sent in toy_sents + ['아이고', '학교에 뷁뷁 갔다']:
+        chars = sent.replace(' ', '')
+        edges, bos, eos = tagger._generate_edge(chars, tagger._sentence_lookup(sent))
+        lattices.append((tagger._add_weight(edges), bos, eos))
+    # integer weights make many ties, which are won by the first edge
+    rng = random.Random(0)
+    lattices += [([(u, v, float(rng.randint(-2, 0))) for u, v, _ in edges], bos, eos)
+        for edges, bos, eos in lattices for _ in range(5)]
+    expected = [viterbi(*lattice) for lattice in lattices]
+    assert viterbi_batch(lattices) == expected
+    assert viterbi_batch(lattices, batch_size=3) == expected
+    # split batches, and lattices decoded by viterbi
+    assert viterbi_batch(lattices, max_cells=2000) == expected
+    assert viterbi_batch(lattices, max_cells=1) == expected
+
+    bos = ('BOS', 'BOS', 'BOS', 0, 0)
+    eos = ('EOS', 'EOS', 'EOS', 1, 2)
+    word = ('a', 'Noun', 'Noun', 0, 1)
+    assert viterbi_batch([([(bos, word, -1.0), (word, eos, -1.0)], bos, eos)]) == [
+        ([bos, word, eos], -2.0)]
+    with pytest.raises(ValueError):
+        viterbi_batch([([(bos, word, -1.0)], bos, eos)])
+
+
+if __name__ == '__main__':
+    test_viterbi_equals_ford_list()
+    test_viterbi_single_hop()
+    test_tag()
+    test_viterbi_batch()
@@ -0,0 +1,78 @@
+import json
+import os
+import sys
+import tempfile
+sys.path.append('../')
+
+import pytest
+
+from hmm_postagger import Corpus
+from hmm_postagger.pipeline import tag_file
+from toy_model import toy_sents
+from toy_model import toy_tagger
+
+
+def test_tag_file():
+    tagger = toy_tagger()
+    sents = toy_sents * 3
+    with tempfile.TemporaryDirectory() as dirname:
+        input_path = os.path.join(dirname, 'input.txt')
+        output_path = os.path.join(dirname, 'output.txt')
+        with open(input_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(sents) + '\n')
+
+        summary = tag_file(tagger, input_path, output_path, n_jobs=2, chunksize=4, verbose=False)
+        assert summary['n_sents'] == len(sents)
+        expected = [[list(wt) for wt in tagger.tag(sent)] for sent in sents]
+        assert list(Corpus(output_path)) == expected
+
+        jsonl_path = os.path.join(dirname, 'output.jsonl')
+        tag_file(tagger, input_path, jsonl_path, output_format='jsonl', verbose=False)
+        with open(jsonl_path, encoding='utf-8') as f:
+            objs = [json.loads(line) for line in f]
+        assert [obj['sentence'] for obj in objs] == sents
+        assert [obj['pos'] for obj in objs] == expected
+
+
+def test_tag_file_resume():
+    tagger = toy_tagger()
+    sents = toy_sents * 2
+    with tempfile.TemporaryDirectory() as dirname:
+        input_path = os.path.join(dirname, 'input.txt')
+        output_path = os.path.join(dirname, 'output.txt')
+        checkpoint_path = os.path.join(dirname, 'checkpoint.json')
+        with open(input_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(sents) + '\n')
+        tag_file(tagger, input_path, output_path, verbose=False)
+        with open(output_path, 'rb') as f:
+            expected = f.read()
+
+        # interrupted after 3 sentences, with a partially written line
+        input_offset = len(('\n'.join(sents[:3]) + '\n').encode('utf-8'))
+        output_offset = len(b''.join(expected.splitlines(True)[:3]))
+        with open(output_path, 'wb') as f:
+            f.write(expected[:output_offset + 5])
+        with open(checkpoint_path, 'w') as f:
+            json.dump({'input_offset': input_offset,
+                'output_offset': output_offset, 'n_sents': 3}, f)
+
+        summary = tag_file(tagger, input_path, output_path,
+            checkpoint_path=checkpoint_path, checkpoint_every=4, verbose=False)
+        assert summary['n_tagged'] == len(sents) - 3
+        with open(output_path, 'rb') as f:
+            assert f.read() == expected
+
+        # finished job does nothing
+        summary = tag_file(tagger, input_path, output_path,
+            checkpoint_path=checkpoint_path, verbose=False)
+        assert summary['n_tagged'] == 0
+
+        # stdin / stdout can not be seeked, so checkpoint is rejected before tagging
+        for paths in [('-', output_path), (input_path, '-')]:
+            with pytest.raises(ValueError):
+                tag_file(tagger, *paths, checkpoint_path=checkpoint_path, verbose=False)
+
+
+if __name__ == '__main__':
+    test_tag_file()
+    test_tag_file_resume()
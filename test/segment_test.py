@@ -0,0 +1,26 @@
+import io
+import sys
+sys.path.append('../')
+
+from hmm_postagger.segment import iter_segments
+
+
+def test_iter_segments():
+    text = '안녕. 하세요 반갑습니다!\n\n 네 그래요  abc'
+    expected = [('안녕.', False), ('하세요', False), ('반갑습니다!', False),
+        ('네 그래요', False), ('abc', False)]
+    assert list(iter_segments(text, 8)) == expected
+    assert list(iter_segments(io.StringIO(text), 8)) == expected
+    assert list(iter_segments(iter(text), 8)) == expected
+
+
+def test_iter_segments_without_space():
+    text = '가' * 25 + ' 나다'
+    segments = list(iter_segments(text, 10))
+    assert segments == [('가' * 10, True), ('가' * 10, True), ('가' * 5 + ' 나다', False)]
+    assert all(len(segment) <= 10 for segment, _ in iter_segments('가나 다라마 ' * 100, 10))
+
+
+if __name__ == '__main__':
+    test_iter_segments()
+    test_iter_segments_without_space()
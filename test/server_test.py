@@ -0,0 +1,127 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+sys.path.append('../')
+
+import pytest
+
+from hmm_postagger.client import TaggerClient
+from hmm_postagger.client import TaggerServerError
+from hmm_postagger.server import TaggerServer
+from toy_model import toy_sents
+from toy_model import toy_tagger
+
+
+class ServerThread:
+    def __init__(self, server, **kwargs):
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(server.start(**kwargs), self.loop).result()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def test_server():
+    tagger = toy_tagger()
+    expected = [tagger.tag(sent) for sent in toy_sents]
+    server = ServerThread(TaggerServer(tagger, max_batch_size=4, max_delay_ms=20), port=0)
+    url = 'http://127.0.0.1:{}'.format(server.server.address[1])
+    try:
+        results = [None] * len(toy_sents)
+
+        def request(i):
+            with TaggerClient(url) as client:
+                results[i] = client.tag(toy_sents[i])
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(len(toy_sents))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == expected
+
+        with TaggerClient(url) as client:
+            assert client.tag_batch(toy_sents) == expected
+            metrics = client.metrics()
+            assert metrics['sentences'] == 2 * len(toy_sents)
+            # concurrent requests are coalesced
+            assert metrics['batches'] < 2 * len(toy_sents)
+            assert metrics['batch_size.le_inf'] == metrics['batches']
+    finally:
+        server.close()
+
+
+def test_server_processes():
+    tagger = toy_tagger()
+    expected = [tagger.tag(sent) for sent in toy_sents]
+    with_word = toy_tagger()
+    with_word.add_user_dictionary('Noun', ['아이오아이', '출연했'])
+    expected_with_word = [with_word.tag(sent) for sent in toy_sents]
+    server = ServerThread(TaggerServer(tagger, max_batch_size=4, n_jobs=2), port=0)
+    url = 'http://127.0.0.1:{}'.format(server.server.address[1])
+    try:
+        with TaggerClient(url) as client:
+            assert client.tag(toy_sents[0]) == expected[0]
+            assert client.tag_batch(toy_sents) == expected
+            assert client.metrics()['errors'] == 0
+            version = client.health()['model_version']
+
+            # workers are restarted with the changed model before the next batch
+            tagger.add_user_dictionary('Noun', ['아이오아이', '출연했'])
+            assert client.health()['model_version'] == version
+            assert client.tag_batch(toy_sents) == expected_with_word
+            assert client.health()['model_version'] == tagger.model_version > version
+    finally:
+        server.close()
+
+
+def test_server_processes_result_cache():
+    tagger = toy_tagger()
+    expected = [tagger.tag(sent) for sent in toy_sents]
+    with tempfile.TemporaryDirectory() as dirname:
+        cache = tagger.enable_result_cache(os.path.join(dirname, 'results.sqlite'))
+        server = ServerThread(TaggerServer(tagger, max_batch_size=4, n_jobs=2), port=0)
+        url = 'http://127.0.0.1:{}'.format(server.server.address[1])
+        try:
+            with TaggerClient(url) as client:
+                assert client.tag_batch(toy_sents) == expected
+                # the misses are tagged by workers, and stored by the server
+                assert len(cache) == len(set(toy_sents))
+                hits, misses = cache.hits, cache.misses
+                assert client.tag_batch(toy_sents) == expected
+                assert cache.hits == hits + len(toy_sents)
+                assert cache.misses == misses
+                assert client.metrics()['errors'] == 0
+        finally:
+            server.close()
+            tagger.disable_result_cache().close()
+
+
+def test_server_backpressure_and_unix_socket():
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'tagger.sock')
+        server = ServerThread(TaggerServer(toy_tagger(), max_queue=2), unix_socket=path)
+        try:
+            with TaggerClient(unix_socket=path) as client:
+                assert client.health()['status'] == 'ok'
+                assert client.tag(toy_sents[0])
+                with pytest.raises(TaggerServerError) as e:
+                    client.tag_batch(toy_sents[:3])
+                assert e.value.status == 503
+                assert client.metrics()['rejected'] == 1
+        finally:
+            server.close()
+
+
+if __name__ == '__main__':
+    test_server()
+    test_server_processes()
+    test_server_processes_result_cache()
+    test_server_backpressure_and_unix_socket()
@@ -2,28 +2,38 @@ import sys
 sys.path.append('../')
 
 from pprint import pprint
-from hmm_postagger.shortestpath import sent_to_graph
+from hmm_postagger import viterbi
+from hmm_postagger.utils import bos, eos
+from toy_model import toy_tagger
 
 def test_sent_to_graph():
     sent_len = 4
     words = [
-        ('뭐', 'Noun', 0, 1),
-        ('타', 'Verb', 1, 2),
-        ('고', 'Eomi', 2, 3),
-        ('고', 'Noun', 2, 3),
-        ('가', 'Verb', 3, 4),
-        ('가', 'Noun', 3, 4),
-        ('ㅏ', 'Eomi', 4, 4),
-        ('EOS', 'EOS', 4, 5)
+        ('뭐', 'Noun', 'Noun', 0, 1),
+        ('타', 'Verb', 'Verb', 1, 2),
+        ('고', 'Eomi', 'Eomi', 2, 3),
+        ('고', 'Noun', 'Noun', 2, 3),
+        ('가', 'Verb', 'Verb', 3, 4),
+        ('가', 'Noun', 'Noun', 3, 4),
     ]
 
-    sent = [[] for _ in range(sent_len+1)]
+    sent = [[] for _ in range(sent_len)]
     for word in words:
-        sent[word[2]].append(word)
+        sent[word[3]].append(word)
 
-    edges, idx2node = sent_to_graph(sent, sent_len)
-    pprint(edges)
-    pprint(idx2node)
+    tagger = toy_tagger()
+    edges, bos_node, eos_node = tagger._generate_edge('뭐타고가', sent)
+    assert bos_node == (bos, bos, bos, 0, 0)
+    assert eos_node == (eos, eos, eos, 4, 5)
+    # adjacent nodes are connected
+    for from_, to_ in edges:
+        assert from_[4] == to_[3]
+    assert len(edges) == 1 + 1 + 2 + 2 * 2 + 2
+
+    edges = tagger._add_weight(edges)
+    path, cost = viterbi(edges, bos_node, eos_node)
+    assert [node[0] for node in path[1:-1]] == ['뭐', '타', '고', '가']
+    pprint(path)
 
 if __name__ == '__main__':
-    test_sent_to_graph()
\ No newline at end of file
+    test_sent_to_graph()
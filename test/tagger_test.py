@@ -0,0 +1,341 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import tempfile
+import threading
+sys.path.append('../')
+
+import pytest
+
+from hmm_postagger.lemmatizer import set_lemma_cache_size
+from hmm_postagger.user_dictionary import compile_user_dictionary
+from hmm_postagger.user_dictionary import read_user_dictionary
+from hmm_postagger.utils import unk
+from toy_model import toy_sents
+from toy_model import toy_tagger
+
+
+def test_node_weight_uses_intra_transition():
+    tagger = toy_tagger()
+    node = ('가 + 았다', 'Verb', 'Eomi', 0, 2)
+    expected = (tagger.emission['Verb']['가']
+        + tagger.emission['Eomi']['았다']
+        + tagger.transition[('Verb', 'Eomi')])
+    assert abs(tagger._node_weight(node) - expected) < 1e-12
+
+
+def test_add_weights():
+    pytest.importorskip('numpy')
+    tagger = toy_tagger()
+    lattices = []
+    for sent in toy_sents + ['학교에 뷁뷁 갔다']:
+        chars = sent.replace(' ', '')
+        edges, _, _ = tagger._generate_edge(chars, tagger._sentence_lookup(sent))
+        lattices.append(edges)
+    # one gather over all edges gives the same floats with the list path
+    assert tagger._add_weights(lattices) == [tagger._add_weight(edges) for edges in lattices]
+
+
+def test_unknown_in_middle():
+    tagger = toy_tagger()
+    pos = tagger.tag('학교에 뷁뷁 갔다', inference_unknown=False)
+    assert ('뷁뷁', unk) in pos
+    assert pos[-2:] == [('가', 'Verb'), ('ㅆ다', 'Eomi')]
+
+    # unknown span has out-edges to the nodes which begin at its end
+    sent = '학교에 뷁뷁 갔다'
+    edges, _, _ = tagger._generate_edge(sent.replace(' ', ''), tagger._sentence_lookup(sent))
+    unks = {to_ for _, to_ in edges if to_[1] == unk}
+    assert unks
+    for node in unks:
+        out_edges = [to_ for from_, to_ in edges if from_ == node]
+        assert out_edges and all(to_[3] == node[4] for to_ in out_edges)
+
+
+def test_eojeol_cache():
+    tagger = toy_tagger()
+    uncached = toy_tagger(eojeol_cache_size=0)
+    sent = '노래를 들어요 노래를 들어요'
+    assert tagger.tag(sent) == uncached.tag(sent)
+    assert tagger._sentence_lookup(sent) == uncached._sentence_lookup(sent)
+    info = tagger.cache_info()['eojeol']
+    assert info.currsize == 2 and info.hits >= 2 and info.nbytes > 0
+
+    version = tagger.model_version
+    tagger.add_user_dictionary('Noun', '노래를')
+    assert tagger.model_version == version + 1
+    # only the eojeol which contains the word is invalidated
+    assert '노래를' not in tagger._eojeol_cache and '들어요' in tagger._eojeol_cache
+    assert ('노래를', 'Noun', 'Noun', 0, 3) in tagger._word_lookup('노래를', 0)[0]
+
+
+def _infer_tag_by_scan(tagger, prev_tag, next_tag):
+    tag_prob = {tag:prob for (prev_, tag), prob in tagger.transition.items()
+                if prev_ == prev_tag}
+    for (tag, next_), prob in tagger.transition.items():
+        if next_ == next_tag:
+            tag_prob[tag] = tag_prob.get(tag, 0) + prob
+    for tag in tagger.no_inference_tags:
+        tag_prob.pop(tag, None)
+    if not tag_prob:
+        return 'Noun'
+    return sorted(tag_prob, key=lambda x:-tag_prob[x])[0]
+
+
+def test_inference_table():
+    tagger = toy_tagger()
+    for no_inference_tags in [None, ['BOS', 'EOS'], ['BOS', 'EOS', 'Noun']]:
+        if no_inference_tags is not None:
+            tagger.no_inference_tags = no_inference_tags
+        for prev_tag in tagger._tags:
+            for next_tag in tagger._tags:
+                assert (tagger._inference_table[(prev_tag, next_tag)]
+                        == _infer_tag_by_scan(tagger, prev_tag, next_tag))
+    assert tagger.tag('갹갹은 어디있어')[0] == ('갹갹', 'Adjective')
+
+
+def test_profiling():
+    tagger = toy_tagger()
+    sent = '학교에 뷁뷁 갔다'
+    expected = toy_tagger().tag(sent)
+
+    calls = []
+    profiler = tagger.enable_profiling(sink=lambda sentence, stats: calls.append(sentence))
+    assert tagger.tag(sent) == expected
+    stats = profiler.last
+    assert set(stats['ms']) == {'lookup', 'edge', 'weight', 'decode',
+        'inference', 'postprocess', 'total'}
+    counts = stats['counts']
+    assert counts['chars'] == 7 and counts['unknown_spans'] == 1
+    assert counts['nodes'] > 0 and counts['lemma_candidates'] > 0
+    assert 0 < counts['decoder_iterations'] <= counts['edges']
+    assert calls == [sent]
+
+    tagger.tag(sent)
+    metrics = profiler.export()
+    assert metrics['tag.calls'] == 2
+    assert metrics['tag.total.ms.count'] == 2
+    assert metrics['tag.edges.le_inf'] == 2
+    assert tagger.disable_profiling() is profiler
+    tagger.tag(sent)
+    assert profiler.n_calls == 2
+
+
+def test_pruning():
+    tagger = toy_tagger()
+    for sent in ['이번 경기에서는 누가 이겼을까', '학교에 뷁뷁 갔다', '노래를 들어요']:
+        expected = tagger.tag(sent)
+        # wide enough beam does not change the result
+        assert tagger.tag(sent, beam_width=1000, score_margin=1000,
+            max_nodes_per_position=1000) == expected
+        # the narrowest beam still finds a path
+        assert tagger.tag(sent, beam_width=1, max_nodes_per_position=1)
+
+    pruned = toy_tagger(beam_width=1)
+    profiler = pruned.enable_profiling()
+    pruned.tag('이번 경기에서는 누가 이겼을까')
+    pruned_iterations = profiler.last['counts']['decoder_iterations']
+    pruned.tag('이번 경기에서는 누가 이겼을까', beam_width=0)
+    assert pruned_iterations < profiler.last['counts']['decoder_iterations']
+
+
+def test_tag_long():
+    tagger = toy_tagger()
+    sents = ['이번 경기에서는 누가 이겼을까', '그 사람은 학교에 갔다']
+    assert list(tagger.tag_long('\n'.join(sents))) == [tagger.tag(sent) for sent in sents]
+
+    text = '학교에갔다' * 20
+    pos = [p for segment in tagger.tag_long(text, max_len=40, overlap=10) for p in segment]
+    assert pos == tagger.tag(text)
+
+
+def test_user_dictionary_file():
+    tagger = toy_tagger()
+    reference = toy_tagger()
+    sents = ['주간아이돌에 아이오아이가 출연했다', '노래를 들어요']
+    for sent in sents:
+        tagger.tag(sent)
+    base_score = tagger.emission['Noun'].get('아이돌')
+
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'user.tsv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('# comment\n아이오아이\tNoun\n주간아이돌\tNoun\t-1.5\n아이돌\tNoun\t-0.5\n')
+        tagger.load_user_dictionary(path)
+        assert tagger.user_dictionary == {'Noun': {'아이오아이': None, '주간아이돌': -1.5, '아이돌': -0.5}}
+        assert tagger.emission['Noun']['주간아이돌'] == -1.5
+        assert ('주간아이돌', 'Noun') in tagger.tag(sents[0])
+        # unrelated eojeol is still cached
+        assert '들어요' in tagger._eojeol_cache
+
+        # reload applies only the difference
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('아이오아이\tNoun\n주간아이돌\tNoun\t-2.0\n')
+        assert tagger.reload_user_dictionary(path) == (1, 1)
+        assert tagger.emission['Noun']['주간아이돌'] == -2.0
+        assert tagger.emission['Noun'].get('아이돌') == base_score
+
+        # compiled file has the same entries
+        compiled_path = os.path.join(dirname, 'user.bin')
+        compile_user_dictionary(path, compiled_path)
+        assert read_user_dictionary(compiled_path) == read_user_dictionary(path)
+        assert tagger.reload_user_dictionary(compiled_path) == (0, 0)
+
+    tagger.remove_user_dictionary('Noun', ['아이오아이', '주간아이돌'])
+    assert tagger.user_dictionary == {'Noun': {}}
+    assert tagger.emission == reference.emission
+    assert tagger.lexicon._words == reference.lexicon._words
+    for sent in sents:
+        assert tagger.tag(sent) == reference.tag(sent)
+
+
+def test_surface_table():
+    tagger = toy_tagger()
+    reference = toy_tagger()
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'surface.bin')
+        table = tagger.build_surface_table(path)
+        tagger.load_surface_table(path)
+        # a table of another model is rejected
+        other = toy_tagger()
+        other.add_user_dictionary('Noun', '파랬')
+        with pytest.raises(ValueError):
+            other.load_surface_table(path)
+        assert other.surface_table is None
+    assert tagger.surface_table._lemmas == table._lemmas
+    # irregular conjugations are looked up
+    assert tagger.surface_table.get(('파랬다', 2)) == (('파랗 + 았다', 'Adjective', 'Eomi'),)
+    assert tagger.surface_table.get(('들어요', 1)) == (('듣 + 어요', 'Verb', 'Eomi'),)
+    for key in table._lemmas:
+        assert table.get(key) == reference._lemmatize(*key)
+    for sent in toy_sents:
+        assert tagger.tag(sent) == reference.tag(sent)
+
+    # entries of changed words are removed
+    tagger.add_user_dictionary('Noun', '파랬')
+    assert ('파랬다', 2) not in tagger.surface_table
+    assert ('들어요', 1) in tagger.surface_table
+
+
+def test_concurrent_tag_and_update():
+    # small caches evict items while other threads read them
+    tagger = toy_tagger(eojeol_cache_size=5, lemmatize_cache_size=20)
+    without = [tagger.tag(sent) for sent in toy_sents]
+    with_word = toy_tagger()
+    with_word.add_user_dictionary('Noun', ['아이오아이', '출연했'])
+    expected = [{tuple(a), tuple(b)} for a, b in zip(without, map(with_word.tag, toy_sents))]
+    # the user words change some of the sentences
+    assert any(len(pos) == 2 for pos in expected)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    set_lemma_cache_size(10)
+    stop = threading.Event()
+    def update():
+        n_updates = 0
+        while not stop.is_set():
+            tagger.add_user_dictionary('Noun', ['아이오아이', '출연했'])
+            tagger.remove_user_dictionary('Noun', ['아이오아이', '출연했'])
+            if n_updates % 10 == 0:
+                tagger.reload_model(transition=dict(tagger.transition),
+                    emission={tag:dict(words) for tag, words in toy_tagger().emission.items()},
+                    acceptable_transition=tagger.acceptable_transition)
+            n_updates += 1
+        return n_updates
+
+    def read(i):
+        return [tuple(tagger.tag(sent)) in expected[j] for j, sent in enumerate(toy_sents)]
+
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            updater = executor.submit(update)
+            try:
+                results = list(executor.map(read, range(300)))
+            finally:
+                stop.set()
+            assert updater.result() > 0
+    finally:
+        sys.setswitchinterval(interval)
+        set_lemma_cache_size(100000)
+    assert all(all(result) for result in results)
+    assert not any(tagger.user_dictionary.values())
+    assert [tagger.tag(sent) for sent in toy_sents] == without
+
+
+def test_result_cache():
+    tagger = toy_tagger()
+    sents = toy_sents + ['노래를 들어요', '노래를   들어요']
+    expected = [tagger.tag(sent) for sent in sents]
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'results.sqlite')
+        cache = tagger.enable_result_cache(path)
+        assert [tagger.tag(sent) for sent in sents] == expected
+        assert tagger.tag_batch(sents, chunksize=3) == expected
+        assert tagger.tag_batch(sents, n_jobs=2, chunksize=2) == expected
+        info = cache.info()
+        # '노래를   들어요' is normalized to '노래를 들어요'
+        assert info.currsize == info.misses == len(toy_sents) + 1
+        assert info.hits == 3 * len(sents) - info.misses and info.nbytes > 0
+        tagger.tag('노래를 들어요', inference_unknown=False)
+        assert len(cache) == len(toy_sents) + 2
+
+        # a changed model does not read the results of the old one
+        fingerprint = tagger.model_fingerprint()
+        words = ['아이오아이', '출연했']
+        uncached = toy_tagger()
+        uncached.add_user_dictionary('Noun', words)
+        expected_ = [uncached.tag(sent) for sent in toy_sents]
+        assert expected_ != expected[:len(toy_sents)]
+        digest = tagger._model_digest
+        tagger.add_user_dictionary('Noun', words)
+        assert tagger.model_fingerprint() != fingerprint
+        # the model is not hashed again, and the fingerprint is the same as
+        # that of a model which is hashed after the words are added
+        assert tagger._model_digest is digest
+        assert tagger.model_fingerprint() == uncached.model_fingerprint()
+        assert tagger.tag_batch(toy_sents) == expected_
+        tagger.remove_user_dictionary('Noun', words)
+        assert tagger.model_fingerprint() == fingerprint
+        assert tagger.model_fingerprint((3, None, None)) != fingerprint
+        cache.close()
+
+        # persistent, and evicts the least recently used results
+        other = toy_tagger()
+        cache = other.enable_result_cache(path, max_entries=5)
+        assert len(cache) == 2 * len(toy_sents) + 2
+        assert other.tag(sents[-1]) == expected[-1]
+        assert cache.info().hits == 1
+        other.tag('학교에 갔다')
+        assert len(cache) <= 5
+        assert cache.get(other.model_fingerprint(), True, '학교에 갔다') is not None
+        other.disable_result_cache().close()
+
+
+def test_result_cache_rollback():
+    from hmm_postagger.result_cache import ResultCache
+    with tempfile.TemporaryDirectory() as dirname:
+        with ResultCache(os.path.join(dirname, 'results.sqlite')) as cache:
+            # object() can not be stored, so the transaction is rolled back
+            with pytest.raises(TypeError):
+                cache.put('model a', True, 'a', object())
+            assert len(cache) == 0
+            cache.put('model b', True, 'a', [('a', 'Noun')])
+            cache.put('model a', True, 'a', [('a', 'Josa')])
+            assert cache.get('model a', True, 'a') == [('a', 'Josa')]
+            assert cache.get('model b', True, 'a') == [('a', 'Noun')]
+
+
+if __name__ == '__main__':
+    test_node_weight_uses_intra_transition()
+    test_add_weights()
+    test_unknown_in_middle()
+    test_eojeol_cache()
+    test_inference_table()
+    test_profiling()
+    test_pruning()
+    test_tag_long()
+    test_user_dictionary_file()
+    test_surface_table()
+    test_concurrent_tag_and_update()
+    test_result_cache()
+    test_result_cache_rollback()
@@ -0,0 +1,61 @@
+import sys
+sys.path.append('../')
+
+from hmm_postagger import CorpusTrainer
+from hmm_postagger import TrainedHMMTagger
+from hmm_postagger.utils import bos, eos, unk
+
+toy_corpus = [
+    [['뭐', 'Noun'], ['타', 'Verb'], ['고', 'Eomi'], ['가', 'Verb'], ['ㅏ', 'Eomi']],
+    [['지하철', 'Noun']],
+    [['기차', 'Noun']],
+    [['아침', 'Noun'], ['에', 'Josa'], ['몇', 'Determiner'], ['시', 'Noun'], ['에', 'Josa'], ['타', 'Verb'], ['고', 'Eomi'], ['가', 'Verb'], ['는데', 'Eomi']],
+    [['이번', 'Noun'], ['경기', 'Noun'], ['에서는', 'Josa'], ['누가', 'Noun'], ['이기', 'Verb'], ['었을까', 'Eomi']],
+    [['아이고', 'Exclamation'], ['작업', 'Noun'], ['이', 'Josa'], ['쉽', 'Adjective'], ['지', 'Eomi'], ['않', 'Verb'], ['구만', 'Eomi']],
+    [['괜찮', 'Adjective'], ['아', 'Eomi']],
+    [['아이돌', 'Noun'], ['이', 'Josa'], ['노래', 'Noun'], ['를', 'Josa'], ['하', 'Verb'], ['았다', 'Eomi']],
+    [['좋', 'Adjective'], ['은', 'Eomi'], ['노래', 'Noun'], ['야', 'Josa']],
+    [['어디', 'Noun'], ['있', 'Verb'], ['어', 'Eomi']],
+    [['출연', 'Noun'], ['하', 'Verb'], ['았다', 'Eomi']],
+    [['주간', 'Noun'], ['아이돌', 'Noun'], ['에', 'Josa'], ['출연', 'Noun'], ['하', 'Verb'], ['았다', 'Eomi']],
+    [['그', 'Determiner'], ['사람', 'Noun'], ['은', 'Josa'], ['학교', 'Noun'], ['에', 'Josa'], ['가', 'Verb'], ['ㅆ다', 'Eomi']],
+    [['나', 'Noun'], ['는', 'Josa'], ['밥', 'Noun'], ['을', 'Josa'], ['먹', 'Verb'], ['었다', 'Eomi']],
+    [['그리고', 'Adverb'], ['학교', 'Noun'], ['에', 'Josa'], ['가', 'Verb'], ['ㅂ니다', 'Eomi']],
+    [['하늘', 'Noun'], ['이', 'Josa'], ['파랗', 'Adjective'], ['았다', 'Eomi']],
+    [['노래', 'Noun'], ['를', 'Josa'], ['듣', 'Verb'], ['어요', 'Eomi']],
+    [['사람', 'Noun'], ['이', 'Josa'], ['많', 'Adjective'], ['다', 'Eomi']],
+    [['빨리', 'Adverb'], ['오', 'Verb'], ['았어', 'Eomi']],
+    [['책', 'Noun'], ['을', 'Josa'], ['읽', 'Verb'], ['는다', 'Eomi']],
+]
+
+toy_sents = [
+    '주간아이돌에 아이오아이가 출연했다',
+    '이번 경기에서는 누가 이겼을까',
+    '아이고 작업이 쉽지 않구만',
+    '샤샨 괜찮아',
+    '갹갹은 어디있어',
+    '그 사람은 학교에 갔다',
+    '나는 밥을 먹었다 그리고 노래를 들어요',
+    '하늘이 파랬다',
+    'tt는 좋은 노래야tt',
+    '빨리 왔어',
+]
+
+
+def train_toy_model():
+    trainer = CorpusTrainer(min_count_tag=1, verbose=False)
+    trainer.train(toy_corpus)
+    return trainer.emission_, trainer.transition_
+
+
+def toy_acceptable_transition(emission):
+    # the toy corpus is too small to observe every transition
+    tags = list(emission) + [unk]
+    acceptable = {(t0, t1) for t0 in tags + [bos] for t1 in tags + [eos]}
+    return acceptable
+
+
+def toy_tagger(**kwargs):
+    emission, transition = train_toy_model()
+    kwargs.setdefault('acceptable_transition', toy_acceptable_transition(emission))
+    return TrainedHMMTagger(emission=emission, transition=transition, **kwargs)
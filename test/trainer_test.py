@@ -0,0 +1,135 @@
+import os
+import sys
+import tempfile
+sys.path.append('../')
+
+from hmm_postagger import Corpus
+from hmm_postagger import CorpusTrainer
+from hmm_postagger import TrainedHMMTagger
+from toy_model import toy_acceptable_transition
+from toy_model import toy_corpus
+
+
+def write_corpus(path, corpus):
+    with open(path, 'w', encoding='utf-8') as f:
+        for sent in corpus:
+            f.write(' '.join('{}/{}'.format(word, tag) for word, tag in sent) + '\n')
+
+
+def test_corpus_split():
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'corpus.txt')
+        write_corpus(path, toy_corpus)
+        corpus = Corpus(path)
+        assert list(corpus) == toy_corpus
+        for n_shards in [1, 2, 3, 7, 100]:
+            shards = corpus.split(n_shards)
+            assert len(shards) <= n_shards
+            assert [sent for shard in shards for sent in shard] == toy_corpus
+
+
+def test_sharded_training():
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'corpus.txt')
+        write_corpus(path, toy_corpus * 3)
+
+        trainer = CorpusTrainer(min_count_tag=1, min_count_word=2, verbose=False)
+        trainer.train(Corpus(path))
+        emission, transition = trainer.emission_, trainer.transition_
+
+        trainer.train(Corpus(path), n_jobs=3)
+        assert trainer.emission_ == emission
+        assert trainer.transition_ == transition
+        assert list(trainer.emission_) == list(emission)
+
+        # count on different machines, and reduce
+        shards = Corpus(path).split(2)
+        counts_paths = [os.path.join(dirname, 'counts%d.json' % i) for i in range(2)]
+        for shard, counts_path in zip(shards, counts_paths):
+            trainer.count(shard, counts_path=counts_path)
+        trainer.train_from_counts(counts_paths)
+        assert trainer.emission_ == emission
+        assert trainer.transition_ == transition
+
+
+def assert_emission_close(emission, expected):
+    # update shifts log probs by the change of log total, so the last bits may differ
+    assert emission.keys() == expected.keys()
+    for pos, words in expected.items():
+        assert emission[pos].keys() == words.keys()
+        assert all(abs(emission[pos][word] - score) < 1e-12 for word, score in words.items())
+
+
+def test_update():
+    old, new = toy_corpus[:12], toy_corpus[12:] + [[['아이오아이', 'Noun'], ['가', 'Josa']],
+        [['TV', 'Noun'], ['를', 'Josa']], [['와', 'Exclamation']]]
+    # tags and words which become frequent by the update
+    for min_count_tag, min_count_word in [(1, 2), (6, 2), (3, 1)]:
+        trainer = CorpusTrainer(min_count_tag=min_count_tag,
+            min_count_word=min_count_word, verbose=False)
+        trainer.train(old + new)
+        emission, transition = trainer.emission_, trainer.transition_
+
+        trainer.train(old)
+        trainer.update(new[:4])
+        trainer.update(new[4:])
+        assert_emission_close(trainer.emission_, emission)
+        assert trainer.transition_ == transition
+
+    trainer = CorpusTrainer(min_count_tag=3, min_count_word=1, verbose=False)
+    with tempfile.TemporaryDirectory() as dirname:
+        model_path = os.path.join(dirname, 'model.json')
+        trainer.train(old, model_path)
+        assert os.path.exists(os.path.join(dirname, 'model.counts.json'))
+
+        tagger = TrainedHMMTagger(model_path,
+            acceptable_transition=toy_acceptable_transition(emission))
+        tagger.add_user_dictionary('Noun', '주간아이돌')
+        assert '아이오아이' not in tagger.emission['Noun']
+
+        trainer_ = CorpusTrainer(min_count_tag=3, min_count_word=1, verbose=False)
+        trainer_.load_counts(os.path.join(dirname, 'model.counts.json'))
+        trainer_.update(new, model_path)
+        tagger.reload_model(model_path,
+            acceptable_transition=toy_acceptable_transition(emission))
+        assert '아이오아이' in tagger.emission['Noun']
+        assert '주간아이돌' in tagger.emission['Noun']
+        assert ('주간아이돌', 'Noun') in tagger.tag('주간아이돌에 아이오아이가')
+
+
+def test_bounded_memory_training():
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'corpus.txt')
+        write_corpus(path, toy_corpus * 3 + toy_corpus[:5])
+
+        for min_count_word in [1, 4]:
+            trainer = CorpusTrainer(min_count_tag=1, min_count_word=min_count_word, verbose=False)
+            trainer.train(Corpus(path))
+            emission, transition = trainer.emission_, trainer.transition_
+
+            # fits in memory
+            trainer.max_count_entries = 100000
+            trainer.train(Corpus(path))
+            assert trainer.emission_ == emission
+            assert list(trainer.emission_) == list(emission)
+            assert trainer.transition_ == transition
+
+            # spilled, with and without sketch
+            for max_count_entries, sketch_width in [(3, None), (3, 64), (1, 16)]:
+                trainer = CorpusTrainer(min_count_tag=1, min_count_word=min_count_word,
+                    verbose=False, max_count_entries=max_count_entries,
+                    sketch_width=sketch_width, tmp_dir=dirname)
+                trainer.train(Corpus(path))
+                assert trainer.emission_ == emission
+                assert list(trainer.emission_) == list(emission)
+                assert trainer.transition_ == transition
+                assert all(count >= min_count_word for words in
+                    trainer.emission_counts_.values() for count in words.values())
+            assert os.listdir(dirname) == ['corpus.txt']
+
+
+if __name__ == '__main__':
+    test_corpus_split()
+    test_sharded_training()
+    test_update()
+    test_bounded_memory_training()